@@ -0,0 +1,154 @@
+"""
+Guest carts.
+
+A browsing user's cart lives in the cache under an opaque token (returned to
+the client, sent back as the X-Cart-Token header or `cart_token`), never in the
+database:
+
+    cart:guest:<token> → {'items': {sku_id: [quantity, added_at]}, 'updated_at': …}
+
+It is priced by the same engine as user carts (cart.pricing.price_lines: one
+SKU query, promotions from the in-memory index). On login (token / OTP views)
+merge_guest_cart() folds it into the user's Cart with one bulk upsert.
+"""
+import re
+import secrets
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from catalog.models import SKU
+from .models import Cart, CartItem
+from .pricing import price_lines
+
+GUEST_CART_TIMEOUT = 60 * 60 * 24 * 30
+GUEST_CART_MAX_ITEMS = 100
+TOKEN_HEADER = 'X-Cart-Token'
+_TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{32,64}$')
+
+
+def _key(token):
+    return f'cart:guest:{token}'
+
+
+def request_token(request):
+    token = request.headers.get(TOKEN_HEADER) or request.data.get('cart_token') or ''
+    return token if _TOKEN_RE.match(token) else None
+
+
+def sellable_skus(sku_ids):
+    return SKU.objects.filter(
+        pk__in=sku_ids,
+        product__verification_status='approved',
+        product__is_active=True,
+        is_available=True,
+    )
+
+
+class GuestLine:
+    """
+    A guest cart line, shaped like a CartItem for pricing and CartItemSerializer (id is the SKU id).
+    """
+    def __init__(self, sku, quantity, added_at):
+        self.pk = self.id = sku.pk
+        self.sku = sku
+        self.sku_id = sku.pk
+        self.quantity = quantity
+        self.added_at = added_at
+
+
+class GuestCart:
+    def __init__(self, token=None, items=None, updated_at=None):
+        self.token = token or secrets.token_urlsafe(32)
+        self.items = items or {}    # sku_id → [quantity, added_at timestamp]
+        self.updated_at = updated_at
+
+    @classmethod
+    def load(cls, token):
+        """
+        The cart stored under `token`, or a new empty one (a fresh token if `token` is None).
+        """
+        data = cache.get(_key(token)) if token else None
+        if data is None:
+            return cls(token)
+        return cls(token, {int(sku_id): item for sku_id, item in data['items'].items()}, data['updated_at'])
+
+    def save(self):
+        self.updated_at = time.time()
+        cache.set(_key(self.token), {'items': self.items, 'updated_at': self.updated_at}, GUEST_CART_TIMEOUT)
+
+    def delete(self):
+        cache.delete(_key(self.token))
+        self.items = {}
+
+    def set_quantity(self, sku_id, quantity):
+        if sku_id not in self.items and len(self.items) >= GUEST_CART_MAX_ITEMS:
+            raise ValueError("Cart is full")
+        added_at = self.items.get(sku_id, [0, time.time()])[1]
+        self.items[sku_id] = [quantity, added_at]
+
+    def quantity(self, sku_id):
+        return self.items.get(sku_id, [0])[0]
+
+    def remove(self, sku_id):
+        return self.items.pop(sku_id, None) is not None
+
+    def lines(self):
+        """
+        Lines for the SKUs still sellable (one query), oldest first.
+        """
+        if not self.items:
+            return []
+        skus = sellable_skus(self.items).select_related(
+            'product__category', 'product__seller', 'product__brand'
+        ).in_bulk()
+        lines = [
+            GuestLine(skus[sku_id], quantity, datetime.fromtimestamp(added_at, tz=dt_timezone.utc))
+            for sku_id, (quantity, added_at) in self.items.items() if sku_id in skus
+        ]
+        return sorted(lines, key=lambda line: (line.added_at, line.pk))
+
+
+def price_guest_cart(guest):
+    """
+    Same shape as cart.pricing.price_cart(): price_lines() result plus 'items' with `pricing` attached.
+    """
+    lines = guest.lines()
+    result = dict(price_lines(lines), items=lines)
+    for line, priced in zip(lines, result['lines']):
+        line.pricing = priced
+    return result
+
+
+def merge_guest_cart(user, token):
+    """
+    Fold the guest cart under `token` into the user's Cart: quantities add up,
+    capped at available stock; one bulk upsert (INSERT … ON CONFLICT (cart, sku) DO UPDATE quantity).
+    Returns the number of lines merged.
+    """
+    if not token:
+        return 0
+    guest = GuestCart.load(token)
+    if not guest.items:
+        return 0
+
+    stock = {
+        pk: stock - reserved
+        for pk, stock, reserved in sellable_skus(guest.items).values_list('pk', 'stock_quantity', 'reserved_quantity')
+    }
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        existing = dict(cart.items.filter(sku_id__in=stock).values_list('sku_id', 'quantity'))
+        rows = [
+            CartItem(cart=cart, sku_id=sku_id, quantity=min(existing.get(sku_id, 0) + quantity, stock[sku_id]))
+            for sku_id, (quantity, _) in guest.items.items()
+            if stock.get(sku_id, 0) > 0
+        ]
+        if rows:
+            CartItem.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['cart', 'sku'], update_fields=['quantity']
+            )
+            Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+    guest.delete()
+    return len(rows)
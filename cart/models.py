@@ -26,7 +26,8 @@ class Cart(models.Model):
         return f"Cart {self.user.phone_number}"
 
     def total_amount(self):
-        return sum(item.total_price() for item in self.items.all())
+        from .pricing import price_cart
+        return price_cart(self)['original_total']
 
 
 class CartItem(models.Model):
@@ -39,5 +40,9 @@ class CartItem(models.Model):
         unique_together = ('cart', 'sku')
 
     def total_price(self):
-        price = self.sku.price_override or self.sku.product.base_price
-        return price * self.quantity
\ No newline at end of file
+        # Priced with the whole cart when loaded through cart.pricing.price_cart
+        if hasattr(self, 'pricing'):
+            return self.pricing['subtotal']
+        from .pricing import money
+        from catalog.prices import sku_price
+        return money(sku_price(self.sku)) * self.quantity
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Cart pricing engine.
+
+One pass prices a cart: its items are loaded with
+select_related('sku__product__category', 'sku__product__seller', …), each line gets
+its unit price (catalog.prices.sku_price) and best live promotion
+(promotions.index), bundle deals are matched (promotions.bundles) and the
+totals are summed.
+
+The result is memoized
+- per request, on the Cart instance (serializer, views and checkout share it)
+- across requests, in the cache, keyed by cart version (updated_at), the
+  active-promotion version, the product version and the promotions the owner
+  has used up – any of them changing means a new key
+so the cart GET, the mutation responses and checkout never price a cart twice.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.cache import cache
+from django.utils import timezone
+from catalog.cache import PRODUCTS_NAMESPACE
+from catalog.prices import sku_price
+from kkoo.cache import get_version
+from promotions.bundles import best_combination
+from promotions.cache import ACTIVE_NAMESPACE
+from promotions.index import get_promotion_index
+from promotions.ledger import exhausted_promotions
+
+PRICING_CACHE_TIMEOUT = 60 * 10
+CENT = Decimal('0.01')
+
+
+def money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def cart_items(cart):
+    return list(
+        cart.items.select_related('sku__product__category', 'sku__product__seller', 'sku__product__brand')
+        .order_by('added_at', 'id')
+    )
+
+
+def promotion_discount(promotion, unit_price, quantity, original_total):
+    """
+    Discount of one line under `promotion`, or None when the promotion does not apply.
+    """
+    # Usage caps are checked when incentives are committed at checkout, not while pricing
+    if promotion.min_order_amount and original_total < promotion.min_order_amount:
+        return None
+    discount = money(unit_price * promotion.discount_percent / 100 * quantity)
+    if promotion.max_discount_cap:
+        discount = min(discount, promotion.max_discount_cap)
+    return discount
+
+
+def price_lines(lines, now=None, exclude_promotions=()):
+    """
+    Price lines (objects with .pk, .sku – product loaded – and .quantity; one line per SKU).
+    `exclude_promotions`: ids the buyer may not use any more (promotions.ledger).
+    Each unit gets either a bundle deal or its item promotion, whichever
+    combination saves most (promotions.bundles).
+    Returns plain data only, so the result can be cached.
+    """
+    now = now or timezone.now()
+    index = get_promotion_index()
+
+    priced = []
+    for line in lines:
+        unit_price = money(sku_price(line.sku))
+        priced.append({
+            'item_id': line.pk,
+            'sku_id': line.sku.pk,
+            'product_id': line.sku.product_id,
+            'quantity': line.quantity,
+            'unit_price': unit_price,
+            'subtotal': unit_price * line.quantity,
+            'discount': Decimal('0.00'),
+            'bundle_discount': Decimal('0.00'),
+            'promotion_id': None,
+            'promotion_name': None,
+            '_promotion': index.best_for_sku(line.sku, now=now, exclude=exclude_promotions),
+        })
+    original_total = sum((line['subtotal'] for line in priced), Decimal('0.00'))
+
+    by_sku = {line['sku_id']: line for line in priced}
+    bundles = apply_bundles(index, by_sku, original_total, now, exclude_promotions)
+
+    applied = []
+    for line in priced:
+        promotion = line.pop('_promotion')
+        outside = line.pop('_outside_bundles', line['quantity'])
+        if promotion is None or not outside:
+            continue
+        discount = promotion_discount(promotion, line['unit_price'], outside, original_total)
+        if discount is None:
+            continue
+        line.update(discount=line['discount'] + discount, promotion_id=promotion.pk, promotion_name=promotion.name)
+        applied.append({
+            'type': 'promotion',
+            'name': promotion.name,
+            'promotion_id': promotion.pk,
+            'item_id': line['item_id'],
+            'amount': float(discount),
+        })
+    applied += [
+        {'type': 'bundle', 'name': bundle['name'], 'promotion_id': bundle['promotion_id'],
+         'bundle_id': bundle['bundle_id'], 'times': bundle['times'], 'amount': float(bundle['discount'])}
+        for bundle in bundles
+    ]
+
+    promotion_total = sum((line['discount'] for line in priced), Decimal('0.00'))
+    return {
+        'lines': priced,
+        'original_total': original_total,
+        'promotion_discount': promotion_total,
+        'bundle_discount': sum((bundle['discount'] for bundle in bundles), Decimal('0.00')),
+        'final_total': max(original_total - promotion_total, Decimal('0.00')),
+        'applied_incentives': applied,
+        'bundles': bundles,
+        'priced_at': now,
+    }
+
+
+def apply_bundles(index, by_sku, original_total, now, exclude_promotions=()):
+    """
+    Pick the best bundle combination for priced lines ({sku_id: line}, '_promotion' still attached),
+    spread each bundle's saving over its lines by unit price and record on every line how many
+    units are left for its item promotion ('_outside_bundles'). Returns the applied bundles.
+    """
+    candidates = index.bundle_candidates(set(by_sku), now=now, exclude=exclude_promotions)
+    candidates = [
+        bundle for bundle in candidates
+        if original_total >= index.promotions[bundle.promotion_id].min_order_amount
+    ]
+    if not candidates:
+        return []
+
+    def item_discount(sku_id, quantity):
+        line = by_sku[sku_id]
+        if line['_promotion'] is None:
+            return Decimal('0.00')
+        return promotion_discount(line['_promotion'], line['unit_price'], quantity, original_total) or Decimal('0.00')
+
+    chosen, _ = best_combination(
+        candidates,
+        units={sku_id: line['quantity'] for sku_id, line in by_sku.items()},
+        unit_prices={sku_id: line['unit_price'] for sku_id, line in by_sku.items()},
+        item_discount=item_discount,
+    )
+
+    applied = []
+    for bundle in sorted((index.bundles[pk] for pk in chosen), key=lambda bundle: bundle.pk):
+        times = chosen[bundle.pk]
+        lines = [by_sku[sku_id] for sku_id in bundle.sku_ids]
+        full_price = sum(line['unit_price'] for line in lines)
+        saving = (full_price - bundle.price) * times
+        shared = Decimal('0.00')
+        for position, line in enumerate(lines):
+            share = saving - shared if position == len(lines) - 1 else money(saving * line['unit_price'] / full_price)
+            shared += share
+            line['discount'] += share
+            line['bundle_discount'] += share
+            line['_outside_bundles'] = line.get('_outside_bundles', line['quantity']) - times
+        promotion = index.promotions[bundle.promotion_id]
+        applied.append({
+            'bundle_id': bundle.pk,
+            'promotion_id': promotion.pk,
+            'name': promotion.name,
+            'times': times,
+            'discount': saving,
+        })
+    return applied
+
+
+def pricing_key(cart, exclude_promotions=()):
+    return 'cart:pricing:{}:{}:{}:{}:{}'.format(
+        cart.pk, cart.updated_at.timestamp(), get_version(ACTIVE_NAMESPACE), get_version(PRODUCTS_NAMESPACE),
+        ','.join(map(str, sorted(exclude_promotions))),
+    )
+
+
+def price_cart(cart, refresh=False):
+    """
+    Priced cart: the plain result of price_lines() plus 'items' – the loaded CartItems,
+    each with its line attached as `item.pricing`.
+    """
+    # Promotions whose per-user cap the owner has used up: a cached lookup, no order history scan
+    exclude = exhausted_promotions(cart.user_id, get_promotion_index().promotions)
+    key = pricing_key(cart, exclude)
+    memo = getattr(cart, '_pricing', None)
+    if memo and memo[0] == key and not refresh:
+        return memo[1]
+
+    items = cart_items(cart)
+    result = None if refresh else cache.get(key)
+    # Guards against item writes that did not touch cart.updated_at
+    signature = [(item.pk, item.sku_id, item.quantity) for item in items]
+    if result is None or [(line['item_id'], line['sku_id'], line['quantity']) for line in result['lines']] != signature:
+        result = price_lines(items, exclude_promotions=exclude)
+        cache.set(key, result, PRICING_CACHE_TIMEOUT)
+
+    result = dict(result, items=items)
+    for item, line in zip(items, result['lines']):
+        item.pricing = line
+    cart._pricing = (key, result)
+    return result
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Wishlist, Cart, CartItem
 from catalog.serializers import ProductDetailSerializer, SKUSerializer
+from .pricing import price_cart
 
 
 class WishlistSerializer(serializers.ModelSerializer):
@@ -13,35 +14,90 @@ class WishlistSerializer(serializers.ModelSerializer):
 
 class CartItemSerializer(serializers.ModelSerializer):
     sku = SKUSerializer(read_only=True)
+    unit_price = serializers.SerializerMethodField()
     total_price = serializers.SerializerMethodField()
+    discount = serializers.SerializerMethodField()
+    promotion = serializers.SerializerMethodField()
 
     class Meta:
         model = CartItem
-        fields = ['id', 'sku', 'quantity', 'total_price', 'added_at']
+        fields = ['id', 'sku', 'quantity', 'unit_price', 'total_price', 'discount', 'promotion', 'added_at']
+
+    # Items come from cart.pricing.price_cart with their priced line attached
+    def get_unit_price(self, obj):
+        return obj.pricing['unit_price']
 
     def get_total_price(self, obj):
-        return obj.total_price()
+        return obj.pricing['subtotal']
+
+    def get_discount(self, obj):
+        return obj.pricing['discount']
+
+    def get_promotion(self, obj):
+        if obj.pricing['promotion_id'] is None:
+            return None
+        return {'id': obj.pricing['promotion_id'], 'name': obj.pricing['promotion_name']}
 
 
 class CartSerializer(serializers.ModelSerializer):
-    items = CartItemSerializer(many=True, read_only=True)
-    discount_info = serializers.SerializerMethodField()
+    """
+    Priced once per request (see cart.pricing): items, totals and promotions share one pass.
+    """
+    items = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
-        fields = ['id', 'items', 'total_amount', 'discount_info', 'created_at', 'updated_at']
+        fields = ['id', 'items', 'created_at', 'updated_at']
 
-    def get_discount_info(self, obj):
-        from cart.utils import apply_promotions_to_cart
-        return apply_promotions_to_cart(obj)
+    def get_items(self, obj):
+        return CartItemSerializer(price_cart(obj)['items'], many=True, context=self.context).data
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        discount_data = data.pop('discount_info')
-        data.update({
-            'original_total': discount_data['original_total'],
-            'discount_amount': discount_data['discount_amount'],
-            'final_total': discount_data['final_total'],
-            'applied_promotions': discount_data['applied_promotions']
-        })
-        return data
\ No newline at end of file
+        data.update(pricing_totals(price_cart(instance)))
+        return data
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """
+    One change of a batch: add (sku_id, quantity added), update (item_id or sku_id, new quantity)
+    or remove (item_id or sku_id).
+    """
+    op = serializers.ChoiceField(choices=['add', 'update', 'remove'])
+    sku_id = serializers.IntegerField(required=False)
+    item_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'add' and 'sku_id' not in attrs:
+            raise serializers.ValidationError("add needs sku_id")
+        if attrs['op'] != 'add' and 'sku_id' not in attrs and 'item_id' not in attrs:
+            raise serializers.ValidationError(f"{attrs['op']} needs item_id or sku_id")
+        if attrs['op'] == 'update' and 'quantity' not in attrs:
+            raise serializers.ValidationError("update needs quantity")
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+
+def pricing_totals(pricing):
+    return {
+        'total_amount': pricing['original_total'],
+        'original_total': pricing['original_total'],
+        'discount_amount': pricing['promotion_discount'],
+        'final_total': pricing['final_total'],
+        'applied_promotions': pricing['applied_incentives']
+    }
+
+
+def guest_cart_data(guest, pricing):
+    """
+    A guest cart (cart.guest) in the shape of CartSerializer, plus its token.
+    """
+    return {
+        'token': guest.token,
+        'items': CartItemSerializer(pricing['items'], many=True).data,
+        **pricing_totals(pricing),
+    }
@@ -1,3 +1,198 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from catalog.models import Category, Product, SKU
+from promotions.index import get_promotion_index
+from promotions.models import Promotion
+from users.utils import create_test_user, create_test_seller_user
+from .guest import TOKEN_HEADER, merge_guest_cart, sellable_skus
+from .models import Cart, CartItem
+from .pricing import price_cart
 
-# Create your tests here.
+
+class CartPricingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, self.seller_profile = create_test_seller_user()
+        self.category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            seller=self.seller_profile, category=self.category, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=320000, discount_price=300000, verification_status='approved'
+        )
+        self.user = create_test_user()
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def add_items(self, count, start=0):
+        for n in range(start, start + count):
+            sku = SKU.objects.create(product=self.product, sku_code=f"SPARK-{n}", stock_quantity=10,
+                                     price_override=350000 if n % 2 else None)
+            CartItem.objects.create(cart=self.cart, sku=sku, quantity=2)
+
+    def test_line_prices_and_totals(self):
+        self.add_items(2)
+        pricing = price_cart(self.cart)
+        self.assertEqual([line['unit_price'] for line in pricing['lines']], [Decimal('300000.00'), Decimal('350000.00')])
+        self.assertEqual(pricing['original_total'], Decimal('1300000.00'))
+        self.assertEqual(self.cart.total_amount(), Decimal('1300000.00'))
+        self.assertEqual(pricing['items'][1].total_price(), Decimal('700000.00'))
+
+    def test_promotion_applied_per_line(self):
+        self.add_items(1)
+        now = timezone.now()
+        promotion = Promotion.objects.create(
+            name="Phones week", promotion_type='category', discount_percent=10, created_by=create_test_user(is_staff=True),
+            start_datetime=now - timedelta(hours=1), end_datetime=now + timedelta(days=1),
+        )
+        promotion.categories.add(self.category)
+
+        data = self.client.get(reverse('cart:cart_detail')).data
+        self.assertEqual(data['discount_amount'], Decimal('60000.00'))
+        self.assertEqual(data['final_total'], Decimal('540000.00'))
+        self.assertEqual(data['items'][0]['promotion'], {'id': promotion.pk, 'name': "Phones week"})
+
+    def test_cart_get_query_count_does_not_grow_with_items(self):
+        self.add_items(2)
+        get_promotion_index()  # built once per process, not per request
+        with self.assertNumQueries(2):  # cart, items with sku/product/category/seller/brand
+            self.client.get(reverse('cart:cart_detail'))
+        self.add_items(10, start=2)
+        self.cart.save()  # new cart version
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('cart:cart_detail'))
+        self.assertEqual(len(response.data['items']), 12)
+
+    def test_result_is_reused_until_the_cart_changes(self):
+        self.add_items(1)
+        first = price_cart(Cart.objects.get(pk=self.cart.pk))
+        second = price_cart(Cart.objects.get(pk=self.cart.pk))
+        self.assertEqual(first['priced_at'], second['priced_at'])  # from the cache, not re-priced
+
+        response = self.client.post(reverse('cart:cart_add_item'), {'sku_id': first['items'][0].sku_id})
+        self.assertEqual(response.data['items'][0]['quantity'], 3)
+        self.assertNotEqual(price_cart(Cart.objects.get(pk=self.cart.pk))['priced_at'], first['priced_at'])
+
+
+class GuestCartTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, seller_profile = create_test_seller_user()
+        self.product = Product.objects.create(
+            seller=seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=100000, verification_status='approved'
+        )
+        self.sku = SKU.objects.create(product=self.product, sku_code="SPARK-128", stock_quantity=5)
+        self.other = SKU.objects.create(product=self.product, sku_code="SPARK-256", stock_quantity=5)
+        now = timezone.now()
+        promotion = Promotion.objects.create(
+            name="Karibu", promotion_type='timed', discount_percent=10, created_by=create_test_user(is_staff=True),
+            start_datetime=now - timedelta(hours=1), end_datetime=now + timedelta(hours=1),
+        )
+        promotion.products.add(self.product)
+        get_promotion_index()
+
+    def add(self, sku, quantity, token=None):
+        headers = {'HTTP_X_CART_TOKEN': token} if token else {}
+        return self.client.post(reverse('cart:guest_cart_add_item'), {'sku_id': sku.pk, 'quantity': quantity},
+                                format='json', **headers)
+
+    def test_guest_cart_is_priced_without_database_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            token = self.add(self.sku, 2).data['token']
+            response = self.client.get(reverse('cart:guest_cart_detail'), HTTP_X_CART_TOKEN=token)
+        self.assertFalse([q for q in queries if not q['sql'].startswith('SELECT')])
+        self.assertEqual(response[TOKEN_HEADER], token)
+        self.assertEqual(response.data['original_total'], Decimal('200000.00'))
+        self.assertEqual(response.data['discount_amount'], Decimal('20000.00'))
+        self.assertEqual(response.data['items'][0]['sku']['id'], self.sku.pk)
+
+        self.assertEqual(self.add(self.sku, 4, token).status_code, status.HTTP_400_BAD_REQUEST)  # 6 > stock
+
+    def test_guest_cart_merged_on_login_with_one_upsert(self):
+        token = self.add(self.sku, 4).data['token']
+        self.add(self.other, 1, token)
+        user = create_test_user()
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, sku=self.sku, quantity=3)
+
+        with CaptureQueriesContext(connection) as queries:
+            merge_guest_cart(user, token)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT INTO "cart_cartitem"')]), 1)
+        self.assertEqual(dict(cart.items.values_list('sku_id', 'quantity')), {self.sku.pk: 5, self.other.pk: 1})
+        self.assertEqual(self.client.get(reverse('cart:guest_cart_detail'), HTTP_X_CART_TOKEN=token).data['items'], [])
+
+
+class CartBatchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, seller_profile = create_test_seller_user()
+        product = Product.objects.create(
+            seller=seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=100000, verification_status='approved'
+        )
+        self.skus = [SKU.objects.create(product=product, sku_code=f"SPARK-{n}", stock_quantity=5) for n in range(12)]
+        self.user = create_test_user()
+        self.cart = Cart.objects.create(user=self.user)
+        self.kept = CartItem.objects.create(cart=self.cart, sku=self.skus[0], quantity=1)
+        self.dropped = CartItem.objects.create(cart=self.cart, sku=self.skus[1], quantity=1)
+        self.client.force_authenticate(self.user)
+        get_promotion_index()
+
+    def batch(self, operations):
+        return self.client.post(reverse('cart:cart_batch'), {'operations': operations}, format='json')
+
+    def test_many_changes_one_round_trip(self):
+        operations = [{'op': 'add', 'sku_id': sku.pk, 'quantity': 2} for sku in self.skus[2:]]
+        operations += [
+            {'op': 'update', 'item_id': self.kept.pk, 'quantity': 4},
+            {'op': 'remove', 'sku_id': self.skus[1].pk},
+            {'op': 'add', 'sku_id': self.skus[2].pk},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.batch(operations)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        writes = [q['sql'].split()[0] for q in queries if not q['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(sorted(writes), ['DELETE', 'INSERT', 'UPDATE', 'UPDATE'])  # items ×3, cart.updated_at
+        self.assertEqual(len(response.data['items']), 11)
+        self.assertEqual(response.data['original_total'], Decimal('2500000.00'))
+        self.assertEqual(dict(self.cart.items.values_list('sku_id', 'quantity'))[self.skus[2].pk], 3)
+        self.assertFalse(CartItem.objects.filter(pk=self.dropped.pk).exists())
+
+    def test_any_invalid_operation_rejects_the_batch(self):
+        response = self.batch([
+            {'op': 'add', 'sku_id': self.skus[3].pk, 'quantity': 1},
+            {'op': 'update', 'item_id': self.kept.pk, 'quantity': 9},
+            {'op': 'remove', 'sku_id': self.skus[4].pk},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['errors']), {1, 2})
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_line_added_concurrently_is_upserted(self):
+        def add_meanwhile(sku_ids):
+            # A single-item add committing between the batch's read and its write
+            CartItem.objects.create(cart=self.cart, sku=self.skus[2], quantity=1)
+            return sellable_skus(sku_ids)
+
+        with mock.patch('cart.views.sellable_skus', side_effect=add_meanwhile):
+            response = self.batch([{'op': 'add', 'sku_id': self.skus[2].pk, 'quantity': 2}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.cart.items.get(sku=self.skus[2]).quantity, 2)
+
+    def test_retried_batch_with_idempotency_key_applies_once(self):
+        operations = [{'op': 'add', 'sku_id': self.skus[2].pk, 'quantity': 2}]
+        first = self.client.post(reverse('cart:cart_batch'), {'operations': operations}, format='json',
+                                 HTTP_IDEMPOTENCY_KEY='batch-1')
+        retry = self.client.post(reverse('cart:cart_batch'), {'operations': operations}, format='json',
+                                 HTTP_IDEMPOTENCY_KEY='batch-1')
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(self.cart.items.get(sku=self.skus[2]).quantity, 2)
@@ -5,6 +5,11 @@ from .views import (
     CartItemUpdateView,
     CartItemRemoveView,
     CartClearView,
+    CartBatchView,
+    GuestCartDetailView,
+    GuestCartItemAddView,
+    GuestCartItemUpdateView,
+    GuestCartItemRemoveView,
 )
 
 app_name = 'cart'
@@ -15,4 +20,11 @@ urlpatterns = [
     path('items/<int:pk>/update/', CartItemUpdateView.as_view(), name='cart_update_item'),  # PATCH quantity
     path('items/<int:pk>/remove/', CartItemRemoveView.as_view(), name='cart_remove_item'),  # DELETE item
     path('clear/', CartClearView.as_view(), name='cart_clear'),  # POST clear all
+    path('batch/', CartBatchView.as_view(), name='cart_batch'),  # POST many add/update/remove
+
+    # Guest carts: X-Cart-Token header
+    path('guest/', GuestCartDetailView.as_view(), name='guest_cart_detail'),  # GET cart
+    path('guest/add/', GuestCartItemAddView.as_view(), name='guest_cart_add_item'),  # POST add
+    path('guest/items/<int:sku_id>/update/', GuestCartItemUpdateView.as_view(), name='guest_cart_update_item'),
+    path('guest/items/<int:sku_id>/remove/', GuestCartItemRemoveView.as_view(), name='guest_cart_remove_item'),
 ]
\ No newline at end of file
@@ -1,102 +1,95 @@
-from django.utils import timezone
+from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import F
+from django.utils import timezone
+from promotions.counters import commit_promotion_usage, commit_code_usage
+from promotions.ledger import code_uses
 from promotions.models import Promotion, DiscountCode
+from .pricing import price_cart
 
 
 def apply_incentives_to_cart(cart, discount_code=None):
     """
     Apply incentives with full operational discipline
     - Priority ordering (highest wins)
+    - Bundle deals, where they beat the item promotions of their units
     - No stacking
     - Per-user use cap
     - Minimum order amount
-    - Burn tracking
+    - Burn tracking: nothing is written here – checkout calls commit_incentives()
+      inside the order transaction, so previews never touch the counters
     """
-    now = timezone.now()
-    user = cart.user
-    original_total = cart.total_amount()
+    pricing = price_cart(cart)
+    original_total = pricing['original_total']
     final_total = original_total
     applied = []
 
-    # 1. Promotion – highest priority wins
-    promo_discount = 0
-    active_promos = Promotion.objects.filter(
-        is_active=True,
-        start_datetime__lte=now,
-        end_datetime__gte=now
-    ).order_by('-priority', '-discount_percent')
-
-    for item in cart.items.all():
-        sku = item.sku
-        product = sku.product
-
-        # Find best eligible promotion
-        promo = active_promos.filter(
-            Q(products=product) |
-            Q(skus=sku) |
-            Q(categories=product.category) |
-            Q(sellers=product.seller)
-        ).first()
-
-        if promo:
-            # Check per-user use cap
-            if promo.max_uses_per_user:
-                user_uses = promo.uses_count  # You'd track per-user in real system
-                if user_uses >= promo.max_uses_per_user:
-                    continue
-
-            price = sku.price_override or product.base_price
-            discount = price * (promo.discount_percent / 100) * item.quantity
-
-            if promo.max_discount_cap:
-                discount = min(discount, promo.max_discount_cap)
-
-            if promo.min_order_amount and original_total < promo.min_order_amount:
-                continue
-
-            promo_discount += discount
-            applied.append({
-                'type': 'promotion',
-                'name': promo.name,
-                'promotion_id': promo.id,
-                'amount': discount
-            })
-
-            with transaction.atomic():
-                promo.total_burn += discount
-                promo.uses_count += 1
-                promo.save(update_fields=['total_burn', 'uses_count'])
+    # 1. Promotions – priced once by cart.pricing (highest priority per item, no stacking)
+    promo_discount = Decimal('0.00')
+    promotion_usage = {}
+    promotions = Promotion.objects.in_bulk({line['promotion_id'] for line in pricing['lines']} - {None})
+    for line in pricing['lines']:
+        promo = promotions.get(line['promotion_id'])
+        if promo is None:
+            continue
+        # Per-user caps were applied while pricing (promotions.ledger)
+
+        discount = line['discount'] - line['bundle_discount']
+        promo_discount += discount
+        promotion_usage[promo.id] = promotion_usage.get(promo.id, Decimal('0.00')) + discount
+        applied.append({
+            'type': 'promotion',
+            'name': promo.name,
+            'promotion_id': promo.id,
+            'amount': float(discount)
+        })
+
+    # Bundle deals – units in a bundle got no item promotion above
+    for bundle in pricing['bundles']:
+        promo_discount += bundle['discount']
+        promotion_usage[bundle['promotion_id']] = (
+            promotion_usage.get(bundle['promotion_id'], Decimal('0.00')) + bundle['discount']
+        )
+        applied.append({
+            'type': 'bundle',
+            'name': bundle['name'],
+            'promotion_id': bundle['promotion_id'],
+            'bundle_id': bundle['bundle_id'],
+            'times': bundle['times'],
+            'amount': float(bundle['discount'])
+        })
 
     final_total -= promo_discount
 
     # 2. Discount Code – one-time use
     code_discount = 0
+    code_id = None
     if discount_code:
-        try:
-            code = DiscountCode.objects.select_for_update().get(
-                code=discount_code.upper(),
-                is_active=True
-            )
-            if final_total < code.min_order_amount:
-                raise ValidationError("Order total too low for code")
-
-            code_discount = code.discount_amount
-
-            with transaction.atomic():
-                code.uses_count += 1
-                code.save(update_fields=['uses_count'])
-
-            applied.append({
-                'type': 'code',
-                'code': code.code,
-                'amount': code_discount
-            })
-
-            final_total -= code_discount
-        except DiscountCode.DoesNotExist:
+        now = timezone.now()
+        code = DiscountCode.objects.filter(
+            code=discount_code.upper(),
+            is_active=True,
+            valid_from__lte=now,
+            valid_until__gte=now,
+            uses_count__lt=F('max_uses'),
+        ).first()
+        if code is None:
             raise ValidationError("Invalid or expired discount code")
+        if final_total < code.min_order_amount:
+            raise ValidationError("Order total too low for code")
+        if code.max_uses_per_user and code_uses(cart.user_id, code.id) >= code.max_uses_per_user:
+            raise ValidationError("You have already used this code")
+
+        code_discount = code.discount_amount
+        code_id = code.id
+        applied.append({
+            'type': 'code',
+            'code': code.code,
+            'amount': float(code_discount)
+        })
+
+        final_total -= code_discount
 
     return {
         'original_total': original_total,
@@ -104,10 +97,22 @@ def apply_incentives_to_cart(cart, discount_code=None):
         'code_discount': code_discount,
         'total_discount': promo_discount + code_discount,
         'final_total': max(final_total, 0),
-        'applied_incentives': applied
+        'applied_incentives': applied,
+        'promotion_usage': promotion_usage,
+        'discount_code_id': code_id,
     }
 
 
+def commit_incentives(incentives):
+    """
+    Count the uses and burn of a checkout. Call inside the order's transaction:
+    raises UsageLimitReached (a ValidationError) when a limit was hit meanwhile.
+    """
+    commit_promotion_usage(incentives['promotion_usage'])
+    if incentives['discount_code_id']:
+        commit_code_usage(incentives['discount_code_id'])
+
+
 def apply_loyalty_points(cart, points_to_use):
     """
     Redeem loyalty points with full safeguards
@@ -121,7 +126,7 @@ def apply_loyalty_points(cart, points_to_use):
         raise ValidationError("Insufficient loyalty points")
 
     cart_total = cart.total_amount()
-    max_allowed = cart_total * 0.5
+    max_allowed = cart_total * Decimal('0.5')
     discount = min(points_to_use, max_allowed)
 
     if discount <= 0:
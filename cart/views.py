@@ -1,11 +1,15 @@
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from .models import Cart, CartItem
 from catalog.models import SKU
-from .serializers import CartSerializer
+from orders.idempotency import idempotent
+from .guest import GuestCart, TOKEN_HEADER, price_guest_cart, request_token, sellable_skus
+from .serializers import CartSerializer, CartBatchSerializer, guest_cart_data
 
 
 class CartDetailView(generics.RetrieveAPIView):
@@ -23,6 +27,7 @@ class CartDetailView(generics.RetrieveAPIView):
 class CartItemAddView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def post(self, request):
         sku_id = request.data.get('sku_id')
         quantity = int(request.data.get('quantity', 1))
@@ -35,7 +40,7 @@ class CartItemAddView(APIView):
             product__verification_status='approved',
             product__is_active=True,
             is_available=True,
-            stock_quantity__gte=quantity
+            stock_quantity__gte=F('reserved_quantity') + quantity  # available: stock less held units
         )
 
         cart, _ = Cart.objects.get_or_create(user=request.user)
@@ -47,7 +52,7 @@ class CartItemAddView(APIView):
 
         if not created:
             new_quantity = cart_item.quantity + quantity
-            if new_quantity > sku.stock_quantity:
+            if new_quantity > sku.available_quantity:
                 return Response({"error": "Not enough stock"}, status=400)
             cart_item.quantity = new_quantity
             cart_item.save()
@@ -61,13 +66,14 @@ class CartItemAddView(APIView):
 class CartItemUpdateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def patch(self, request, pk):
         quantity = int(request.data.get('quantity'))
         if quantity < 1:
             return Response({"error": "Quantity must be at least 1"}, status=400)
 
         cart_item = get_object_or_404(CartItem, pk=pk, cart__user=request.user)
-        if quantity > cart_item.sku.stock_quantity:
+        if quantity > cart_item.sku.available_quantity:
             return Response({"error": "Not enough stock"}, status=400)
 
         cart_item.quantity = quantity
@@ -84,6 +90,7 @@ class CartItemRemoveView(generics.DestroyAPIView):
     def get_queryset(self):
         return CartItem.objects.filter(cart__user=self.request.user)
 
+    @idempotent
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         cart = instance.cart
@@ -96,9 +103,167 @@ class CartItemRemoveView(generics.DestroyAPIView):
 class CartClearView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def post(self, request):
         cart = get_object_or_404(Cart, user=request.user)
         cart.items.all().delete()
         cart.updated_at = timezone.now()
         cart.save(update_fields=['updated_at'])
-        return Response({"message": "Cart cleared", "cart": CartSerializer(cart).data})
\ No newline at end of file
+        return Response({"message": "Cart cleared", "cart": CartSerializer(cart).data})
+
+class CartBatchView(APIView):
+    """
+    POST: Apply many changes at once, in order, all or nothing
+    Body: {"operations": [{"op": "add", "sku_id": 12, "quantity": 2},
+                          {"op": "update", "item_id": 7, "quantity": 3},
+                          {"op": "remove", "sku_id": 9}]}
+    One stock query for every SKU referenced, one bulk write per kind of change
+    and one pricing pass for the returned cart.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @idempotent
+    def post(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+
+        with transaction.atomic():
+            # The cart row is locked: concurrent batches apply one after the other, each on the lines
+            # the previous one left
+            cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
+            errors = self.apply(cart, operations)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(CartSerializer(cart).data)
+
+    def apply(self, cart, operations):
+        """
+        Replay `operations` on the cart's quantities and write the difference.
+        Returns {position: error} (nothing written) when an operation cannot apply.
+        """
+        items = {item.sku_id: item for item in cart.items.all()}
+        by_pk = {item.pk: sku_id for sku_id, item in items.items()}
+        referenced = {op['sku_id'] if 'sku_id' in op else by_pk.get(op['item_id']) for op in operations}
+        skus = sellable_skus(referenced - {None}).in_bulk()
+
+        quantities = {sku_id: item.quantity for sku_id, item in items.items()}
+        errors = {}
+        for position, op in enumerate(operations):
+            sku_id = op['sku_id'] if 'sku_id' in op else by_pk.get(op['item_id'])
+            if op['op'] == 'remove':
+                if not quantities.get(sku_id):
+                    errors[position] = "Item not in cart"
+                quantities[sku_id] = 0
+                continue
+            if op['op'] == 'update' and not quantities.get(sku_id):
+                errors[position] = "Item not in cart"
+                continue
+            sku = skus.get(sku_id)
+            if sku is None:
+                errors[position] = "Product not available"
+                continue
+            quantity = op['quantity'] if op['op'] == 'update' else quantities.get(sku_id, 0) + op.get('quantity', 1)
+            if quantity > sku.available_quantity:
+                errors[position] = f"Not enough stock for {sku.sku_code}"
+                continue
+            quantities[sku_id] = quantity
+        if errors:
+            return errors
+
+        created = [CartItem(cart=cart, sku_id=sku_id, quantity=quantity)
+                   for sku_id, quantity in quantities.items() if quantity and sku_id not in items]
+        changed = []
+        for sku_id, item in items.items():
+            if quantities[sku_id] and quantities[sku_id] != item.quantity:
+                item.quantity = quantities[sku_id]
+                changed.append(item)
+        removed = [item.pk for sku_id, item in items.items() if not quantities[sku_id]]
+
+        if created:
+            # Upsert: the single-item add does not take the cart lock and may have inserted the line meanwhile
+            CartItem.objects.bulk_create(
+                created, update_conflicts=True, unique_fields=['cart', 'sku'], update_fields=['quantity']
+            )
+        if changed:
+            CartItem.objects.bulk_update(changed, ['quantity'])
+        if removed:
+            CartItem.objects.filter(pk__in=removed).delete()
+        if created or changed or removed:
+            cart.updated_at = timezone.now()
+            Cart.objects.filter(pk=cart.pk).update(updated_at=cart.updated_at)
+        return {}
+
+
+# ========================
+# GUEST CARTS (cache only, see cart.guest)
+# ========================
+
+class GuestCartMixin:
+    permission_classes = [permissions.AllowAny]
+
+    def get_guest_cart(self, request):
+        return GuestCart.load(request_token(request))
+
+    def get_idempotency_scope(self, request):
+        token = request_token(request)
+        return f'guest:{token}' if token else None
+
+    def cart_response(self, guest):
+        response = Response(guest_cart_data(guest, price_guest_cart(guest)))
+        response[TOKEN_HEADER] = guest.token
+        return response
+
+
+class GuestCartDetailView(GuestCartMixin, APIView):
+    def get(self, request):
+        return self.cart_response(self.get_guest_cart(request))
+
+
+class GuestCartItemAddView(GuestCartMixin, APIView):
+    @idempotent
+    def post(self, request):
+        sku_id = request.data.get('sku_id')
+        quantity = int(request.data.get('quantity', 1))
+        if quantity < 1:
+            return Response({"error": "Quantity must be at least 1"}, status=400)
+
+        guest = self.get_guest_cart(request)
+        sku = get_object_or_404(sellable_skus([sku_id]))
+        new_quantity = guest.quantity(sku.pk) + quantity
+        if new_quantity > sku.available_quantity:
+            return Response({"error": "Not enough stock"}, status=400)
+        try:
+            guest.set_quantity(sku.pk, new_quantity)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        guest.save()
+        return self.cart_response(guest)
+
+
+class GuestCartItemUpdateView(GuestCartMixin, APIView):
+    @idempotent
+    def patch(self, request, sku_id):
+        quantity = int(request.data.get('quantity'))
+        if quantity < 1:
+            return Response({"error": "Quantity must be at least 1"}, status=400)
+
+        guest = self.get_guest_cart(request)
+        if not guest.quantity(sku_id):
+            return Response({"error": "Item not in cart"}, status=status.HTTP_404_NOT_FOUND)
+        sku = get_object_or_404(sellable_skus([sku_id]))
+        if quantity > sku.available_quantity:
+            return Response({"error": "Not enough stock"}, status=400)
+        guest.set_quantity(sku.pk, quantity)
+        guest.save()
+        return self.cart_response(guest)
+
+
+class GuestCartItemRemoveView(GuestCartMixin, APIView):
+    @idempotent
+    def delete(self, request, sku_id):
+        guest = self.get_guest_cart(request)
+        if not guest.remove(sku_id):
+            return Response({"error": "Item not in cart"}, status=status.HTTP_404_NOT_FOUND)
+        guest.save()
+        return self.cart_response(guest)
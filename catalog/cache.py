@@ -0,0 +1,51 @@
+"""
+Cache namespaces for catalog read paths (versions live in kkoo.cache).
+"""
+from kkoo.cache import bump_version, bump_versions, get_version, read_through
+from kkoo.surrogate import queue_purge
+
+# Anything a product listing shows: products, their brand, prices, membership
+PRODUCTS_NAMESPACE = 'catalog:products'
+CATEGORIES_NAMESPACE = 'catalog:categories'
+BRANDS_NAMESPACE = 'catalog:brands'
+
+PRODUCT_DETAIL_TIMEOUT = 60 * 60
+
+
+def invalidate_product_listing():
+    bump_version(PRODUCTS_NAMESPACE)
+    queue_purge('products')
+
+
+def invalidate_categories():
+    bump_version(CATEGORIES_NAMESPACE)
+    queue_purge('categories')
+
+
+def invalidate_brands():
+    bump_version(BRANDS_NAMESPACE)
+    queue_purge('brands')
+
+
+def product_namespace(slug):
+    return f'catalog:product:{slug}'
+
+
+def product_surrogate_key(slug):
+    return f'product-{slug}'
+
+
+def invalidate_product_detail(*slugs):
+    slugs = [slug for slug in slugs if slug]
+    bump_versions(product_namespace(slug) for slug in slugs)
+    queue_purge(*(product_surrogate_key(slug) for slug in slugs))
+
+
+def get_product_detail(slug, build):
+    """
+    Rendered ProductDetailView payload, keyed by slug + per-product version.
+    Versions are bumped by catalog.signals on Product, SKU, ProductMedia,
+    ProductSpecification and Brand changes.
+    """
+    key = f'catalog:product_detail:{slug}:{get_version(product_namespace(slug))}'
+    return read_through(key, build, PRODUCT_DETAIL_TIMEOUT, name='product_detail')
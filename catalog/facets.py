@@ -0,0 +1,70 @@
+"""
+Facet counts for the product list, computed in one grouped query over the
+already-filtered queryset: GROUP BY brand, category, price bucket, then folded
+in Python into brand counts, top-level category counts and price buckets.
+"""
+from django.core.cache import cache
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from kkoo.cache import get_version
+from .cache import PRODUCTS_NAMESPACE
+from .tree import TREE_NAMESPACE, get_root_map
+
+# TZS bucket edges: [0, 10k), [10k, 50k), … [1M, ∞)
+PRICE_BUCKETS = [0, 10_000, 50_000, 100_000, 500_000, 1_000_000]
+FACETS_CACHE_TIMEOUT = 60 * 10
+
+
+def _bucket_label(index):
+    low = PRICE_BUCKETS[index]
+    if index + 1 < len(PRICE_BUCKETS):
+        return {'min': low, 'max': PRICE_BUCKETS[index + 1]}
+    return {'min': low, 'max': None}
+
+
+def compute_facets(queryset):
+    # "From" price (see catalog.prices)
+    price = F('effective_min_price')
+    bucket = Case(
+        *[When(**{'buyer_price__lt': edge}, then=Value(i - 1)) for i, edge in enumerate(PRICE_BUCKETS) if i],
+        default=Value(len(PRICE_BUCKETS) - 1),
+        output_field=IntegerField(),
+    )
+    rows = (
+        queryset.order_by()
+        .annotate(buyer_price=price)
+        .annotate(price_bucket=bucket)
+        .values_list('brand__slug', 'brand__name', 'category_id', 'price_bucket')
+        .annotate(n=Count('id'))
+    )
+
+    roots = get_root_map()
+    brands, categories, buckets = {}, {}, [0] * len(PRICE_BUCKETS)
+    for brand_slug, brand_name, category_id, price_bucket, n in rows:
+        if brand_slug:
+            entry = brands.setdefault(brand_slug, {'slug': brand_slug, 'name': brand_name, 'count': 0})
+            entry['count'] += n
+        root = roots.get(category_id)
+        if root:
+            entry = categories.setdefault(root['slug'], dict(root, count=0))
+            entry['count'] += n
+        buckets[price_bucket] += n
+
+    return {
+        'brands': sorted(brands.values(), key=lambda b: (-b['count'], b['name'])),
+        'categories': sorted(categories.values(), key=lambda c: (-c['count'], c['name'])),
+        'price': [dict(_bucket_label(i), count=n) for i, n in enumerate(buckets) if n],
+    }
+
+
+def get_facets(queryset, cacheable=False):
+    """
+    Unfiltered listings are the common case, so they are cached per catalog version.
+    """
+    if not cacheable:
+        return compute_facets(queryset)
+    key = f'catalog:facets:{get_version(PRODUCTS_NAMESPACE)}:{get_version(TREE_NAMESPACE)}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
@@ -1,24 +1,32 @@
 import django_filters
-from django.db.models import Q
-from .models import Product
+from .models import Category, Product
+from .search import search_products
+from .tree import subtree_ids
 
 
 class ProductFilter(django_filters.FilterSet):
-    category = django_filters.CharFilter(field_name='category__path', lookup_expr='contains')
+    category = django_filters.CharFilter(method='filter_category', label='Category slug or path (includes subcategories)')
     brand = django_filters.CharFilter(field_name='brand__slug')
-    min_price = django_filters.NumberFilter(field_name='base_price', lookup_expr='gte')
-    max_price = django_filters.NumberFilter(field_name='base_price', lookup_expr='lte')
+    # Products whose buyer price range overlaps [min_price, max_price] (see catalog.prices)
+    min_price = django_filters.NumberFilter(field_name='effective_max_price', lookup_expr='gte')
+    max_price = django_filters.NumberFilter(field_name='effective_min_price', lookup_expr='lte')
     search = django_filters.CharFilter(method='filter_search', label='Search')
 
     class Meta:
         model = Product
         fields = ['category', 'brand', 'min_price', 'max_price']
 
+    def filter_category(self, queryset, name, value):
+        if value.startswith('/'):
+            path = value if value.endswith('/') else f"{value}/"
+        else:
+            path = Category.objects.filter(slug=value).values_list('path', flat=True).first()
+            if path is None:
+                return queryset.none()
+        # Subtree = indexed path range → category ids → (category, is_active, created_at) index
+        return queryset.filter(category__in=subtree_ids(path))
+
     def filter_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(title__icontains=value) |
-            Q(description__icontains=value) |
-            Q(brand__name__icontains=value)
-        )
-    
+        # FTS5 / tsvector index, ranked by relevance (see catalog.search)
+        return search_products(queryset, value)
 
@@ -0,0 +1,83 @@
+import statistics
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from catalog import recommendations
+from catalog.models import Category, Product, ViewedItem
+from users.utils import create_test_seller_user, create_test_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the recommendation build (NumPy co-occurrence → top-K) on synthetic events "
+        "and the serve path on the stored neighbor table. DB rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--products', type=int, default=20_000)
+        parser.add_argument('-k', '--neighbors', type=int, default=recommendations.DEFAULT_NEIGHBORS)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n_products = options['products']
+        user_ids, product_ids = self._events(rng, options['events'], options['users'], n_products)
+        weights = np.full(len(user_ids), recommendations.VIEW_WEIGHT)
+
+        started = time.perf_counter()
+        neighbors = recommendations.compute_neighbors(user_ids, product_ids, weights, k=options['neighbors'])
+        build_s = time.perf_counter() - started
+        self.stdout.write(
+            f"build: {len(user_ids)} events, {options['users']} users, {n_products} products "
+            f"→ {len(neighbors[0])} neighbors in {build_s:.2f}s"
+        )
+
+        with transaction.atomic():
+            _, seller = create_test_seller_user()
+            category = Category.objects.create(name="Bench", slug="bench-recommendations")
+            products = Product.objects.bulk_create([
+                Product(seller=seller, category=category, title=f"Bench {n}", description="-",
+                        slug=f"bench-rec-{n}", base_price=1000, effective_min_price=1000,
+                        effective_max_price=1000, verification_status='approved')
+                for n in range(n_products)
+            ], batch_size=5000)
+            ids = np.array([p.pk for p in products], dtype=np.int64)
+
+            started = time.perf_counter()
+            stored = recommendations.store_neighbors(ids[neighbors[0]], ids[neighbors[1]], neighbors[2])
+            self.stdout.write(f"store: {stored} rows in {time.perf_counter() - started:.2f}s")
+
+            user = create_test_user()
+            viewed = rng.choice(n_products, size=recommendations.RECENT_VIEWS, replace=False)
+            ViewedItem.objects.bulk_create([ViewedItem(user=user, product_id=int(ids[n])) for n in viewed])
+            ViewedItem.objects.filter(user=user).update(viewed_at=timezone.now())
+
+            timings = []
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                recommendations.get_recommendations(user)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"serve: median {statistics.median(timings):.2f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms over {len(timings)} requests"
+            )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _events(rng, n_events, n_users, n_products, interests=3, cluster_size=200):
+        """
+        Users browse a few product clusters; popularity inside a cluster is skewed.
+        Returns 0-based product indexes.
+        """
+        n_clusters = max(1, n_products // cluster_size)
+        preferences = rng.integers(0, n_clusters, size=(n_users, interests))
+        users = rng.integers(0, n_users, size=n_events)
+        clusters = preferences[users, rng.integers(0, interests, size=n_events)]
+        offsets = np.minimum(rng.zipf(1.3, size=n_events) - 1, cluster_size - 1)
+        return users, np.minimum(clusters * cluster_size + offsets, n_products - 1)
@@ -0,0 +1,79 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from catalog import search
+from catalog.models import Brand, Category, Product
+from users.utils import create_test_seller_user
+
+WORDS = [
+    'samsung', 'galaxy', 'iphone', 'tecno', 'infinix', 'charger', 'cable', 'solar', 'panel',
+    'kitenge', 'kanga', 'shoes', 'leather', 'rice', 'cooking', 'oil', 'blender', 'fridge',
+    'television', 'smart', 'radio', 'battery', 'lamp', 'mattress', 'phone', 'case', 'earphones',
+]
+QUERIES = ['samsung galaxy', 'solar panel', 'char', 'kitenge leather', 'zzqx']
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark product search (full-text index vs icontains) at growing catalog sizes. "
+        "Synthetic rows are written inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = WORDS + [f"w{n:05d}" for n in range(5000)]
+        self.stdout.write(f"backend: {search.search_backend() or 'icontains only'}")
+        self.stdout.write(f"{'products':>10} {'query':>16} {'fts ms':>10} {'icontains ms':>14} {'hits':>6}")
+
+        with transaction.atomic():
+            search.ensure_search_index()
+            _, seller = create_test_seller_user()
+            brands = [Brand.objects.create(name=f"Bench {w}", slug=f"bench-{w}") for w in WORDS[:10]]
+            category = Category.objects.create(name="Bench", slug="bench-search")
+            created = 0
+            for size in sorted(options['sizes']):
+                self._create_products(rng, vocabulary, seller, brands, category, created, size)
+                created = size
+                base = Product.objects.filter(is_active=True, verification_status='approved')
+                for text in QUERIES:
+                    fts_ms, hits = self._time(lambda: list(search.search_products(base, text)[:20]), options['repeat'])
+                    like_ms, _ = self._time(
+                        lambda: list(search.icontains_search(base, text).order_by('-created_at')[:20]),
+                        options['repeat']
+                    )
+                    self.stdout.write(f"{size:>10} {text:>16} {fts_ms:>10.2f} {like_ms:>14.2f} {hits:>6}")
+            transaction.set_rollback(True)
+
+    def _create_products(self, rng, vocabulary, seller, brands, category, start, stop, batch_size=5000):
+        for offset in range(start, stop, batch_size):
+            batch = []
+            for n in range(offset, min(offset + batch_size, stop)):
+                title = ' '.join(rng.choices(vocabulary, k=4))
+                brand = rng.choice(brands)
+                description = ' '.join(rng.choices(vocabulary, k=40))
+                price = rng.randint(1_000, 2_000_000)
+                batch.append(Product(
+                    seller=seller, category=category, brand=brand,
+                    title=title, slug=f"bench-{n}", description=description,
+                    base_price=price, effective_min_price=price, effective_max_price=price,
+                    verification_status='approved',
+                ))
+            products = Product.objects.bulk_create(batch)
+            search.index_products([p.pk for p in products])
+
+    @staticmethod
+    def _time(fn, repeat):
+        timings = []
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), len(result)
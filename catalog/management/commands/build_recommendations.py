@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from catalog import recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild the item-to-item neighbor table from views, wishlists and purchases"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', '--neighbors', type=int, default=recommendations.DEFAULT_NEIGHBORS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = recommendations.build_neighbor_table(k=options['neighbors'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} neighbors in {elapsed:.1f}s"))
@@ -0,0 +1,39 @@
+import json
+import urllib.request
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from kkoo import surrogate
+
+
+class Command(BaseCommand):
+    help = "Drain the surrogate-key purge queue and send it to SURROGATE_PURGE_URL (or print it)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List queued keys without draining")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for key in surrogate.pending_purges():
+                self.stdout.write(key)
+            return
+
+        keys = surrogate.drain_purges()
+        if not keys:
+            self.stdout.write("Nothing to purge")
+            return
+
+        url = getattr(settings, 'SURROGATE_PURGE_URL', None)
+        if url:
+            request = urllib.request.Request(
+                url, data=json.dumps({'surrogate_keys': keys}).encode(),
+                headers={'Content-Type': 'application/json'}, method='POST'
+            )
+            try:
+                urllib.request.urlopen(request, timeout=10).close()
+            except OSError:
+                surrogate.queue_purge(*keys)  # keep them for the next run
+                raise
+        else:
+            for key in keys:
+                self.stdout.write(key)
+        self.stdout.write(self.style.SUCCESS(f"Purged {len(keys)} surrogate keys"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from catalog import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search shadow table from scratch"
+
+    def handle(self, *args, **options):
+        backend = search.search_backend()
+        if not backend:
+            self.stdout.write(self.style.WARNING("No full-text backend available – search uses icontains"))
+            return
+        count = search.rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products ({backend})"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from catalog.prices import refresh_all_price_ranges
+
+
+class Command(BaseCommand):
+    help = "Recompute Product.effective_min_price / effective_max_price for every product"
+
+    def handle(self, *args, **options):
+        count = refresh_all_price_ranges()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed price ranges of {count} products"))
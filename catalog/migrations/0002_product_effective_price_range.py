@@ -0,0 +1,70 @@
+# Generated by Django 5.2 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import F, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 2000
+
+
+def backfill_price_ranges(apps, schema_editor):
+    """
+    Same range as catalog.prices.refresh_price_ranges, on the historical models.
+    """
+    Product = apps.get_model('catalog', 'Product')
+    SKU = apps.get_model('catalog', 'SKU')
+
+    def sku_range(aggregate):
+        return Subquery(
+            SKU.objects.filter(product=OuterRef('pk'), is_available=True)
+            .values('product')
+            .annotate(price=aggregate(Coalesce('price_override', 'product__discount_price', 'product__base_price')))
+            .values('price')[:1]
+        )
+
+    own = Coalesce(F('discount_price'), F('base_price'))
+    product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(product_ids), BATCH_SIZE):
+        Product.objects.filter(pk__in=product_ids[start:start + BATCH_SIZE]).update(
+            effective_min_price=Coalesce(sku_range(Min), own),
+            effective_max_price=Coalesce(sku_range(Max), own),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_min_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_max_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.RunPython(backfill_price_ranges, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='effective_min_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='effective_max_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'is_active', 'effective_min_price'], name='catalog_pro_categor_7382dd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'is_active', 'effective_max_price'], name='catalog_pro_categor_09766c_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_surrogatepurge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductNeighbor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('built_at', models.DateTimeField(auto_now_add=True)),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='catalog.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-score'], name='catalog_pro_product_9d7bdd_idx')],
+                'unique_together': {('product', 'neighbor')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_productneighbor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sku',
+            name='reserved_quantity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from users.models import SellerProfile, User  # Top-level import (adjust if needed)
+from .prices import price_range
 
 
 class Category(models.Model):
@@ -16,12 +18,27 @@ class Category(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Path as stored, to re-path descendants when this node moves
+        instance._loaded_path = instance.__dict__.get('path')
+        return instance
+
     def save(self, *args, **kwargs):
+        from .tree import repath_subtree
+        old_path = getattr(self, '_loaded_path', None)
         if self.parent:
+            if old_path and self.parent.path.startswith(old_path):
+                raise ValidationError("A category cannot be moved under itself or its descendants")
             self.path = f"{self.parent.path}{self.slug}/"
         else:
             self.path = f"/{self.slug}/"
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if old_path and old_path != self.path:
+                repath_subtree(old_path, self.path)
+        self._loaded_path = self.path
 
     def __str__(self):
         return self.name
@@ -73,6 +90,9 @@ class Product(models.Model):
     slug = models.SlugField(max_length=255, unique=True)
     base_price = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
     discount_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Buyer price range over available SKUs – maintained, never set directly (see catalog.prices)
+    effective_min_price = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
+    effective_max_price = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
     weight_kg = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     dimensions = models.CharField(max_length=100, blank=True)
     verification_status = models.CharField(
@@ -86,6 +106,40 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_membership = instance.membership_key()
+        instance._loaded_slug = instance.__dict__.get('slug')
+        instance._loaded_prices = instance.price_key()
+        return instance
+
+    def price_key(self):
+        return (self.__dict__.get('base_price'), self.__dict__.get('discount_price'))
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        prices_written = update_fields is None or {'base_price', 'discount_price'} & set(update_fields)
+        if prices_written and (self._state.adding or getattr(self, '_loaded_prices', None) != self.price_key()):
+            overrides = [] if self._state.adding else self.skus.filter(is_available=True).values_list(
+                'price_override', flat=True
+            )
+            self.effective_min_price, self.effective_max_price = price_range(self, overrides)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'effective_min_price', 'effective_max_price'}
+        super().save(*args, **kwargs)
+        self._loaded_prices = self.price_key()
+
+    def membership_key(self):
+        """
+        What decides where (and whether) the product is listed in the category tree.
+        """
+        return (
+            self.__dict__.get('category_id'),
+            self.__dict__.get('is_active'),
+            self.__dict__.get('verification_status'),
+        )
+
     def __str__(self):
         return self.title
 
@@ -97,6 +151,8 @@ class Product(models.Model):
             models.Index(fields=['brand', 'is_active', 'verification_status']),
             models.Index(fields=['slug']),
             models.Index(fields=['verification_status', 'created_at']),
+            models.Index(fields=['category', 'is_active', 'effective_min_price']),
+            models.Index(fields=['category', 'is_active', 'effective_max_price']),
         ]
         # Django 6.0 syntax: condition= (not check=)
         constraints = [
@@ -115,9 +171,31 @@ class SKU(models.Model):
     sku_code = models.CharField(max_length=50, unique=True)
     variant_attributes = models.JSONField(default=dict)
     stock_quantity = models.PositiveIntegerField(default=0)
+    # Units held for unpaid orders (orders.reservations) – kept in step with the holds
+    reserved_quantity = models.PositiveIntegerField(default=0, editable=False)
     price_override = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     is_available = models.BooleanField(default=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_pricing = instance.pricing_key()
+        return instance
+
+    def pricing_key(self):
+        """
+        What the product's effective price range depends on.
+        """
+        return (
+            self.__dict__.get('product_id'),
+            self.__dict__.get('price_override'),
+            self.__dict__.get('is_available'),
+        )
+
+    @property
+    def available_quantity(self):
+        return max(self.stock_quantity - self.reserved_quantity, 0)
+
     def __str__(self):
         return f"{self.product.title} - {self.sku_code}"
 
@@ -172,12 +250,70 @@ class StockSnapshot(models.Model):
 class ViewedItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='viewed_items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    viewed_at = models.DateTimeField(default=timezone.now)  # set when buffered, not when flushed (catalog.tracking)
     search_query = models.CharField(max_length=255, blank=True)  # Optional: tie to search
 
     class Meta:
         unique_together = ('user', 'product')
         ordering = ['-viewed_at']
+        indexes = [models.Index(fields=['user', '-viewed_at'])]  # recent views (recommendations)
+
+    def __str__(self):
+        return f"{self.user} viewed {self.product.title}"
+
+class ProductNeighbor(models.Model):
+    """
+    Precomputed item-to-item neighbors (top-K per product), rebuilt offline
+    by `manage.py build_recommendations` (see catalog.recommendations).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    built_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('product', 'neighbor')
+        indexes = [models.Index(fields=['product', '-score'])]
+
+    def __str__(self):
+        return f"{self.product_id} → {self.neighbor_id} ({self.score:.3f})"
+
+
+class SurrogatePurge(models.Model):
+    """
+    Surrogate key waiting to be purged from the CDN / reverse proxy (kkoo.surrogate).
+    """
+    key = models.CharField(max_length=255, unique=True)
+    queued_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
-        return f"{self.user} viewed {self.product.title}"
\ No newline at end of file
+        return self.key
+
+
+class ProductFTSEntry(models.Model):
+    """
+    Row of the SQLite FTS5 shadow table (catalog.search). Unmanaged: the table is
+    created by search.ensure_search_index(); mapped only so searches can join it.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='fts_entry'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'catalog_product_fts'
+
+
+class ProductSearchDocument(models.Model):
+    """
+    Row of the PostgreSQL tsvector shadow table (catalog.search), unmanaged like ProductFTSEntry.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.DO_NOTHING, primary_key=True,
+        db_constraint=False, related_name='search_document'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'catalog_product_search'
@@ -0,0 +1,31 @@
+from kkoo.pagination import EstimatedCountCursorPagination
+
+
+class ProductCursorPagination(EstimatedCountCursorPagination):
+    """
+    Newest first, on the (…, created_at) product indexes.
+    ?sort=price / -price pages through the stored effective_min_price instead,
+    and full-text searches through relevance order (see catalog.search).
+    """
+    ordering = ('-created_at', '-id')
+    sort_query_param = 'sort'
+    sort_orderings = {
+        'price': ('effective_min_price', 'id'),
+        '-price': ('-effective_min_price', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        sort = self.sort_orderings.get(request.query_params.get(self.sort_query_param))
+        if sort:
+            return sort
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', '-created_at', '-id')
+        return super().get_ordering(request, queryset, view)
+
+
+class CategoryCursorPagination(EstimatedCountCursorPagination):
+    ordering = ('name', 'id')
+
+
+class MediaCursorPagination(EstimatedCountCursorPagination):
+    ordering = ('-uploaded_at', '-id')
@@ -0,0 +1,65 @@
+"""
+Denormalized buyer price range on Product.
+
+The price a buyer pays for a variant is its `price_override`, else the product's
+`discount_price`, else `base_price`. Product.effective_min_price / effective_max_price
+hold the range over available SKUs (the product's own price when it has none), so
+price filters and sorts are index range scans instead of SKU aggregates.
+
+Kept current by Product.save (own price changes) and catalog.signals (SKU writes);
+`manage.py refresh_price_ranges` rebuilds every row.
+"""
+from django.db.models import F, Min, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+REFRESH_BATCH_SIZE = 2000
+
+
+def own_price(product):
+    return product.discount_price if product.discount_price is not None else product.base_price
+
+
+def sku_price(sku, product=None):
+    if sku.price_override is not None:
+        return sku.price_override
+    return own_price(product or sku.product)
+
+
+def price_range(product, overrides):
+    """
+    (min, max) from the product's own price and the price_override of each available SKU.
+    """
+    own = own_price(product)
+    prices = [own if override is None else override for override in overrides] or [own]
+    return min(prices), max(prices)
+
+
+def _sku_range(aggregate):
+    from .models import SKU
+    return Subquery(
+        SKU.objects.filter(product=OuterRef('pk'), is_available=True)
+        .values('product')
+        .annotate(price=aggregate(Coalesce('price_override', 'product__discount_price', 'product__base_price')))
+        .values('price')[:1]
+    )
+
+
+def refresh_price_ranges(product_ids):
+    """
+    Recompute the stored range for the given products, one UPDATE per batch.
+    """
+    from .models import Product
+    product_ids = list(product_ids)
+    own = Coalesce(F('discount_price'), F('base_price'))
+    updated = 0
+    for start in range(0, len(product_ids), REFRESH_BATCH_SIZE):
+        updated += Product.objects.filter(pk__in=product_ids[start:start + REFRESH_BATCH_SIZE]).update(
+            effective_min_price=Coalesce(_sku_range(Min), own),
+            effective_max_price=Coalesce(_sku_range(Max), own),
+        )
+    return updated
+
+
+def refresh_all_price_ranges():
+    from .models import Product
+    return refresh_price_ranges(Product.objects.order_by('id').values_list('id', flat=True).iterator())
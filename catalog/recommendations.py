@@ -0,0 +1,202 @@
+"""
+Item-to-item recommendations.
+
+Offline (`manage.py build_recommendations`):
+- interactions from ViewedItem, Wishlist and OrderItem become one weighted
+  user × product matrix (the strongest signal per pair wins)
+- co-occurrence is computed with NumPy over per-user item groups, in chunks,
+  and normalized to cosine similarity
+- the top-K neighbors of every product are written to ProductNeighbor
+
+Online (RecommendationView): the neighbor lists of the user's recent views are
+merged in memory, weighted by recency – two indexed queries plus one for the products.
+"""
+import heapq
+from collections import defaultdict
+from django.db import transaction
+
+VIEW_WEIGHT, WISHLIST_WEIGHT, PURCHASE_WEIGHT = 1.0, 2.0, 3.0
+
+DEFAULT_NEIGHBORS = 20
+MAX_ITEMS_PER_USER = 50      # strongest interactions only: bounds the pairs per user at 50²
+PAIR_CHUNK_SIZE = 4_000_000  # pairs materialized at once
+STORE_BATCH_SIZE = 5000
+
+RECENT_VIEWS = 20
+RECENCY_DECAY = 0.9
+
+
+def load_interactions():
+    """
+    (user_ids, product_ids, weights) as NumPy arrays, one row per interaction.
+    """
+    import numpy as np
+    from cart.models import Wishlist
+    from orders.models import OrderItem
+    from .models import SKU, ViewedItem
+
+    users, products, weights = [], [], []
+
+    def extend(rows, weight):
+        for user_id, product_id in rows:
+            users.append(user_id)
+            products.append(product_id)
+            weights.append(weight)
+
+    extend(ViewedItem.objects.values_list('user_id', 'product_id').iterator(chunk_size=10_000), VIEW_WEIGHT)
+    extend(Wishlist.objects.values_list('user_id', 'product_id').iterator(chunk_size=10_000), WISHLIST_WEIGHT)
+
+    # Order items only keep a snapshot: resolve sku_code → product
+    purchases = list(
+        OrderItem.objects.exclude(order__status__in=['cancelled', 'refunded'])
+        .values_list('order__user_id', 'sku_snapshot__sku_code')
+    )
+    codes = list({code for _, code in purchases if code})
+    sku_products = {}
+    for start in range(0, len(codes), STORE_BATCH_SIZE):
+        sku_products.update(
+            SKU.objects.filter(sku_code__in=codes[start:start + STORE_BATCH_SIZE]).values_list('sku_code', 'product_id')
+        )
+    extend(((user_id, sku_products[code]) for user_id, code in purchases if code in sku_products), PURCHASE_WEIGHT)
+
+    return (
+        np.array(users, dtype=np.int64),
+        np.array(products, dtype=np.int64),
+        np.array(weights, dtype=np.float64),
+    )
+
+
+def _group_bounds(sorted_keys):
+    import numpy as np
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(sorted_keys)])
+    return starts, sizes
+
+
+def _rank_within_groups(sorted_keys):
+    import numpy as np
+    starts, sizes = _group_bounds(sorted_keys)
+    return np.arange(len(sorted_keys)) - np.repeat(starts, sizes)
+
+
+def compute_neighbors(user_ids, product_ids, weights, k=DEFAULT_NEIGHBORS, candidates=None):
+    """
+    Top-k cosine neighbors per product from weighted interactions.
+    `candidates` (optional product ids) restricts which products may be recommended.
+    Returns (product_ids, neighbor_ids, scores) arrays, best first per product.
+    """
+    import numpy as np
+    empty = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64))
+    if not len(product_ids):
+        return empty
+
+    items, item_idx = np.unique(np.asarray(product_ids, dtype=np.int64), return_inverse=True)
+    _, user_idx = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+    weights = np.asarray(weights, dtype=np.float64)
+    n_items = len(items)
+
+    # One entry per (user, item), strongest signal wins
+    key = user_idx.astype(np.int64) * n_items + item_idx
+    order = np.lexsort((-weights, key))
+    key, weights = key[order], weights[order]
+    first = np.r_[True, key[1:] != key[:-1]]
+    key, weights = key[first], weights[first]
+    user_idx, item_idx = key // n_items, key % n_items
+
+    # Keep each user's strongest MAX_ITEMS_PER_USER interactions (already grouped by user)
+    order = np.lexsort((-weights, user_idx))
+    user_idx, item_idx, weights = user_idx[order], item_idx[order], weights[order]
+    keep = _rank_within_groups(user_idx) < MAX_ITEMS_PER_USER
+    user_idx, item_idx, weights = user_idx[keep], item_idx[keep], weights[keep]
+
+    norms = np.sqrt(np.bincount(item_idx, weights=weights ** 2, minlength=n_items))
+    allowed = np.isin(items, candidates) if candidates is not None else np.ones(n_items, dtype=bool)
+
+    # Co-occurrence: every ordered pair of items inside a user's group, chunked by pair count
+    starts, sizes = _group_bounds(user_idx)
+    cost = np.cumsum(sizes.astype(np.int64) ** 2)
+    pair_keys, pair_weights = [], []
+    group = 0
+    while group < len(starts):
+        end = max(group + 1, int(np.searchsorted(cost, (cost[group - 1] if group else 0) + PAIR_CHUNK_SIZE, 'right')))
+        lo = starts[group]
+        hi = starts[end] if end < len(starts) else len(item_idx)
+        chunk_sizes = sizes[group:end]
+        chunk_starts = starts[group:end] - lo
+        per_element = np.repeat(chunk_sizes, chunk_sizes)
+        left = np.repeat(np.arange(hi - lo), per_element)
+        right = (np.repeat(np.repeat(chunk_starts, chunk_sizes), per_element)
+                 + np.arange(len(left)) - np.repeat(np.cumsum(per_element) - per_element, per_element))
+        items_left, items_right = item_idx[lo:hi][left], item_idx[lo:hi][right]
+        mask = (items_left != items_right) & allowed[items_right]
+        keys = items_left[mask] * n_items + items_right[mask]
+        values = weights[lo:hi][left][mask] * weights[lo:hi][right][mask]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        pair_keys.append(unique_keys)
+        pair_weights.append(np.bincount(inverse, weights=values))
+        group = end
+
+    keys = np.concatenate(pair_keys)
+    if not len(keys):
+        return empty
+    keys, inverse = np.unique(keys, return_inverse=True)
+    co_weights = np.bincount(inverse, weights=np.concatenate(pair_weights))
+    left, right = keys // n_items, keys % n_items
+    scores = co_weights / (norms[left] * norms[right])
+
+    order = np.lexsort((-scores, left))
+    left, right, scores = left[order], right[order], scores[order]
+    keep = _rank_within_groups(left) < k
+    return items[left[keep]], items[right[keep]], scores[keep]
+
+
+def store_neighbors(product_ids, neighbor_ids, scores):
+    """
+    Replace the whole neighbor table. Returns the number of rows written.
+    """
+    from .models import ProductNeighbor
+    with transaction.atomic():
+        ProductNeighbor.objects.all().delete()
+        rows = [
+            ProductNeighbor(product_id=int(product_id), neighbor_id=int(neighbor_id), score=float(score))
+            for product_id, neighbor_id, score in zip(product_ids, neighbor_ids, scores)
+        ]
+        ProductNeighbor.objects.bulk_create(rows, batch_size=STORE_BATCH_SIZE)
+    return len(rows)
+
+
+def build_neighbor_table(k=DEFAULT_NEIGHBORS):
+    from .models import Product
+    user_ids, product_ids, weights = load_interactions()
+    listable = list(Product.objects.filter(is_active=True, verification_status='approved').values_list('id', flat=True))
+    return store_neighbors(*compute_neighbors(user_ids, product_ids, weights, k=k, candidates=listable))
+
+
+def get_recommendations(user, limit=12):
+    """
+    Merge the neighbor lists of the user's recent views; newest views count most.
+    Falls back to the newest listable products when there is not enough history.
+    """
+    from .models import Product, ProductNeighbor, ViewedItem
+    listable = Product.objects.filter(is_active=True, verification_status='approved')
+
+    recent = list(
+        ViewedItem.objects.filter(user=user).order_by('-viewed_at').values_list('product_id', flat=True)[:RECENT_VIEWS]
+    )
+    recency = {product_id: RECENCY_DECAY ** position for position, product_id in enumerate(recent)}
+    scores = defaultdict(float)
+    if recent:
+        rows = ProductNeighbor.objects.filter(product_id__in=recent).values_list('product_id', 'neighbor_id', 'score')
+        for product_id, neighbor_id, score in rows:
+            if neighbor_id not in recency:
+                scores[neighbor_id] += score * recency[product_id]
+
+    # A few spare candidates in case some were deactivated since the last build
+    ranked = heapq.nlargest(limit * 2, scores, key=scores.__getitem__)
+    products = listable.order_by().in_bulk(ranked)
+    recommended = [products[pk] for pk in ranked if pk in products][:limit]
+
+    if len(recommended) < limit:
+        exclude = set(recency) | {product.pk for product in recommended}
+        recommended += list(listable.exclude(pk__in=exclude).order_by('-created_at')[:limit - len(recommended)])
+    return recommended
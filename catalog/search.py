@@ -0,0 +1,191 @@
+"""
+Full-text product search.
+
+Products are mirrored into a shadow table that only holds searchable text:
+- SQLite: FTS5 virtual table `catalog_product_fts` (rowid = product id), ranked with bm25()
+- PostgreSQL: `catalog_product_search` with a weighted tsvector + GIN index, ranked with ts_rank_cd()
+Any other backend (or SQLite built without FTS5) falls back to the icontains scan.
+
+The shadow table is kept in sync by catalog.signals (Product / Brand writes)
+and can be rebuilt with `manage.py rebuild_search_index`. Writes that send no
+signals – queryset.update() or bulk_create() of a title, description or
+brand – must call index_products() for the rows they change.
+"""
+import re
+from django.db import connection, DatabaseError
+from django.db.models import Q, BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'catalog_product_fts'
+PG_TABLE = 'catalog_product_search'
+
+# Column weights: title matters most, then brand, then description
+TITLE_WEIGHT, BRAND_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 5.0, 1.0
+
+REINDEX_BATCH_SIZE = 2000
+MAX_QUERY_TERMS = 8
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_fts5_available = None
+
+
+def search_backend():
+    """
+    'fts5', 'postgres' or None (icontains fallback)
+    """
+    global _fts5_available
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor != 'sqlite':
+        return None
+    if _fts5_available is None:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+                _fts5_available = bool(cursor.fetchone()[0])
+        except DatabaseError:
+            _fts5_available = False
+    return 'fts5' if _fts5_available else None
+
+
+def ensure_search_index():
+    """
+    Create the shadow table if missing. Safe to call repeatedly (post_migrate).
+    """
+    backend = search_backend()
+    with connection.cursor() as cursor:
+        if backend == 'fts5':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "title, brand, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+            )
+        elif backend == 'postgres':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+                "product_id bigint PRIMARY KEY REFERENCES catalog_product(id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_gin ON {PG_TABLE} USING GIN (document)"
+            )
+
+
+def _search_rows(product_ids):
+    from .models import Product
+    return Product.objects.filter(id__in=product_ids).values_list('id', 'title', 'brand__name', 'description')
+
+
+def index_products(product_ids):
+    """
+    Upsert the shadow rows for the given products.
+    """
+    product_ids = list(product_ids)
+    backend = search_backend()
+    if not backend or not product_ids:
+        return
+    for start in range(0, len(product_ids), REINDEX_BATCH_SIZE):
+        chunk = product_ids[start:start + REINDEX_BATCH_SIZE]
+        rows = [(pk, title, brand or '', description) for pk, title, brand, description in _search_rows(chunk)]
+        with connection.cursor() as cursor:
+            if backend == 'fts5':
+                placeholders = ','.join(['%s'] * len(chunk))
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+                cursor.executemany(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, brand, description) VALUES (%s, %s, %s, %s)",
+                    rows
+                )
+            else:
+                cursor.executemany(
+                    f"INSERT INTO {PG_TABLE} (product_id, document) VALUES (%s, "
+                    "setweight(to_tsvector('simple', %s), 'A') || "
+                    "setweight(to_tsvector('simple', %s), 'B') || "
+                    "setweight(to_tsvector('simple', %s), 'C')) "
+                    "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                    rows
+                )
+
+
+def remove_products(product_ids):
+    product_ids = list(product_ids)
+    backend = search_backend()
+    if not backend or not product_ids:
+        return
+    placeholders = ','.join(['%s'] * len(product_ids))
+    table, key = (FTS_TABLE, 'rowid') if backend == 'fts5' else (PG_TABLE, 'product_id')
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({placeholders})", product_ids)
+
+
+def rebuild_search_index():
+    """
+    Drop and re-fill the shadow table from Product. Returns the number of rows indexed.
+    """
+    from .models import Product
+    backend = search_backend()
+    if not backend:
+        return 0
+    ensure_search_index()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE if backend == 'fts5' else PG_TABLE}")
+    ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+    index_products(ids)
+    if backend == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return len(ids)
+
+
+def query_terms(text):
+    return _TOKEN_RE.findall(text or '')[:MAX_QUERY_TERMS]
+
+
+def build_match_query(text, backend):
+    """
+    Every term must match, each as a prefix ("sams gal" → samsung galaxy).
+    Terms are reduced to word characters so user input can never inject query syntax.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return None
+    if backend == 'fts5':
+        return ' AND '.join(f'"{term}"*' for term in terms)
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def icontains_search(queryset, text):
+    return queryset.filter(
+        Q(title__icontains=text) |
+        Q(description__icontains=text) |
+        Q(brand__name__icontains=text)
+    )
+
+
+def search_products(queryset, text):
+    """
+    Restrict a Product queryset to full-text matches, annotated with `search_rank`
+    (higher is better) and ordered by relevance, newest first on ties.
+    """
+    backend = search_backend()
+    match = build_match_query(text, backend)
+    if not match:
+        return queryset
+    if backend is None:
+        return icontains_search(queryset, text).order_by('-created_at', '-id')
+
+    # Joined through the unmanaged shadow-table models: the index drives the query
+    if backend == 'fts5':
+        queryset = queryset.filter(
+            RawSQL(f'{FTS_TABLE} MATCH %s', (match,), output_field=BooleanField()), fts_entry__isnull=False
+        ).annotate(search_rank=RawSQL(
+            f'-bm25({FTS_TABLE}, %s, %s, %s)', (TITLE_WEIGHT, BRAND_WEIGHT, DESCRIPTION_WEIGHT),
+            output_field=FloatField()
+        ))
+    else:
+        queryset = queryset.filter(
+            RawSQL(f"{PG_TABLE}.document @@ to_tsquery('simple', %s)", (match,), output_field=BooleanField()),
+            search_document__isnull=False,
+        ).annotate(search_rank=RawSQL(
+            f"ts_rank_cd({PG_TABLE}.document, to_tsquery('simple', %s))", (match,),
+            output_field=FloatField()
+        ))
+    return queryset.order_by('-search_rank', '-created_at', '-id')
@@ -24,10 +24,12 @@ class ProductMediaSerializer(serializers.ModelSerializer):
 
 class SKUSerializer(serializers.ModelSerializer):
     variant_attributes = serializers.JSONField()
+    available_quantity = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = SKU
-        fields = ['id', 'sku_code', 'variant_attributes', 'stock_quantity', 'price_override', 'is_available']
+        fields = ['id', 'sku_code', 'variant_attributes', 'stock_quantity', 'available_quantity',
+                  'price_override', 'is_available']
         read_only_fields = ['is_available']
 
 
@@ -46,12 +48,16 @@ class ProductListSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'title', 'slug', 'base_price', 'discount_price',
-            'brand', 'category', 'verification_status', 'is_active',
+            'effective_min_price', 'effective_max_price', 'brand', 'category', 'verification_status', 'is_active',
             'created_at', 'primary_media'
         ]
 
     def get_primary_media(self, obj):
-        primary = obj.media.filter(is_primary=True).first()
+        # ProductListView prefetches verified primary media in bulk (to_attr below)
+        if hasattr(obj, 'verified_primary_media'):
+            primary = obj.verified_primary_media[0] if obj.verified_primary_media else None
+        else:
+            primary = obj.media.filter(is_primary=True, is_verified=True).first()
         return ProductMediaSerializer(primary).data if primary else None
 
 
@@ -111,6 +117,12 @@ class ViewedItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = ViewedItem
         fields = ['id', 'product', 'viewed_at', 'search_query']
+        read_only_fields = ['viewed_at']
+
+
+class ViewEventSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    search_query = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
 
 
 class RecommendationSerializer(serializers.ModelSerializer):
@@ -0,0 +1,129 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import Brand, Category, Product, SKU, ProductMedia, ProductSpecification
+from . import search, tree
+from .prices import refresh_price_ranges
+from .cache import invalidate_product_listing, invalidate_product_detail, invalidate_categories, invalidate_brands
+
+SEARCH_FIELDS = {'title', 'description', 'brand', 'brand_id'}
+
+
+def create_search_index(sender, **kwargs):
+    search.ensure_search_index()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand_products(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and 'name' not in update_fields):
+        return
+    search.index_products(instance.products.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Brand)
+def remember_brand_products(sender, instance, **kwargs):
+    # Product.brand is set to NULL in SQL, without Product signals: reindex them once it is
+    instance._search_product_ids = list(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Brand)
+def reindex_unbranded_products(sender, instance, **kwargs):
+    search.index_products(getattr(instance, '_search_product_ids', []))
+
+
+# Product listing caches (facets, …)
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def product_listing_changed(sender, instance, **kwargs):
+    invalidate_product_listing()
+
+
+# Category tree cache: only categories and product membership matter
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    tree.invalidate_tree()
+    invalidate_categories()
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # Children were detached by SET_NULL: they become roots, so re-path their subtrees
+    orphans = Category.objects.filter(tree.subtree_q(instance.path), parent__isnull=True)
+    for child in orphans:
+        child.save(update_fields=['path'])
+    tree.invalidate_tree()
+    invalidate_categories()
+
+
+@receiver(post_save, sender=Product)
+def product_membership_changed(sender, instance, created, **kwargs):
+    membership = instance.membership_key()
+    if created or membership != getattr(instance, '_loaded_membership', None):
+        tree.invalidate_tree()
+    instance._loaded_membership = membership
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    tree.invalidate_tree()
+
+
+# Product detail cache: bump the per-product version
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_detail_changed(sender, instance, **kwargs):
+    # The old slug too: its cached payload must not outlive a rename
+    invalidate_product_detail(instance.slug, getattr(instance, '_loaded_slug', None))
+    instance._loaded_slug = instance.slug
+
+
+# Product.effective_min/max_price: only SKU price, availability or owner matter
+
+@receiver(post_save, sender=SKU)
+def sku_pricing_changed(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_pricing', None)
+    current = instance.pricing_key()
+    if created or loaded != current:
+        # A moved SKU changes the range of both products
+        refresh_price_ranges({current[0], loaded[0] if loaded else current[0]})
+    instance._loaded_pricing = current
+
+
+@receiver(post_delete, sender=SKU)
+def sku_deleted(sender, instance, **kwargs):
+    refresh_price_ranges([instance.product_id])
+
+
+@receiver(post_save, sender=SKU)
+@receiver(post_delete, sender=SKU)
+@receiver(post_save, sender=ProductMedia)
+@receiver(post_delete, sender=ProductMedia)
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def product_part_changed(sender, instance, **kwargs):
+    invalidate_product_detail(*Product.objects.filter(pk=instance.product_id).values_list('slug', flat=True))
+    if sender is not ProductSpecification:
+        invalidate_product_listing()  # primary media / prices show in the list
+
+
+@receiver(post_save, sender=Brand)
+@receiver(pre_delete, sender=Brand)
+def brand_products_changed(sender, instance, **kwargs):
+    invalidate_product_detail(*instance.products.values_list('slug', flat=True))
+    invalidate_brands()
@@ -1,8 +1,21 @@
+import threading
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
-from users.tests.utils import create_test_user, create_test_seller_user
-from .models import Category, Brand, Product
+from rest_framework.test import APITestCase, APIClient
+from users.utils import create_test_user, create_test_seller_user
+from cart.models import Wishlist
+from .models import Category, Brand, Product, ProductMedia, SKU, ViewedItem, ProductNeighbor
+from .recommendations import compute_neighbors, build_neighbor_table
+from .search import search_products, search_backend
+from .tracking import ViewBuffer, view_buffer
+from kkoo.cache import stats as cache_stats
+from kkoo.surrogate import pending_purges, drain_purges, queue_purge
 
 
 class ProductListViewTests(APITestCase):
@@ -52,6 +65,82 @@ class ProductListViewTests(APITestCase):
         self.assertEqual(len(response.data['results']), 1)
 
 
+class ProductListQueryCountTests(APITestCase):
+    def setUp(self):
+        _, self.seller_profile = create_test_seller_user()
+        self.category = Category.objects.create(name="Phones", slug="phones")
+        self.brand = Brand.objects.create(name="Tecno", slug="tecno", is_verified=True)
+
+    def _add_products(self, count):
+        for _ in range(count):
+            n = Product.objects.count()
+            product = Product.objects.create(
+                seller=self.seller_profile, category=self.category, brand=self.brand,
+                title=f"Phone {n}", description="Dual SIM", slug=f"phone-{n}",
+                base_price=250000, verification_status='approved'
+            )
+            ProductMedia.objects.create(product=product, file=f"p{n}.jpg", is_primary=True, is_verified=True)
+            ProductMedia.objects.create(product=product, file=f"p{n}-b.jpg")
+
+    def _list_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('catalog:product_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_query_count_is_constant_for_any_page_size(self):
+        self._add_products(1)
+        small, _ = self._list_query_count()
+        self._add_products(9)
+        large, _ = self._list_query_count()
+        self.assertEqual(small, large)
+
+    def test_only_verified_primary_media_is_returned(self):
+        self._add_products(1)
+        product = Product.objects.get()
+        product.media.filter(is_primary=True).update(is_verified=False)
+        _, response = self._list_query_count()
+        self.assertIn('"primary_media":null', response.content.decode().replace(' ', ''))
+
+
+class ProductListPaginationTests(APITestCase):
+    def setUp(self):
+        _, self.seller_profile = create_test_seller_user()
+        for n in range(7):
+            Product.objects.create(
+                seller=self.seller_profile, title=f"Solar lamp {n}", description="Rechargeable" + " lamp" * n,
+                slug=f"solar-lamp-{n}", base_price=15000, verification_status='approved'
+            )
+
+    def _collect(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item['slug'] for item in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_cursor_walks_every_product_once_newest_first(self):
+        slugs = self._collect(reverse('catalog:product_list') + '?page_size=3')
+        self.assertEqual(slugs, [f"solar-lamp-{n}" for n in reversed(range(7))])
+
+    def test_cursor_walks_search_results_in_relevance_order(self):
+        url = reverse('catalog:product_list') + '?search=lamp&page_size=2'
+        expected = list(
+            search_products(Product.objects.all(), 'lamp').values_list('slug', flat=True)
+        )
+        self.assertEqual(self._collect(url), expected)
+        self.assertEqual(len(expected), 7)
+
+    def test_count_only_when_requested(self):
+        url = reverse('catalog:product_list')
+        self.assertNotIn('count', self.client.get(url).data)
+        response = self.client.get(url + '?with_count=1')
+        self.assertEqual(response.data['count'], 7)
+        self.assertFalse(response.data['count_is_estimate'])
+
+
 class ProductCreateViewTests(APITestCase):
     def setUp(self):
         self.client = APIClient()
@@ -103,4 +192,476 @@ class AdminProductVerificationTests(APITestCase):
         self.client.force_authenticate(user=non_admin)
         url = reverse('catalog:admin_product_verify', kwargs={'pk': self.product.pk})
         response = self.client.post(url, {'action': 'approve'})
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        _, self.seller_profile = create_test_seller_user()
+        self.brand = Brand.objects.create(name="Tecno", slug="tecno", is_verified=True)
+        self.title_match = self._product("Solar panel 100W", "Monocrystalline, for rooftops", "solar-panel")
+        self.description_match = self._product("Charge controller", "Pairs with any solar panel kit", "controller")
+        self.other = self._product("Cotton kitenge", "Wax print, six yards", "kitenge", brand=self.brand)
+
+    def _product(self, title, description, slug, brand=None):
+        return Product.objects.create(
+            seller=self.seller_profile, brand=brand, title=title, description=description,
+            slug=slug, base_price=10000, verification_status='approved'
+        )
+
+    def _search(self, text):
+        return list(search_products(Product.objects.all(), text))
+
+    def test_title_match_ranks_above_description_match(self):
+        self.assertEqual(self._search("solar panel"), [self.title_match, self.description_match])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self._search("kiten"), [self.other])
+
+    def test_brand_rename_reindexes_products(self):
+        self.brand.name = "Infinix"
+        self.brand.save()
+        self.assertEqual(self._search("infinix"), [self.other])
+        self.assertEqual(self._search("tecno"), [])
+
+    def test_brand_deletion_reindexes_products(self):
+        self.brand.delete()
+        self.assertEqual(self._search("tecno"), [])
+        self.assertEqual(self._search("kitenge"), [self.other])
+
+    def test_deleted_product_leaves_index(self):
+        self.title_match.delete()
+        self.assertEqual(self._search("solar"), [self.description_match])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self._search('solar" OR "kitenge'), [])
+
+    def test_search_uses_full_text_index(self):
+        self.assertIsNotNone(search_backend())
+
+
+class CategoryTreeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, self.seller_profile = create_test_seller_user()
+        self.electronics = Category.objects.create(name="Electronics", slug="electronics")
+        self.phones = Category.objects.create(name="Phones", slug="phones", parent=self.electronics)
+        self.smartphones = Category.objects.create(name="Smartphones", slug="smartphones", parent=self.phones)
+        self.accessories = Category.objects.create(name="Phone accessories", slug="phones-accessories")
+
+    def _product(self, category, slug):
+        return Product.objects.create(
+            seller=self.seller_profile, category=category, title=slug, description="-",
+            slug=slug, base_price=1000, verification_status='approved'
+        )
+
+    def test_moving_a_node_repaths_its_subtree(self):
+        home = Category.objects.create(name="Home", slug="home")
+        phones = Category.objects.get(pk=self.phones.pk)
+        phones.parent = home
+        phones.save()
+        self.smartphones.refresh_from_db()
+        self.assertEqual(self.smartphones.path, "/home/phones/smartphones/")
+
+    def test_slug_change_repaths_its_subtree(self):
+        electronics = Category.objects.get(pk=self.electronics.pk)
+        electronics.slug = "electronic"
+        electronics.save()
+        self.smartphones.refresh_from_db()
+        self.assertEqual(self.smartphones.path, "/electronic/phones/smartphones/")
+
+    def test_cannot_move_under_own_descendant(self):
+        electronics = Category.objects.get(pk=self.electronics.pk)
+        electronics.parent = self.smartphones
+        with self.assertRaises(ValidationError):
+            electronics.save()
+
+    def test_deleting_a_node_reroots_its_children(self):
+        self.electronics.delete()
+        self.smartphones.refresh_from_db()
+        self.assertEqual(self.smartphones.path, "/phones/smartphones/")
+
+    def test_category_filter_matches_subtree_only(self):
+        phone = self._product(self.smartphones, "tecno-spark")
+        self._product(self.accessories, "charger")
+        response = self.client.get(reverse('catalog:product_list') + '?category=phones')
+        self.assertEqual([p['id'] for p in response.data['results']], [phone.id])
+
+    def test_tree_counts_and_invalidation(self):
+        phone = self._product(self.smartphones, "tecno-spark")
+        self._product(self.phones, "nokia-105")
+        url = reverse('catalog:category_tree')
+        tree = self.client.get(url).json()
+        electronics = next(node for node in tree if node['slug'] == 'electronics')
+        self.assertEqual(electronics['product_count'], 2)
+        self.assertEqual(electronics['children'][0]['children'][0]['product_count'], 1)
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        phone.is_active = False
+        phone.save()
+        tree = self.client.get(url).json()
+        electronics = next(node for node in tree if node['slug'] == 'electronics')
+        self.assertEqual(electronics['product_count'], 1)
+
+
+class ProductFacetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, self.seller_profile = create_test_seller_user()
+        electronics = Category.objects.create(name="Electronics", slug="electronics")
+        phones = Category.objects.create(name="Phones", slug="phones", parent=electronics)
+        fashion = Category.objects.create(name="Fashion", slug="fashion")
+        tecno = Brand.objects.create(name="Tecno", slug="tecno", is_verified=True)
+        nokia = Brand.objects.create(name="Nokia", slug="nokia", is_verified=True)
+        self._product(phones, tecno, "Tecno Spark", 250000)
+        self._product(phones, tecno, "Tecno Pop", 180000, discount_price=95000)
+        self._product(electronics, nokia, "Nokia 105", 45000)
+        self._product(fashion, None, "Kitenge dress", 30000)
+
+    def _product(self, category, brand, title, price, discount_price=None):
+        return Product.objects.create(
+            seller=self.seller_profile, category=category, brand=brand, title=title,
+            description="-", slug=title.lower().replace(' ', '-'), base_price=price,
+            discount_price=discount_price, verification_status='approved'
+        )
+
+    def test_facets_for_full_list(self):
+        facets = self.client.get(reverse('catalog:product_list') + '?facets=1').data['facets']
+        self.assertEqual(
+            [(b['slug'], b['count']) for b in facets['brands']], [('tecno', 2), ('nokia', 1)]
+        )
+        self.assertEqual(
+            [(c['slug'], c['count']) for c in facets['categories']], [('electronics', 3), ('fashion', 1)]
+        )
+        self.assertEqual(
+            [(p['min'], p['count']) for p in facets['price']], [(10000, 2), (50000, 1), (100000, 1)]
+        )
+
+    def test_facets_follow_filters(self):
+        url = reverse('catalog:product_list') + '?facets=1&search=tecno&brand=tecno'
+        facets = self.client.get(url).data['facets']
+        self.assertEqual([(b['slug'], b['count']) for b in facets['brands']], [('tecno', 2)])
+        self.assertEqual([(c['slug'], c['count']) for c in facets['categories']], [('electronics', 2)])
+
+    def test_unfiltered_facets_are_cached_until_products_change(self):
+        url = reverse('catalog:product_list') + '?facets=1'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get(reverse('catalog:product_list'))
+        self.assertEqual(len(cached), len(plain))
+
+        Product.objects.filter(title="Kitenge dress").get().delete()
+        facets = self.client.get(url).data['facets']
+        self.assertEqual([(c['slug'], c['count']) for c in facets['categories']], [('electronics', 3)])
+
+
+class ProductDetailCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        cache_stats.reset()
+        _, self.seller_profile = create_test_seller_user()
+        self.brand = Brand.objects.create(name="Tecno", slug="tecno", is_verified=True)
+        self.product = Product.objects.create(
+            seller=self.seller_profile, brand=self.brand, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=320000, verification_status='approved'
+        )
+        self.sku = SKU.objects.create(product=self.product, sku_code="SPARK20-128", stock_quantity=5)
+        self.url = reverse('catalog:product_detail', kwargs={'slug': self.product.slug})
+
+    def test_second_hit_is_served_from_cache(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['title'], "Tecno Spark 20")
+        self.assertEqual(cache_stats.snapshot()['product_detail'], {'hits': 1, 'misses': 1})
+
+    def test_sku_change_bumps_product_version(self):
+        self.client.get(self.url)
+        self.sku.price_override = 299000
+        self.sku.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['skus'][0]['price_override'], '299000.00')
+
+    def test_brand_change_bumps_product_version(self):
+        self.client.get(self.url)
+        self.brand.name = "Tecno Mobile"
+        self.brand.save()
+        self.assertEqual(self.client.get(self.url).data['brand']['name'], "Tecno Mobile")
+
+    def test_deactivated_product_is_not_served_from_cache(self):
+        self.client.get(self.url)
+        self.product.is_active = False
+        self.product.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_renamed_slug_drops_old_payload(self):
+        self.client.get(self.url)
+        self.product.slug = "tecno-spark-20-pro"
+        self.product.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, self.seller_profile = create_test_seller_user()
+        self.product = Product.objects.create(
+            seller=self.seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=320000, verification_status='approved'
+        )
+        self.detail_url = reverse('catalog:product_detail', kwargs={'slug': self.product.slug})
+        drain_purges()
+
+    def test_matching_etag_is_answered_without_queries(self):
+        for url in (reverse('catalog:product_list'), self.detail_url, reverse('catalog:category_list')):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('Last-Modified', response)
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_with_the_product(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.product.title = "Tecno Spark 20 Pro"
+        self.product.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_query_string(self):
+        url = reverse('catalog:product_list')
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url + '?search=tecno')['ETag'])
+
+    def test_surrogate_keys_are_sent_and_queued_for_purge(self):
+        self.assertEqual(self.client.get(self.detail_url)['Surrogate-Key'], 'product-tecno-spark-20')
+        self.assertIn('products', self.client.get(reverse('catalog:product_list'))['Surrogate-Key'].split())
+
+        self.product.title = "Tecno Spark 20 Pro"
+        self.product.save()
+        self.assertEqual(pending_purges(), ['product-tecno-spark-20', 'products'])
+        self.assertEqual(drain_purges(), ['product-tecno-spark-20', 'products'])
+        self.assertEqual(pending_purges(), [])
+
+    def test_purge_queue_is_one_upsert_in_the_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            queue_purge('products', 'brands', 'products')
+            queue_purge('products')
+        self.assertEqual([q['sql'].split()[0] for q in queries], ['INSERT', 'INSERT'])
+        cache.clear()  # not kept in the (per-process) cache: workers and the purge command share the table
+        self.assertEqual(pending_purges(), ['brands', 'products'])
+
+
+class ProductPriceRangeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, self.seller_profile = create_test_seller_user()
+        self.phone = Product.objects.create(
+            seller=self.seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=320000, verification_status='approved'
+        )
+        self.cheap = Product.objects.create(
+            seller=self.seller_profile, title="Itel A70", description="-",
+            slug="itel-a70", base_price=180000, verification_status='approved'
+        )
+
+    def assertRange(self, product, low, high):
+        product.refresh_from_db()
+        self.assertEqual((product.effective_min_price, product.effective_max_price), (Decimal(low), Decimal(high)))
+
+    def test_new_product_uses_its_own_price(self):
+        self.assertRange(self.phone, 320000, 320000)
+
+    def test_sku_overrides_and_availability_drive_the_range(self):
+        SKU.objects.create(product=self.phone, sku_code="SPARK-128")
+        sku = SKU.objects.create(product=self.phone, sku_code="SPARK-256", price_override=380000)
+        self.assertRange(self.phone, 320000, 380000)
+
+        sku.is_available = False
+        sku.save()
+        self.assertRange(self.phone, 320000, 320000)
+        sku.delete()
+        self.assertRange(self.phone, 320000, 320000)
+
+    def test_product_price_change_recomputes(self):
+        SKU.objects.create(product=self.phone, sku_code="SPARK-128")
+        SKU.objects.create(product=self.phone, sku_code="SPARK-256", price_override=380000)
+        self.phone.discount_price = 299000
+        self.phone.save(update_fields=['discount_price'])
+        self.assertRange(self.phone, 299000, 380000)
+
+    def test_stock_change_does_not_recompute(self):
+        sku = SKU.objects.create(product=self.phone, sku_code="SPARK-128")
+        sku = SKU.objects.get(pk=sku.pk)
+        sku.stock_quantity = 3
+        with CaptureQueriesContext(connection) as queries:
+            sku.save()
+        self.assertFalse([q for q in queries if 'effective_min_price' in q['sql']])
+
+    def test_price_filter_and_sort(self):
+        url = reverse('catalog:product_list')
+        response = self.client.get(url, {'min_price': 200000})
+        self.assertEqual([p['slug'] for p in response.data['results']], ['tecno-spark-20'])
+        response = self.client.get(url, {'max_price': 200000})
+        self.assertEqual([p['slug'] for p in response.data['results']], ['itel-a70'])
+
+        response = self.client.get(url, {'sort': 'price'})
+        self.assertEqual([p['slug'] for p in response.data['results']], ['itel-a70', 'tecno-spark-20'])
+        response = self.client.get(url, {'sort': '-price', 'page_size': 1})
+        self.assertEqual([p['slug'] for p in response.data['results']], ['tecno-spark-20'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([p['slug'] for p in response.data['results']], ['itel-a70'])
+
+
+class RecommendationTests(APITestCase):
+    def setUp(self):
+        _, self.seller_profile = create_test_seller_user()
+        self.products = {
+            slug: Product.objects.create(
+                seller=self.seller_profile, title=slug, description="-", slug=slug,
+                base_price=1000, verification_status='approved'
+            )
+            for slug in ['phone', 'case', 'charger', 'kanga', 'rice']
+        }
+        self.user = create_test_user()
+
+    def view(self, user, *slugs):
+        ViewedItem.objects.bulk_create([ViewedItem(user=user, product=self.products[slug]) for slug in slugs])
+
+    def test_compute_neighbors_ranks_by_cosine_similarity(self):
+        products, neighbors, scores = compute_neighbors(
+            [1, 1, 2, 2, 3, 3, 3], [10, 20, 10, 20, 10, 30, 20], [1] * 7, k=1
+        )
+        top = dict(zip(products.tolist(), neighbors.tolist()))
+        self.assertEqual(top, {10: 20, 20: 10, 30: 10})
+        self.assertAlmostEqual(scores[list(products).index(10)], 1.0)
+
+    def test_build_and_serve(self):
+        for _ in range(3):
+            self.view(create_test_user(), 'phone', 'case', 'charger')
+        self.view(create_test_user(), 'phone', 'kanga')
+        Wishlist.objects.create(user=create_test_user(), product=self.products['phone'])
+        self.assertGreater(build_neighbor_table(k=2), 0)
+        self.assertEqual(
+            set(ProductNeighbor.objects.filter(product=self.products['phone']).values_list('neighbor__slug', flat=True)),
+            {'case', 'charger'}
+        )
+
+        self.view(self.user, 'phone')
+        self.client.force_authenticate(self.user)
+        # recent views, neighbors, products, newest products to fill up to the limit
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('catalog:recommendations'))
+        slugs = [p['slug'] for p in response.data]
+        self.assertEqual(sorted(slugs[:2]), ['case', 'charger'])
+        self.assertNotIn('phone', slugs)
+
+    def test_falls_back_to_newest_products_without_history(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('catalog:recommendations'))
+        self.assertEqual([p['slug'] for p in response.data], ['rice', 'kanga', 'charger', 'case', 'phone'])
+
+
+class ViewTrackingTests(APITestCase):
+    def setUp(self):
+        _, self.seller_profile = create_test_seller_user()
+        self.product = Product.objects.create(
+            seller=self.seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=320000, verification_status='approved'
+        )
+        self.user = create_test_user()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('catalog:viewed_item_create')
+        view_buffer.flush()
+        view_buffer.reset_metrics()
+
+    def tearDown(self):
+        view_buffer.flush()
+
+    def test_view_is_buffered_without_writing(self):
+        with self.assertNumQueries(1):  # product lookup only
+            response = self.client.post(self.url, {'product_id': self.product.pk, 'search_query': 'tecno'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(ViewedItem.objects.exists())
+        self.assertEqual(view_buffer.metrics()['depth'], 1)
+
+        self.assertEqual(view_buffer.flush(), 1)
+        self.assertEqual(ViewedItem.objects.get().search_query, 'tecno')
+        metrics = view_buffer.metrics()
+        self.assertEqual((metrics['depth'], metrics['flushes'], metrics['flushed_rows']), (0, 1, 1))
+
+    def test_repeat_view_refreshes_the_row(self):
+        self.client.post(self.url, {'product_id': self.product.pk, 'search_query': 'tecno'})
+        view_buffer.flush()
+        first = ViewedItem.objects.get()
+
+        self.client.post(self.url, {'product_id': self.product.pk, 'search_query': 'spark'})
+        self.client.post(self.url, {'product_id': self.product.pk})
+        self.assertEqual(view_buffer.metrics()['depth'], 1)  # coalesced
+        view_buffer.flush()
+        latest = ViewedItem.objects.get()
+        self.assertEqual(latest.pk, first.pk)
+        self.assertGreater(latest.viewed_at, first.viewed_at)
+        self.assertEqual(latest.search_query, '')
+
+    def test_full_buffer_wakes_the_flusher_and_caps_instead_of_flushing_inline(self):
+        buffer = ViewBuffer(max_size=2, max_pending=3, flush_interval=60)
+        products = [self.product] + [
+            Product.objects.create(
+                seller=self.seller_profile, title=f"Itel A{n}", description="-",
+                slug=f"itel-a{n}", base_price=180000, verification_status='approved'
+            )
+            for n in range(3)
+        ]
+        with mock.patch.object(buffer, '_ensure_flusher'), self.assertNumQueries(0):
+            self.assertTrue(buffer.add(self.user.pk, products[0].pk))
+            self.assertFalse(buffer._wake.is_set())
+            self.assertTrue(buffer.add(self.user.pk, products[1].pk))
+            self.assertTrue(buffer._wake.is_set())
+            self.assertTrue(buffer.add(self.user.pk, products[2].pk))
+            self.assertFalse(buffer.add(self.user.pk, products[3].pk))  # over MAX_PENDING
+            self.assertTrue(buffer.add(self.user.pk, products[0].pk, 'itel'))  # coalesces: kept
+        self.assertFalse(ViewedItem.objects.exists())
+        self.assertEqual((buffer.metrics()['depth'], buffer.metrics()['dropped']), (3, 1))
+
+        # One round of the background thread: woken, it drains the buffer
+        buffer._stopped = mock.Mock(is_set=mock.Mock(side_effect=[False, True]))
+        with mock.patch('catalog.tracking.close_old_connections'):
+            buffer._run()
+        self.assertEqual(ViewedItem.objects.count(), 3)
+        self.assertFalse(buffer._wake.is_set())
+
+    def test_flusher_is_restarted_after_dying_or_a_fork(self):
+        buffer = ViewBuffer(flush_interval=60)
+        release = threading.Event()
+        with mock.patch.object(buffer, '_run', side_effect=lambda: release.wait(5)):
+            buffer._ensure_flusher()
+            first = buffer._flusher
+            buffer._ensure_flusher()
+            self.assertIs(buffer._flusher, first)
+
+            with mock.patch('catalog.tracking.os.getpid', return_value=-1):
+                buffer._ensure_flusher()
+            forked = buffer._flusher
+            self.assertIsNot(forked, first)
+
+            release.set()
+            forked.join()
+            release.clear()
+            buffer._ensure_flusher()
+            self.assertIsNot(buffer._flusher, forked)
+            self.assertTrue(buffer._flusher.is_alive())
+            release.set()
+
+    def test_events_for_deleted_products_are_dropped(self):
+        self.client.post(self.url, {'product_id': self.product.pk})
+        self.product.delete()
+        self.assertEqual(view_buffer.flush(), 0)
+
+    def test_unknown_product_is_rejected(self):
+        response = self.client.post(self.url, {'product_id': 999})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
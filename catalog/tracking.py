@@ -0,0 +1,191 @@
+"""
+Buffered product-view tracking.
+
+Views are the highest-volume write, so the request path only appends to an
+in-process buffer (repeat views of the same product coalesce). The buffer is
+written with one bulk upsert – INSERT … ON CONFLICT (user, product) DO UPDATE
+viewed_at, search_query – by a background thread when:
+- it holds VIEW_TRACKING['BUFFER_SIZE'] entries (the request that fills it wakes the thread)
+- its oldest entry is older than VIEW_TRACKING['FLUSH_INTERVAL'] seconds
+and at process exit (atexit). The thread is started by the first view a
+process buffers, and again if it died or the process was forked. Requests never flush: when the database falls
+behind, views of new (user, product) pairs beyond VIEW_TRACKING['MAX_PENDING']
+are dropped (and counted) until the thread catches up.
+
+Events buffered in a process that dies without exiting cleanly are lost:
+acceptable for view history, not for anything transactional.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {'BUFFER_SIZE': 500, 'MAX_PENDING': 5000, 'FLUSH_INTERVAL': 5.0}
+
+
+class ViewBuffer:
+    def __init__(self, max_size=None, flush_interval=None, max_pending=None):
+        config = {**DEFAULTS, **getattr(settings, 'VIEW_TRACKING', {})}
+        self.max_size = max_size or config['BUFFER_SIZE']
+        self.max_pending = max_pending or config['MAX_PENDING']
+        self.flush_interval = flush_interval or config['FLUSH_INTERVAL']
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}      # (user_id, product_id) → (viewed_at, search_query)
+        self._oldest = None     # monotonic time of the oldest pending event
+        self._flusher = None
+        self._flusher_pid = None
+        self._wake = threading.Event()     # set when the buffer is full
+        self._stopped = threading.Event()
+        self.reset_metrics()
+
+    # --- Request path ---
+
+    def add(self, user_id, product_id, search_query='', viewed_at=None):
+        """
+        Buffer one view; returns False when it was dropped (buffer at MAX_PENDING).
+        """
+        key = (user_id, product_id)
+        with self._lock:
+            self._events += 1
+            if key not in self._pending and len(self._pending) >= self.max_pending:
+                self._dropped += 1
+                return False
+            self._pending[key] = (viewed_at or timezone.now(), search_query or '')
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            depth = len(self._pending)
+            self._max_depth = max(self._max_depth, depth)
+        self._ensure_flusher()
+        if depth >= self.max_size:
+            self._wake.set()
+        return True
+
+    # --- Flushing ---
+
+    def age(self):
+        oldest = self._oldest
+        return 0.0 if oldest is None else time.monotonic() - oldest
+
+    def flush(self):
+        """
+        Upsert everything pending. Returns the number of rows written.
+        """
+        from .models import Product, ViewedItem
+        from users.models import User
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._oldest = self._pending, {}, None
+            if not pending:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                # Drop events whose user or product was deleted meanwhile: one bad FK fails the whole batch
+                product_ids = set(Product.objects.filter(
+                    pk__in={product_id for _, product_id in pending}
+                ).values_list('pk', flat=True))
+                user_ids = set(User.objects.filter(
+                    pk__in={user_id for user_id, _ in pending}
+                ).values_list('pk', flat=True))
+                rows = [
+                    ViewedItem(user_id=user_id, product_id=product_id, viewed_at=viewed_at, search_query=query)
+                    for (user_id, product_id), (viewed_at, query) in pending.items()
+                    if user_id in user_ids and product_id in product_ids
+                ]
+                ViewedItem.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=['user', 'product'],
+                    update_fields=['viewed_at', 'search_query'],
+                )
+            except DatabaseError:
+                logger.exception("View tracking flush failed (%d events re-queued)", len(pending))
+                self._requeue(pending)
+                self._failures += 1
+                return 0
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._flushes += 1
+                self._flushed_rows += len(rows)
+                self._flush_ms_total += elapsed_ms
+                self._flush_ms_max = max(self._flush_ms_max, elapsed_ms)
+                self._last_flush_ms = elapsed_ms
+            return len(rows)
+
+    def _requeue(self, pending):
+        with self._lock:
+            for key, event in pending.items():
+                newer = self._pending.get(key)
+                if newer is None or newer[0] < event[0]:
+                    self._pending[key] = event
+            if self._pending and self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _flusher_running(self):
+        # A forked worker inherits the attribute but not the thread; a thread can also die
+        return self._flusher_pid == os.getpid() and self._flusher.is_alive()
+
+    def _ensure_flusher(self):
+        if self._flusher_running():
+            return
+        with self._lock:
+            if not self._flusher_running() and not self._stopped.is_set():
+                self._flusher = threading.Thread(target=self._run, name='view-tracking-flusher', daemon=True)
+                self._flusher_pid = os.getpid()
+                self._flusher.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            woken = self._wake.wait(self.flush_interval / 2)
+            if woken or self.age() >= self.flush_interval:
+                self._wake.clear()
+                try:
+                    self.flush()
+                finally:
+                    close_old_connections()
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wake.set()
+        self.flush()
+
+    # --- Metrics ---
+
+    def reset_metrics(self):
+        with self._lock:
+            self._events = self._dropped = self._flushes = self._flushed_rows = self._failures = 0
+            self._max_depth = 0
+            self._flush_ms_total = self._flush_ms_max = self._last_flush_ms = 0.0
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'depth': len(self._pending),
+                'max_depth': self._max_depth,
+                'oldest_age_seconds': round(self.age(), 3),
+                'events': self._events,
+                'dropped': self._dropped,
+                'flushes': self._flushes,
+                'flushed_rows': self._flushed_rows,
+                'failed_flushes': self._failures,
+                'last_flush_ms': round(self._last_flush_ms, 3),
+                'avg_flush_ms': round(self._flush_ms_total / self._flushes, 3) if self._flushes else 0.0,
+                'max_flush_ms': round(self._flush_ms_max, 3),
+            }
+
+
+view_buffer = ViewBuffer()
+atexit.register(view_buffer.shutdown)
+
+
+def record_view(user, product_id, search_query=''):
+    view_buffer.add(user.pk, product_id, search_query)
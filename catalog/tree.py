@@ -0,0 +1,130 @@
+"""
+Category tree (materialized path).
+
+Every category stores its full path, e.g. /electronics/phones/smartphones/.
+- A subtree is a path prefix, queried as an index range scan on `path`
+- Moving a node (new parent or slug) re-paths all descendants in one UPDATE
+- The nested tree with per-node product counts is rendered once and served
+  from cache until categories or product membership change
+"""
+import json
+from django.core.cache import cache
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Concat, Substr
+from kkoo.cache import get_version, bump_version
+
+TREE_NAMESPACE = 'catalog:category_tree'
+TREE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def path_upper_bound(path):
+    # Paths end with '/', and '0' is the next character, so [path, upper) is exactly the subtree
+    return path[:-1] + chr(ord(path[-1]) + 1)
+
+
+def subtree_q(path, field='path'):
+    """
+    startswith(path) as a range, so it uses the `path` index on every backend
+    (LIKE 'x%' does not on SQLite's default collation or PostgreSQL without pattern ops).
+    """
+    return Q(**{f'{field}__gte': path, f'{field}__lt': path_upper_bound(path)})
+
+
+def subtree_ids(path):
+    from .models import Category
+    return Category.objects.filter(subtree_q(path)).values('id')
+
+
+def repath_subtree(old_path, new_path):
+    """
+    Rewrite the prefix of every descendant of old_path in a single statement.
+    """
+    from .models import Category
+    if old_path == new_path:
+        return 0
+    return Category.objects.filter(subtree_q(old_path)).exclude(path=old_path).update(
+        path=Concat(Value(new_path), Substr('path', len(old_path) + 1))
+    )
+
+
+def invalidate_tree():
+    bump_version(TREE_NAMESPACE)
+
+
+def build_tree():
+    """
+    Nested list of active categories. `product_count` covers the node and its
+    descendants (approved, active products only).
+    """
+    from .models import Category, Product
+    counts = dict(
+        Product.objects.filter(is_active=True, verification_status='approved', category__isnull=False)
+        .values_list('category_id').annotate(n=Count('id')).order_by()
+    )
+    categories = list(
+        Category.objects.filter(is_active=True).order_by('path').values('id', 'name', 'slug', 'path', 'parent_id')
+    )
+
+    nodes = {}
+    roots = []
+    # Ordered by path, so a parent is always seen before its children
+    for category in categories:
+        node = {
+            'id': category['id'],
+            'name': category['name'],
+            'slug': category['slug'],
+            'path': category['path'],
+            'product_count': counts.get(category['id'], 0),
+            'children': [],
+        }
+        nodes[category['id']] = node
+        parent_id = category['parent_id']
+        if parent_id is None:
+            roots.append(node)
+        elif parent_id in nodes:
+            nodes[parent_id]['children'].append(node)
+        # else: parent inactive → whole branch hidden
+
+    def total(node):
+        node['children'].sort(key=lambda child: child['name'])
+        node['product_count'] += sum(total(child) for child in node['children'])
+        return node['product_count']
+
+    for root in roots:
+        total(root)
+    roots.sort(key=lambda root: root['name'])
+    return roots
+
+
+def get_root_map():
+    """
+    {category_id: top-level category} for active categories, cached with the tree.
+    """
+    from .models import Category
+    key = f'{TREE_NAMESPACE}:roots:{get_version(TREE_NAMESPACE)}'
+    root_map = cache.get(key)
+    if root_map is None:
+        categories = list(Category.objects.filter(is_active=True).values_list('id', 'name', 'slug', 'path'))
+        roots = {
+            path: {'id': pk, 'slug': slug, 'name': name}
+            for pk, name, slug, path in categories if path.count('/') == 2
+        }
+        root_map = {}
+        for pk, _, _, path in categories:
+            root = roots.get('/' + path.split('/')[1] + '/')
+            if root:
+                root_map[pk] = root
+        cache.set(key, root_map, TREE_CACHE_TIMEOUT)
+    return root_map
+
+
+def get_tree_json():
+    """
+    Pre-rendered JSON bytes for the tree endpoint.
+    """
+    key = f'{TREE_NAMESPACE}:{get_version(TREE_NAMESPACE)}'
+    blob = cache.get(key)
+    if blob is None:
+        blob = json.dumps(build_tree(), separators=(',', ':')).encode()
+        cache.set(key, blob, TREE_CACHE_TIMEOUT)
+    return blob
@@ -1,12 +1,13 @@
 from django.urls import path
 from .views import (
-    CategoryListView, BrandListView,
+    CategoryListView, CategoryTreeView, BrandListView,
     ProductListView, ProductDetailView,
     ProductCreateView, ProductUpdateView, ProductDeleteView,
     AdminBrandListView, AdminBrandUpdateDeleteView, AdminBrandVerifyView,
     AdminProductListView, AdminProductVerifyView, AdminProductDeactivateView,
     AdminMediaListView, AdminMediaVerifyView,
     AdminBulkProductActionView,
+    RecommendationView, ViewedItemCreateView, AdminViewTrackingMetricsView,
 )
 
 app_name = "catalog"
@@ -14,9 +15,12 @@ app_name = "catalog"
 urlpatterns = [
     # Public
     path('categories/', CategoryListView.as_view(), name='category_list'),
+    path('categories/tree/', CategoryTreeView.as_view(), name='category_tree'),
     path('brands/', BrandListView.as_view(), name='brand_list'),
     path('products/', ProductListView.as_view(), name='product_list'),
     path('products/<slug:slug>/', ProductDetailView.as_view(), name='product_detail'),
+    path('recommendations/', RecommendationView.as_view(), name='recommendations'),
+    path('viewed/', ViewedItemCreateView.as_view(), name='viewed_item_create'),
 
     # Seller
     path('products/create/', ProductCreateView.as_view(), name='product_create'),
@@ -33,4 +37,5 @@ urlpatterns = [
     path('admin/media/', AdminMediaListView.as_view(), name='admin_media_list'),
     path('admin/media/<int:pk>/verify/', AdminMediaVerifyView.as_view(), name='admin_media_verify'),
     path('admin/products/bulk-action/', AdminBulkProductActionView.as_view(), name='admin_bulk_product_action'),
+    path('admin/metrics/view-tracking/', AdminViewTrackingMetricsView.as_view(), name='admin_view_tracking_metrics'),
 ]
\ No newline at end of file
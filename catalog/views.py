@@ -1,68 +1,133 @@
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Category, Brand, Product, SKU, ProductMedia
 from .serializers import (
     CategorySerializer, BrandSerializer, ProductListSerializer,
-    ProductDetailSerializer, ProductCreateUpdateSerializer, ProductMediaSerializer,ViewedItemSerializer, RecommendationSerializer
+    ProductDetailSerializer, ProductCreateUpdateSerializer, ProductMediaSerializer, ViewEventSerializer, RecommendationSerializer
 )
 from .filters import ProductFilter 
+from .pagination import ProductCursorPagination, CategoryCursorPagination, MediaCursorPagination
+from .tree import get_tree_json, invalidate_tree, TREE_NAMESPACE
+from .cache import (
+    invalidate_product_listing, invalidate_product_detail, get_product_detail,
+    PRODUCTS_NAMESPACE, CATEGORIES_NAMESPACE, BRANDS_NAMESPACE, product_namespace, product_surrogate_key
+)
+from kkoo.cache import get_version
+from kkoo.conditional import ConditionalGetMixin, version_timestamp
+from .facets import get_facets
+from .recommendations import get_recommendations
+from .tracking import record_view, view_buffer
 
 
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(ConditionalGetMixin, generics.ListAPIView):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = CategoryCursorPagination
+    surrogate_keys = ['categories']
+
+    def get_validator(self, request, *args, **kwargs):
+        version = get_version(CATEGORIES_NAMESPACE)
+        return version, version_timestamp(version)
 
 
-class BrandListView(generics.ListAPIView):
+class CategoryTreeView(APIView):
+    """
+    Nested category tree with active product counts (subcategories included).
+    Served as a pre-rendered JSON blob, rebuilt only when categories or product membership change.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        return HttpResponse(get_tree_json(), content_type='application/json')
+
+
+class BrandListView(ConditionalGetMixin, generics.ListAPIView):
     queryset = Brand.objects.filter(is_active=True, is_verified=True)
     serializer_class = BrandSerializer
     permission_classes = [permissions.AllowAny]
+    surrogate_keys = ['brands']
+
+    def get_validator(self, request, *args, **kwargs):
+        version = get_version(BRANDS_NAMESPACE)
+        return version, version_timestamp(version)
 
 
-class ProductListView(generics.ListAPIView):
+class ProductListView(ConditionalGetMixin, generics.ListAPIView):
     """
-    Public product list – SQLite compatible
-    Uses django-filter + basic Q lookup for search (title, description, brand)
+    Public product list
+    ?search= is handled by ProductFilter: full-text index (FTS5 on SQLite, tsvector on PostgreSQL),
+    BM25-ranked with prefix matching – see catalog.search
+    ?facets=1 adds brand / top-level category / price bucket counts for the filtered list
     """
+    # Paging and response options – anything else is a filter
+    non_filter_params = {'facets', 'cursor', 'page_size', 'with_count', 'sort'}
     serializer_class = ProductListSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = ProductCursorPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProductFilter
+    surrogate_keys = ['products', 'categories', 'brands']
+
+    def get_validator(self, request, *args, **kwargs):
+        versions = (
+            get_version(PRODUCTS_NAMESPACE), get_version(CATEGORIES_NAMESPACE), get_version(TREE_NAMESPACE)
+        )
+        return versions, version_timestamp(*versions)
 
     def get_queryset(self):
-        qs = Product.objects.filter(
+        return Product.objects.filter(
             is_active=True,
             verification_status='approved'
         ).select_related(
             'brand', 'category'
         ).prefetch_related(
-            'media', 'skus'
+            Prefetch(
+                'media',
+                queryset=ProductMedia.objects.filter(is_primary=True, is_verified=True),
+                to_attr='verified_primary_media'
+            )
         )
 
-        # Basic keyword search (works on SQLite)
-        search_query = self.request.query_params.get('search')
-        if search_query:
-            qs = qs.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(brand__name__icontains=search_query)
-            ).order_by('-created_at')  # Relevance not ranked, but good enough for start
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true'):
+            cacheable = not set(request.query_params) - self.non_filter_params
+            response.data['facets'] = get_facets(self.filter_queryset(self.get_queryset()), cacheable)
+        return response
 
-        return qs
 
-
-class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.filter(is_active=True, verification_status='approved')
+class ProductDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """
+    Read-through cached by slug + per-product version (see catalog.cache)
+    """
+    queryset = Product.objects.filter(
+        is_active=True, verification_status='approved'
+    ).select_related(
+        'brand', 'category', 'specification'
+    ).prefetch_related('media', 'skus')
     serializer_class = ProductDetailSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
 
+    def get_validator(self, request, *args, **kwargs):
+        version = get_version(product_namespace(kwargs['slug']))
+        return version, version_timestamp(version)
+
+    def get_surrogate_keys(self, request, *args, **kwargs):
+        return [product_surrogate_key(kwargs['slug'])]
+
+    def retrieve(self, request, *args, **kwargs):
+        def build():
+            return self.get_serializer(self.get_object()).data
+        return Response(get_product_detail(kwargs[self.lookup_field], build))
+
 
 class ProductCreateView(generics.CreateAPIView):
     serializer_class = ProductCreateUpdateSerializer
@@ -123,6 +188,7 @@ class AdminBrandVerifyView(APIView):
 class AdminProductListView(generics.ListAPIView):
     serializer_class = ProductDetailSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = ProductCursorPagination
 
     def get_queryset(self):
         qs = Product.objects.all().select_related(
@@ -174,6 +240,7 @@ class AdminProductDeactivateView(APIView):
 class AdminMediaListView(generics.ListAPIView):
     serializer_class = ProductMediaSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = MediaCursorPagination
 
     def get_queryset(self):
         qs = ProductMedia.objects.all()
@@ -226,31 +293,47 @@ class AdminBulkProductActionView(APIView):
             queryset.update(is_active=False)
         else:
             return Response({"error": "Invalid action"}, status=status.HTTP_400_BAD_REQUEST)
+        # .update() skips the post_save hooks
+        invalidate_tree()
+        invalidate_product_listing()
+        invalidate_product_detail(*queryset.values_list('slug', flat=True))
 
         return Response({"message": f"{len(product_ids)} products {action}d"})
     
 
-class ViewedItemCreateView(generics.CreateAPIView):
-    serializer_class = ViewedItemSerializer
+class ViewedItemCreateView(APIView):
+    """
+    POST {"product_id": 1, "search_query": "…"}
+    Buffered and written in batches (see catalog.tracking) → 202 Accepted
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    def perform_create(self, serializer):
-        product_id = self.request.data.get('product_id')
-        product = get_object_or_404(Product, id=product_id, is_active=True, verification_status='approved')
-        serializer.save(user=self.request.user, product=product)
+    def post(self, request):
+        serializer = ViewEventSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_id = serializer.validated_data['product_id']
+        if not Product.objects.filter(id=product_id, is_active=True, verification_status='approved').exists():
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        record_view(request.user, product_id, serializer.validated_data['search_query'])
+        return Response({"product_id": product_id, "queued": True}, status=status.HTTP_202_ACCEPTED)
+
+
+class AdminViewTrackingMetricsView(APIView):
+    """
+    Buffer depth and flush latency of this process (see catalog.tracking)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(view_buffer.metrics())
 
 
 class RecommendationView(generics.ListAPIView):
+    """
+    Neighbors of the user's recent views, from the precomputed table (see catalog.recommendations)
+    """
     serializer_class = RecommendationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        # Viewed + searched similar: same category/brand
-        viewed_categories = ViewedItem.objects.filter(user=user).values_list('product__category', flat=True).distinct()
-        viewed_brands = ViewedItem.objects.filter(user=user).values_list('product__brand', flat=True).distinct()
-        return Product.objects.filter(
-            models.Q(category__in=viewed_categories) | models.Q(brand__in=viewed_brands),
-            is_active=True,
-            verification_status='approved'
-        ).exclude(id__in=ViewedItem.objects.filter(user=user).values_list('product__id', flat=True))  # Exclude viewed
\ No newline at end of file
+        return get_recommendations(self.request.user)
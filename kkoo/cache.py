@@ -0,0 +1,105 @@
+"""
+Cache helpers shared by the apps.
+
+Versioned namespaces: writers never hunt down keys to delete. They bump the
+namespace version and readers fold the version into their keys, so stale
+entries simply stop being read and age out.
+
+Versions are microsecond timestamps kept strictly increasing, so a version
+also tells when its namespace last changed.
+"""
+import threading
+import time
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}'
+
+
+def _now_us():
+    return time.time_ns() // 1000
+
+
+def get_version(namespace):
+    version = cache.get(VERSION_KEY.format(namespace))
+    if version is None:
+        version = _now_us()
+        if not cache.add(VERSION_KEY.format(namespace), version, None):
+            version = cache.get(VERSION_KEY.format(namespace), version)
+    return version
+
+
+def bump_version(namespace):
+    key = VERSION_KEY.format(namespace)
+    version = max(_now_us(), (cache.get(key) or 0) + 1)
+    cache.set(key, version, None)
+    return version
+
+
+def bump_versions(namespaces):
+    """
+    Bump many namespaces with one cache round trip (e.g. every product of a brand).
+    """
+    namespaces = list(namespaces)
+    if not namespaces:
+        return
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    current = cache.get_many(keys)
+    now = _now_us()
+    cache.set_many({key: max(now, current.get(key, 0) + 1) for key in keys}, None)
+
+
+class CacheStats:
+    """
+    Per-process hit/miss counters for read-through caches.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, name, hit):
+        with self._lock:
+            counts = self._counts.setdefault(name, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def read_through(key, build, timeout, name='default', lock_timeout=10, max_wait=2.0, poll=0.05):
+    """
+    cache.get(key), or build() and store it.
+
+    Stampede protection: on a miss only the worker that wins cache.add(lock)
+    builds; the others poll for its result for up to max_wait seconds before
+    building themselves. build() may raise (e.g. Http404) – nothing is cached then.
+    """
+    value = cache.get(key)
+    if value is not None:
+        stats.record(name, hit=True)
+        return value
+    stats.record(name, hit=False)
+
+    lock_key = f'lock:{key}'
+    owns_lock = cache.add(lock_key, 1, lock_timeout)
+    if not owns_lock:
+        deadline = time.monotonic() + max_wait
+        while time.monotonic() < deadline:
+            time.sleep(poll)
+            value = cache.get(key)
+            if value is not None:
+                return value
+    try:
+        value = build()
+        cache.set(key, value, timeout)
+    finally:
+        if owns_lock:
+            cache.delete(lock_key)
+    return value
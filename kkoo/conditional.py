@@ -0,0 +1,54 @@
+"""
+Conditional GETs for public read endpoints.
+
+Views derive a validator from cache versions (kkoo.cache) – no queryset is
+evaluated – and a matching If-None-Match / If-Modified-Since is answered with
+304 before anything is serialized. Responses also carry Surrogate-Key headers
+for CDN purging (kkoo.surrogate).
+"""
+import hashlib
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    Implement get_validator() → (etag_source, last_modified_timestamp_or_None)
+    and optionally get_surrogate_keys().
+    """
+    surrogate_keys = ()
+
+    def get_validator(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def get_surrogate_keys(self, request, *args, **kwargs):
+        return list(self.surrogate_keys)
+
+    def get(self, request, *args, **kwargs):
+        source, last_modified = self.get_validator(request, *args, **kwargs)
+        # Same versions, different URL or format → different representation
+        digest = hashlib.sha1(
+            f"{source}|{request.get_full_path()}|{request.accepted_renderer.format}".encode()
+        ).hexdigest()
+        etag = f'"{digest}"'
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            keys = self.get_surrogate_keys(request, *args, **kwargs)
+            if keys:
+                response['Surrogate-Key'] = ' '.join(keys)
+            patch_vary_headers(response, ['Accept'])
+        return response
+
+
+def version_timestamp(*versions):
+    """
+    kkoo.cache versions are microsecond timestamps → Last-Modified seconds.
+    """
+    return max(versions) // 1_000_000
@@ -0,0 +1,110 @@
+"""
+Shared pagination for large listings.
+
+Keyset (cursor) pagination: every page is a range scan from the previous
+position on an indexed ordering, so page 500 costs the same as page 1.
+
+A total is only returned when the client asks for it (?with_count=1),
+and it is estimated rather than counted on every page:
+- PostgreSQL: planner estimate (pg_class.reltuples / EXPLAIN rows); exact COUNT(*) only for small results
+- other backends: exact COUNT(*) cached for COUNT_CACHE_TIMEOUT seconds
+"""
+import hashlib
+import json
+from django.core.cache import cache
+from django.db import connections, DatabaseError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+COUNT_CACHE_TIMEOUT = 60
+EXACT_COUNT_THRESHOLD = 10_000
+
+
+def _table_estimate(queryset):
+    """
+    Row estimate from table statistics for an unfiltered queryset, else None.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 only exists after ANALYZE; the first number of `stat` is the row count
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx IS NULL", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    value = int(str(row[0]).split()[0])
+    return value if value >= 0 else None
+
+
+def _planner_estimate(queryset):
+    plan = json.loads(queryset.explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_count(queryset):
+    """
+    Cheap total for a (possibly filtered) queryset.
+    Returns (count, is_estimate).
+    """
+    connection = connections[queryset.db]
+    unfiltered = not queryset.query.where
+    if unfiltered:
+        try:
+            estimate = _table_estimate(queryset)
+        except DatabaseError:
+            estimate = None
+        if estimate is not None and estimate > EXACT_COUNT_THRESHOLD:
+            return estimate, True
+
+    if connection.vendor == 'postgresql' and not unfiltered:
+        estimate = _planner_estimate(queryset)
+        if estimate > EXACT_COUNT_THRESHOLD:
+            return estimate, True
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    key = 'pagination:count:' + hashlib.md5(repr((sql, params)).encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count, False
+
+
+class EstimatedCountCursorPagination(CursorPagination):
+    """
+    Cursor pagination on a stable (timestamp, id) ordering.
+    ?with_count=1 adds `count` and `count_is_estimate` to the response.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    count_query_param = 'with_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count, self.count_is_estimate = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_estimate'] = self.count_is_estimate
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        response_schema['properties']['count_is_estimate'] = {'type': 'boolean'}
+        return response_schema
@@ -90,6 +90,54 @@ DATABASES = {
 }
 
 
+# Cache
+# Local memory is fine for development. Production needs a shared backend (Redis / Memcached):
+# versioned keys (kkoo.cache) must be seen by every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'kkoo',
+    }
+}
+
+# Endpoint that accepts {"surrogate_keys": [...]} purges (CDN / reverse proxy).
+# Unset: `manage.py purge_surrogate_keys` only prints the drained keys.
+SURROGATE_PURGE_URL = None
+
+# Product views are buffered per process and upserted in batches (catalog.tracking)
+VIEW_TRACKING = {
+    'BUFFER_SIZE': 500,      # the request that fills the buffer wakes the background flush
+    'MAX_PENDING': 5000,     # hard cap: views of new (user, product) pairs beyond it are dropped
+    'FLUSH_INTERVAL': 5.0,   # seconds; flush by the background thread
+}
+
+# Public discount code validation (promotions.views.DiscountCodeValidateView)
+DISCOUNT_CODE_VALIDATION = {
+    'RATE': '10/min',        # attempts per client, sliding window
+    'CACHE_TIMEOUT': 30,     # seconds a valid code's answer is cached
+}
+
+# Stock held for unpaid orders (orders.reservations)
+STOCK_RESERVATION = {
+    'TTL': 60 * 30,          # seconds a hold lasts before the sweeper releases it
+    'SWEEP_BATCH': 1000,     # holds released per sweeper transaction
+}
+
+# Order number allocation (orders.numbers)
+ORDER_NUMBERS = {
+    'BLOCK_SIZE': 100,       # sequence values each process reserves per database round trip
+}
+
+# Idempotency-Key handling for checkout, payment and cart writes (orders.idempotency)
+IDEMPOTENCY = {
+    'TTL': 60 * 60 * 24,     # seconds a key and its response are kept
+    'LOCK_TIMEOUT': 30,      # seconds a running request holds its key
+    'WAIT': 5,               # seconds a concurrent duplicate waits for the first one's response
+    'PURGE_BATCH': 1000,     # expired keys deleted per statement
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
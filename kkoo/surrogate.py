@@ -0,0 +1,44 @@
+"""
+Surrogate-key purge list.
+
+Responses carry a `Surrogate-Key` header naming what they were built from
+(e.g. "products", "product-tecno-spark-20"). When a model change bumps a cache
+version, the matching keys are queued here; a CDN or local reverse proxy drains
+the queue (`manage.py purge_surrogate_keys`) and purges everything tagged with them.
+
+The queue is a table (catalog.SurrogatePurge), so keys queued by any web
+worker reach the command. Queueing is one upsert – INSERT … ON CONFLICT (key)
+DO UPDATE queued_at – with no lock to take: a key queued twice is one row.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+
+def queue_purge(*keys):
+    from catalog.models import SurrogatePurge
+    keys = sorted({key for key in keys if key})
+    if not keys:
+        return
+    queued_at = timezone.now()
+    SurrogatePurge.objects.bulk_create(
+        [SurrogatePurge(key=key, queued_at=queued_at) for key in keys],
+        update_conflicts=True, unique_fields=['key'], update_fields=['queued_at'],
+    )
+
+
+def pending_purges():
+    from catalog.models import SurrogatePurge
+    return list(SurrogatePurge.objects.order_by('key').values_list('key', flat=True))
+
+
+def drain_purges():
+    """
+    Return and clear the queued keys.
+    """
+    from catalog.models import SurrogatePurge
+    with transaction.atomic():
+        # Locked: a key queued again meanwhile waits, then lands as a new row for the next drain
+        rows = dict(SurrogatePurge.objects.select_for_update().values_list('pk', 'key'))
+        if rows:
+            SurrogatePurge.objects.filter(pk__in=list(rows)).delete()
+    return sorted(rows.values())
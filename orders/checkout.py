@@ -0,0 +1,110 @@
+"""
+Checkout pipeline.
+
+checkout() turns a user's cart into an order in one transaction, in a fixed
+number of statements whatever the cart size:
+
+1. price – the cart is loaded once with every related row (cart.pricing) and
+   its incentives are derived from that same pricing
+2. write – order (its number allocated in memory, orders.numbers), items
+   (bulk_create), redemption ledger, delivery
+3. stock – the units are held for the order (orders.reservations): the cart's
+   SKUs are locked in id order and their reserved counts raised by one
+   conditional UPDATE … WHERE stock_quantity - reserved_quantity >= qty; if any
+   row is not updated the whole order fails and rolls back – no oversell.
+   Payment turns the holds into stock decrements.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from cart.models import Cart
+from cart.pricing import price_cart
+from cart.utils import apply_incentives_to_cart, commit_incentives, apply_loyalty_points
+from promotions.ledger import record_redemptions
+from .models import Order, OrderItem, Delivery
+from .numbers import next_order_number
+from .reservations import reserve_stock
+
+
+def sku_snapshot(item):
+    product = item.sku.product
+    return {
+        'sku_id': item.sku_id,
+        'sku_code': item.sku.sku_code,
+        'variant_attributes': item.sku.variant_attributes,
+        'product_title': product.title,
+        'brand': product.brand.name if product.brand else '',
+        'base_price': float(item.pricing['unit_price']),
+    }
+
+
+def checkout(cart, discount_code='', points_to_use=0):
+    """
+    Place the order for `cart` (see the module docstring). Raises ValidationError
+    (OutOfStock, UsageLimitReached, …) with nothing written.
+    """
+    items = price_cart(cart)['items']
+    if not items:
+        raise ValidationError("Cart is empty")
+
+    # Outside the transaction: a block reserved in it would be reused after a rollback
+    number = next_order_number()
+    with transaction.atomic():
+        # Apply promotion + discount code; counters move only here, with the order
+        base_incentives = apply_incentives_to_cart(cart, discount_code)
+        commit_incentives(base_incentives)
+
+        loyalty_discount = 0
+        loyalty_applied = []
+        if points_to_use > 0:
+            loyalty_result = apply_loyalty_points(cart, points_to_use)
+            loyalty_discount = loyalty_result['discount_amount']
+            loyalty_applied = [{'type': 'loyalty', 'amount': float(loyalty_discount)}]
+
+        final_total = max(base_incentives['final_total'] - loyalty_discount, 0)
+        all_applied = base_incentives['applied_incentives'] + loyalty_applied
+
+        # Immutable snapshot
+        lines = [
+            {
+                'sku_snapshot': sku_snapshot(item),
+                'quantity': item.quantity,
+                'unit_price': item.pricing['unit_price'],
+                'total_price': item.pricing['subtotal'],
+            }
+            for item in items
+        ]
+        order = Order.objects.create(
+            user=cart.user,
+            order_number=number,
+            original_amount=base_incentives['original_total'],
+            discount_amount=base_incentives['total_discount'] + loyalty_discount,
+            total_amount=final_total,
+            applied_incentives=all_applied,
+            status='pending',
+            cart_snapshot={
+                'items': [
+                    dict(line, unit_price=float(line['unit_price']), total_price=float(line['total_price']))
+                    for line in lines
+                ],
+                'incentives': all_applied,
+                'original_total': float(base_incentives['original_total']),
+                'final_total': float(final_total)
+            }
+        )
+        OrderItem.objects.bulk_create([OrderItem(order=order, **line) for line in lines])
+
+        quantities = {}
+        for item in items:
+            quantities[item.sku_id] = quantities.get(item.sku_id, 0) + item.quantity
+        reserve_stock(order, quantities)
+
+        # Per-user ledger (promotions.ledger): caps are checked against it while pricing
+        record_redemptions(order, base_incentives)
+
+        Delivery.objects.create(order=order, estimated_delivery=timezone.now() + timezone.timedelta(days=3))
+
+        cart.items.all().delete()
+        cart.updated_at = timezone.now()
+        Cart.objects.filter(pk=cart.pk).update(updated_at=cart.updated_at)
+    return order
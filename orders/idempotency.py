@@ -0,0 +1,178 @@
+"""
+Idempotency keys.
+
+Clients on flaky connections retry writes. A request carrying an
+Idempotency-Key header runs once per key: its response is stored in
+IdempotencyKey (unique on scope + key) and a retry gets that response back,
+marked Idempotent-Replayed, after one read on the unique index.
+
+- The row is written before the view runs, with no response and a short lock
+  (locked_until). A concurrent duplicate that finds it waits up to
+  IDEMPOTENCY['WAIT'] seconds for the response, then gets 409.
+- A lock left behind by a crashed request expires and is taken over with a
+  compare-and-swap UPDATE.
+- The same key with a different request (method, path, body) gets 422.
+- 5xx responses and exceptions are not stored, so the request can be retried.
+- Expired keys are deleted in batches (purge_idempotency_keys command).
+
+Keys are scoped per user, or per guest cart token for guest carts.
+"""
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+POLL_INTERVAL = 0.05
+DEFAULTS = {'TTL': 60 * 60 * 24, 'LOCK_TIMEOUT': 30, 'WAIT': 5, 'PURGE_BATCH': 1000}
+
+
+def idempotency_setting(name):
+    return getattr(settings, 'IDEMPOTENCY', {}).get(name, DEFAULTS[name])
+
+
+def request_scope(view, request):
+    """
+    Whose key it is: the view's get_idempotency_scope(), else the user. None: keys are ignored.
+    """
+    if hasattr(view, 'get_idempotency_scope'):
+        return view.get_idempotency_scope(request)
+    if request.user and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return None
+
+
+def fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):  # QueryDict
+        data = dict(data.lists())
+    payload = json.dumps([request.method, request.path, data], sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def replay(stored):
+    response = Response(stored.response_body, status=stored.status_code, headers=stored.response_headers)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def error(message, code):
+    return Response({"error": message}, status=code)
+
+
+def _lookup(scope, key, digest, now):
+    stored = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if stored is None or stored.expires_at <= now:
+        return stored, None
+    if stored.fingerprint != digest:
+        return stored, error(f"{HEADER} was already used for a different request",
+                             status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if stored.status_code is not None:
+        return stored, replay(stored)
+    return stored, None
+
+
+def _claim(scope, key, digest, stored, now):
+    """
+    Take the key for this request; returns the row, or None when another request holds it.
+    """
+    values = {
+        'fingerprint': digest,
+        'status_code': None,
+        'response_body': None,
+        'response_headers': {},
+        'locked_until': now + timedelta(seconds=idempotency_setting('LOCK_TIMEOUT')),
+        'expires_at': now + timedelta(seconds=idempotency_setting('TTL')),
+    }
+    if stored is None:
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(scope=scope, key=key, **values)
+        except IntegrityError:
+            return None
+    if stored.expires_at > now and stored.locked_until and stored.locked_until > now:
+        return None  # running elsewhere
+    # Expired key or abandoned lock: take it over unless someone else just did
+    taken = IdempotencyKey.objects.filter(
+        pk=stored.pk, status_code=stored.status_code, locked_until=stored.locked_until
+    ).update(**values)
+    if not taken:
+        return None
+    for name, value in values.items():
+        setattr(stored, name, value)
+    return stored
+
+
+def _wait(scope, key, digest):
+    deadline = time.monotonic() + idempotency_setting('WAIT')
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        _, response = _lookup(scope, key, digest, timezone.now())
+        if response is not None:
+            return response
+    return error(f"A request with this {HEADER} is still in progress", status.HTTP_409_CONFLICT)
+
+
+def idempotent(handler):
+    """
+    View method decorator: honour the Idempotency-Key header (see the module docstring).
+    """
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        scope = request_scope(view, request) if key else None
+        if scope is None:
+            return handler(view, request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return error(f"{HEADER} is too long", status.HTTP_400_BAD_REQUEST)
+
+        digest = fingerprint(request)
+        now = timezone.now()
+        stored, response = _lookup(scope, key, digest, now)
+        if response is not None:
+            return response
+        claim = _claim(scope, key, digest, stored, now)
+        if claim is None:
+            return _wait(scope, key, digest)
+
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except BaseException:
+            IdempotencyKey.objects.filter(pk=claim.pk, locked_until=claim.locked_until).delete()
+            raise
+        if response.status_code >= 500:
+            IdempotencyKey.objects.filter(pk=claim.pk, locked_until=claim.locked_until).delete()
+            return response
+        # Stored as it renders, so a replay is byte for byte the same JSON
+        body = json.loads(json.dumps(response.data, cls=JSONEncoder))
+        IdempotencyKey.objects.filter(pk=claim.pk, locked_until=claim.locked_until).update(
+            status_code=response.status_code, response_body=body,
+            response_headers=dict(response.items()), locked_until=None,
+        )
+        return response
+    return wrapper
+
+
+def purge_expired_keys(now=None, batch_size=None):
+    """
+    Delete expired keys, `batch_size` per statement. Returns the number deleted.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or idempotency_setting('PURGE_BATCH')
+    purged = 0
+    while True:
+        pks = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return purged
+        purged += IdempotencyKey.objects.filter(pk__in=pks, expires_at__lte=now).delete()[0]
+        if len(pks) < batch_size:
+            return purged
@@ -0,0 +1,60 @@
+import statistics
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from cart.models import Cart, CartItem
+from catalog.models import Category, Product, SKU
+from orders.checkout import checkout
+from orders.numbers import order_numbers
+from users.utils import create_test_user, create_test_seller_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Time checkout (orders.checkout) against cart size: latency and query count per order. "
+        "Synthetic rows are written inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carts', nargs='+', type=int, default=[1, 10, 50, 100])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        # Order numbers come from blocks committed on their own: take them before the rolled-back transaction
+        order_numbers.reserve(len(options['carts']) * options['repeat'])
+        with transaction.atomic():
+            skus = self._create_catalog(max(options['carts']))
+            self.stdout.write(f"{'items':>6} {'median ms':>10} {'max ms':>10} {'queries':>8}")
+            for size in options['carts']:
+                timings, queries = [], 0
+                for _ in range(options['repeat']):
+                    cart = Cart.objects.create(user=create_test_user())
+                    CartItem.objects.bulk_create([CartItem(cart=cart, sku=sku, quantity=1) for sku in skus[:size]])
+                    cart = Cart.objects.select_related('user').get(pk=cart.pk)
+                    cache.clear()  # cold pricing, as for a cart priced in another process
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        checkout(cart)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    queries = len(captured)
+                self.stdout.write(
+                    f"{size:>6} {statistics.median(timings):>10.2f} {max(timings):>10.2f} {queries:>8}"
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _create_catalog(count):
+        _, seller = create_test_seller_user()
+        category = Category.objects.create(name="Bench checkout", slug="bench-checkout")
+        products = Product.objects.bulk_create([
+            Product(seller=seller, category=category, title=f"Bench {n}", description="-",
+                    slug=f"bench-checkout-{n}", base_price=1000, effective_min_price=1000,
+                    effective_max_price=1000, verification_status='approved')
+            for n in range(count)
+        ])
+        SKU.objects.bulk_create([
+            SKU(product=p, sku_code=f"BENCH-CHECKOUT-{p.pk}", stock_quantity=10 ** 6) for p in products
+        ])
+        return list(SKU.objects.filter(product__in=products).order_by('pk'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from orders.idempotency import idempotency_setting, purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records in batches of IDEMPOTENCY['PURGE_BATCH']. Run from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Keys per DELETE (default: IDEMPOTENCY['PURGE_BATCH'])")
+
+    def handle(self, *args, **options):
+        purged = purge_expired_keys(batch_size=options['batch_size'] or idempotency_setting('PURGE_BATCH'))
+        self.stdout.write(f"{purged} expired idempotency keys purged")
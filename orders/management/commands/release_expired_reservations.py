@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from orders.reservations import reservation_setting, sweep_expired_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Release the stock holds of unpaid orders once they expire, in batches of "
+        "STOCK_RESERVATION['SWEEP_BATCH']. Run from cron, or with --watch to sweep every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', action='store_true', help="Keep running, sweeping every --interval seconds")
+        parser.add_argument('--interval', type=float, default=60.0)
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Holds per transaction (default: STOCK_RESERVATION['SWEEP_BATCH'])")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or reservation_setting('SWEEP_BATCH')
+        while True:
+            released = sweep_expired_reservations(batch_size=batch_size)
+            self.stdout.write(f"{released} expired holds released")
+            if not options['watch']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -24,7 +24,7 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=14, decimal_places=2)  # Final after discounts
     original_amount = models.DecimalField(max_digits=14, decimal_places=2)  # Before discounts
     discount_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
-    applied_incentives = models.JSONField(default=list)  # Promotions + codes used
+    applied_incentives = models.JSONField(default=list, blank=True)  # Promotions + codes used
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     payment_method = models.CharField(max_length=50, blank=True)
     payment_reference = models.CharField(max_length=100, blank=True)
@@ -34,6 +34,17 @@ class Order(models.Model):
     delivered_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The status as stored: transitions are checked and applied against it (orders.transitions)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    @property
+    def loaded_status(self):
+        return getattr(self, '_loaded_status', None)
+
     def __str__(self):
         return f"Order {self.order_number}"
 
@@ -49,15 +60,16 @@ class Order(models.Model):
         }
 
     def clean(self):
-        if self.pk:
-            old = Order.objects.get(pk=self.pk)
-            valid = self.valid_transitions().get(old.status, [])
+        old = self.loaded_status
+        if self.pk and old is not None and self.status != old:
+            valid = self.valid_transitions().get(old, [])
             if self.status not in valid:
-                raise ValidationError(f"Invalid transition: {old.status} → {self.status}")
+                raise ValidationError(f"Invalid transition: {old} → {self.status}")
 
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
+        self._loaded_status = self.status
 
     def release_escrow(self):
         if self.status == 'completed' and not self.escrow_released:
@@ -65,6 +77,59 @@ class Order(models.Model):
             self.save(update_fields=['escrow_released'])
 
 
+class OrderStatusEvent(models.Model):
+    """
+    Audit log of status transitions, appended by orders.transitions.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [models.Index(fields=['order', 'created_at'])]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status} → {self.to_status}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client's Idempotency-Key and the response it got (orders.idempotency).
+    status_code is null while the first request is still running; locked_until
+    bounds how long duplicates wait for it.
+    """
+    scope = models.CharField(max_length=100)  # whose key: user:<id> or guest:<cart token>
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    response_headers = models.JSONField(default=dict, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = [('scope', 'key')]
+
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
+
+class Sequence(models.Model):
+    """
+    Named counter handed out in blocks (orders.numbers): next_value is the
+    first value no process has reserved yet.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     sku_snapshot = models.JSONField()
@@ -73,6 +138,22 @@ class OrderItem(models.Model):
     total_price = models.DecimalField(max_digits=12, decimal_places=2)
 
 
+class StockReservation(models.Model):
+    """
+    Units of a SKU held for a pending order until it is paid, cancelled or the
+    hold expires (orders.reservations). Rows only exist while the hold does; the
+    units are also counted in SKU.reserved_quantity.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    sku = models.ForeignKey(SKU, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.quantity} × {self.sku_id} for order {self.order_id}"
+
+
 class Delivery(models.Model):
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='delivery')
     estimated_delivery = models.DateTimeField()
@@ -0,0 +1,107 @@
+"""
+Order numbers.
+
+    KK 2222223 X7QF
+    │  │       └ random suffix (4 chars): numbers cannot be guessed from one another
+    │  └ sequence value (7 chars, fixed width): increasing, so numbers sort by allocation
+    └ prefix
+
+Both parts use the discount code alphabet (no 0/O, 1/I/L; ascending, so the
+text order follows the sequence). The sequence comes from the Sequence table
+in blocks of ORDER_NUMBERS['BLOCK_SIZE']: each process reserves a block with
+one short committed transaction and hands out its values from memory, so an
+order costs no round trip. Values are unique across processes; they increase
+within a process, and across processes by block. A block a process does not
+use up (restart) is skipped, never reused.
+"""
+import os
+import secrets
+import threading
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import Sequence
+
+ALPHABET = '23456789ABCDEFGHJKMNPQRSTUVWXYZ'
+PREFIX = 'KK'
+SEQUENCE_WIDTH = 7
+SUFFIX_LENGTH = 4
+ORDER_SEQUENCE = 'order_number'
+
+_random = secrets.SystemRandom()
+
+
+def reserve_block(name, size):
+    """
+    Reserve the next `size` values of sequence `name`; returns their range.
+    Commits on its own (durable): inside a transaction that later rolled back,
+    the block would be handed out a second time.
+    """
+    with transaction.atomic(durable=True):
+        # Write first: the row lock is taken before the value is read
+        if not Sequence.objects.filter(name=name).update(next_value=F('next_value') + size):
+            try:
+                with transaction.atomic():
+                    Sequence.objects.create(name=name, next_value=1 + size)
+            except IntegrityError:  # created meanwhile by another process
+                Sequence.objects.filter(name=name).update(next_value=F('next_value') + size)
+        end = Sequence.objects.values_list('next_value', flat=True).get(name=name)
+    return range(end - size, end)
+
+
+class BlockAllocator:
+    """
+    Thread-safe per-process source of values of one sequence, refilled a block at a time.
+    """
+    def __init__(self, name, block_size=None):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._values = iter(())
+        self._left = 0
+        self._pid = None
+
+    def get_block_size(self):
+        return self.block_size or getattr(settings, 'ORDER_NUMBERS', {}).get('BLOCK_SIZE', 100)
+
+    def reserve(self, count=None):
+        """
+        Make sure at least `count` values (default: one block) are in hand.
+        """
+        with self._lock:
+            self._refill(count or 1)
+
+    def allocate(self):
+        with self._lock:
+            self._refill(1)
+            self._left -= 1
+            return next(self._values)
+
+    def _refill(self, count):
+        # A forked worker must not hand out the block it inherited from its parent
+        if self._pid != os.getpid():
+            self._values, self._left, self._pid = iter(()), 0, os.getpid()
+        if self._left < count:
+            block = reserve_block(self.name, max(count, self.get_block_size()))
+            self._values, self._left = iter(block), len(block)
+
+
+def encode(value, width):
+    chars = []
+    while value:
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    if len(chars) > width:
+        raise OverflowError("Sequence value does not fit the order number width")
+    return ''.join(reversed(chars)).rjust(width, ALPHABET[0])
+
+
+def format_order_number(value):
+    return PREFIX + encode(value, SEQUENCE_WIDTH) + ''.join(_random.choices(ALPHABET, k=SUFFIX_LENGTH))
+
+
+order_numbers = BlockAllocator(ORDER_SEQUENCE)
+
+
+def next_order_number():
+    return format_order_number(order_numbers.allocate())
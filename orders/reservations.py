@@ -0,0 +1,243 @@
+"""
+Stock reservations.
+
+Checkout does not take units off stock_quantity: it holds them for the order
+(StockReservation rows, expiring after STOCK_RESERVATION['TTL'] seconds) and
+counts them in SKU.reserved_quantity, so what is left to sell is
+
+    available = stock_quantity - reserved_quantity
+
+read from the SKU row itself – no aggregate over the holds.
+
+- reserve_stock()         checkout: holds + counter, all or nothing
+- convert_reservations()  payment confirmed: holds become real decrements
+- release_reservations()  order cancelled: holds go back to available, or
+  the units back onto stock once paid
+- sweep_expired_reservations()  holds past their expiry go back, in batches
+  (release_expired_reservations command)
+
+RESERVATION_HOOKS maps an order status to the function to run when an order
+enters it (the `hook` of orders.transitions), so every path to 'paid' or
+'cancelled' moves the stock with the status.
+
+Every change moves the counters of all the SKUs concerned with one UPDATE,
+after locking their rows in id order (the same order everywhere, so
+concurrent checkouts, payments and sweeps cannot deadlock). The UPDATE sends
+no SKU signals, so the cached detail pages of the products concerned are
+invalidated here.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from kkoo.cache import bump_versions
+from kkoo.surrogate import queue_purge
+from catalog.cache import product_namespace, product_surrogate_key
+from catalog.models import Product, SKU, StockSnapshot
+from .models import StockReservation
+
+DEFAULTS = {'TTL': 60 * 30, 'SWEEP_BATCH': 1000}
+
+
+def reservation_setting(name):
+    return getattr(settings, 'STOCK_RESERVATION', {}).get(name, DEFAULTS[name])
+
+
+class OutOfStock(ValidationError):
+    def __init__(self, sku_code):
+        super().__init__(f"Not enough stock for {sku_code}")
+        self.sku_code = sku_code
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def lock_skus(sku_ids):
+    """
+    Lock the SKU rows in id order; returns {sku_id: (stock_quantity, reserved_quantity)}.
+    """
+    return {
+        pk: (stock, reserved)
+        for pk, stock, reserved in SKU.objects.select_for_update().filter(pk__in=sku_ids).order_by('pk')
+        .values_list('pk', 'stock_quantity', 'reserved_quantity')
+    }
+
+
+def check_available(counts, quantities):
+    for sku_id in sorted(quantities):
+        stock, reserved = counts.get(sku_id, (0, 0))
+        if stock - reserved < quantities[sku_id]:
+            raise OutOfStock(SKU.objects.filter(pk=sku_id).values_list('sku_code', flat=True).first() or sku_id)
+
+
+def invalidate_stock(sku_ids):
+    """
+    The cached product detail shows stock_quantity / available_quantity. The
+    purge is queued in this transaction; the cache version is bumped on commit,
+    so nothing runs against the database once the change is committed.
+    """
+    slugs = list(Product.objects.filter(skus__pk__in=list(sku_ids)).distinct().values_list('slug', flat=True))
+    queue_purge(*(product_surrogate_key(slug) for slug in slugs))
+    transaction.on_commit(lambda: bump_versions(product_namespace(slug) for slug in slugs))
+
+
+def update_counts(quantities, assignments, condition=None):
+    """
+    One UPDATE of the SKUs in `quantities` (sku_id → quantity). `assignments` and
+    `condition` are SQL templates over {stock}, {reserved} and {qty} – the row's
+    quantity. Returns the number of rows updated.
+
+    Raw SQL with a simple CASE: the ORM's Case(When(pk=…)) resolves one lookup per line.
+    """
+    sku_ids = sorted(quantities)
+    case = 'CASE {} {} END'.format(quote('id'), ' '.join(['WHEN %s THEN %s'] * len(sku_ids)))
+    case_params = [value for sku_id in sku_ids for value in (sku_id, quantities[sku_id])]
+    names = {'stock': quote('stock_quantity'), 'reserved': quote('reserved_quantity'), 'qty': case}
+
+    sql = 'UPDATE {} SET {} WHERE {} IN ({})'.format(
+        quote(SKU._meta.db_table), assignments.format(**names), quote('id'), ', '.join(['%s'] * len(sku_ids))
+    )
+    params = case_params * assignments.count('{qty}') + sku_ids
+    if condition:
+        sql += ' AND ' + condition.format(**names)
+        params += case_params * condition.count('{qty}')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        updated = cursor.rowcount
+    if updated:
+        invalidate_stock(sku_ids)
+    return updated
+
+
+def _totals(holds):
+    quantities = {}
+    for _, sku_id, quantity in holds:
+        quantities[sku_id] = quantities.get(sku_id, 0) + quantity
+    return quantities
+
+
+def _take_holds(queryset):
+    """
+    Lock and delete the holds of `queryset`; returns their per-SKU totals.
+    """
+    holds = list(queryset.select_for_update().values_list('pk', 'sku_id', 'quantity'))
+    if holds:
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in holds]).delete()
+    return _totals(holds)
+
+
+def reserve_stock(order, quantities, now=None):
+    """
+    Hold `quantities` (sku_id → quantity) for `order`, all or nothing. Raises
+    OutOfStock; call inside the order's transaction.
+    """
+    now = now or timezone.now()
+    check_available(lock_skus(quantities), quantities)
+    # The WHERE still guards each row: a database without row locks must not oversell either
+    updated = update_counts(quantities, '{reserved} = {reserved} + {qty}', '{stock} - {reserved} >= {qty}')
+    if updated != len(quantities):
+        check_available(lock_skus(quantities), quantities)
+        raise OutOfStock('')
+    expires_at = now + timedelta(seconds=reservation_setting('TTL'))
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, sku_id=sku_id, quantity=quantity, expires_at=expires_at)
+        for sku_id, quantity in sorted(quantities.items())
+    ])
+
+
+def order_quantities(order):
+    """
+    sku_id → quantity from the order's item snapshots.
+    """
+    quantities = {}
+    for snapshot, quantity in order.items.values_list('sku_snapshot', 'quantity'):
+        if snapshot.get('sku_id'):
+            quantities[snapshot['sku_id']] = quantities.get(snapshot['sku_id'], 0) + quantity
+    return quantities
+
+
+def convert_reservations(order):
+    """
+    Payment confirmed: take the order's held units off stock for good and
+    snapshot the new levels. When the holds expired before the payment came
+    in, the units are taken from what is available now (OutOfStock if gone).
+    Run only as the 'paid' transition hook: the compare-and-swap on pending
+    is what keeps a replayed payment from taking the units twice.
+    """
+    with transaction.atomic():
+        quantities = _take_holds(order.reservations.all())
+        if quantities:
+            lock_skus(quantities)
+            update_counts(quantities, '{stock} = {stock} - {qty}, {reserved} = {reserved} - {qty}')
+        else:
+            quantities = order_quantities(order)
+            if not quantities:
+                return
+            check_available(lock_skus(quantities), quantities)
+            updated = update_counts(quantities, '{stock} = {stock} - {qty}', '{stock} - {reserved} >= {qty}')
+            if updated != len(quantities):
+                raise OutOfStock('')
+        StockSnapshot.objects.bulk_create([
+            StockSnapshot(sku_id=sku_id, quantity=stock, reason=f"Order {order.order_number}")
+            for sku_id, stock in SKU.objects.filter(pk__in=quantities).values_list('pk', 'stock_quantity')
+        ])
+
+
+def release_reservations(order):
+    """
+    Order cancelled: its held units become available again. An order cancelled
+    after payment holds nothing – its units were taken off stock – so they go
+    back onto stock, snapshotted. Returns the units released.
+    """
+    with transaction.atomic():
+        quantities = _take_holds(order.reservations.all())
+        if quantities:
+            lock_skus(quantities)
+            update_counts(quantities, '{reserved} = {reserved} - {qty}')
+        elif order.paid_at:
+            quantities = order_quantities(order)
+            if not quantities:
+                return 0
+            lock_skus(quantities)
+            update_counts(quantities, '{stock} = {stock} + {qty}')
+            StockSnapshot.objects.bulk_create([
+                StockSnapshot(sku_id=sku_id, quantity=stock, reason=f"Order {order.order_number} cancelled")
+                for sku_id, stock in SKU.objects.filter(pk__in=quantities).values_list('pk', 'stock_quantity')
+            ])
+    return sum(quantities.values())
+
+
+def sweep_expired_reservations(now=None, batch_size=None):
+    """
+    Release every hold expired at `now`, `batch_size` holds per transaction
+    (holds locked by a payment or cancellation in progress are skipped).
+    Returns the number of holds released.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or reservation_setting('SWEEP_BATCH')
+    released = 0
+    while True:
+        with transaction.atomic():
+            holds = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now).order_by('expires_at', 'pk')
+                .values_list('pk', 'sku_id', 'quantity')[:batch_size]
+            )
+            if not holds:
+                return released
+            StockReservation.objects.filter(pk__in=[pk for pk, _, _ in holds]).delete()
+            quantities = _totals(holds)
+            lock_skus(quantities)
+            update_counts(quantities, '{reserved} = {reserved} - {qty}')
+        released += len(holds)
+        if len(holds) < batch_size:
+            return released
+
+
+# Run when an order enters the status (orders.transitions hook)
+RESERVATION_HOOKS = {
+    'paid': convert_reservations,
+    'cancelled': release_reservations,
+}
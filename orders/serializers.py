@@ -74,4 +74,9 @@ class OrderCreateSerializer(serializers.Serializer):
         pass
 
     def update(self, instance, validated_data):
-        pass
\ No newline at end of file
+        pass
+
+
+class OrderBulkStatusSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
@@ -1,3 +1,563 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from cart.models import Cart, CartItem
+from catalog.models import Product, SKU, StockSnapshot
+from promotions.models import Promotion
+from promotions.scheduler import sync_activation
+from users.utils import create_test_user, create_test_seller_user
+from .checkout import checkout
+from .idempotency import fingerprint, purge_expired_keys
+from .models import Delivery, IdempotencyKey, Order, OrderStatusEvent, StockReservation
+from .numbers import ALPHABET, BlockAllocator, next_order_number
+from .reservations import sweep_expired_reservations
+from .transitions import TransitionConflict, transition
 
-# Create your tests here.
+
+class OrderCreateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, self.seller_profile = create_test_seller_user()
+        self.product = Product.objects.create(
+            seller=self.seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=320000, verification_status='approved'
+        )
+        self.sku = SKU.objects.create(product=self.product, sku_code="SPARK-128", stock_quantity=5)
+        self.user = create_test_user()
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, sku=self.sku, quantity=2)
+        self.client.force_authenticate(self.user)
+
+    def test_checkout_snapshots_priced_cart(self):
+        response = self.client.post(reverse('orders:order_create'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.total_amount, Decimal('640000.00'))
+        item = order.items.get()
+        self.assertEqual((item.quantity, item.unit_price), (2, Decimal('320000.00')))
+        self.assertFalse(self.cart.items.exists())
+
+    def test_empty_cart_is_rejected(self):
+        self.cart.items.all().delete()
+        response = self.client.post(reverse('orders:order_create'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CheckoutIncentiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        _, self.seller_profile = create_test_seller_user()
+        self.product = Product.objects.create(
+            seller=self.seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=100000, verification_status='approved'
+        )
+        self.sku = SKU.objects.create(product=self.product, sku_code="SPARK-128", stock_quantity=5)
+        self.promotion = Promotion.objects.create(
+            name="Flash", promotion_type='timed', discount_percent=10, created_by=create_test_user(is_staff=True),
+            max_uses=5, start_datetime=now - timedelta(hours=1), end_datetime=now + timedelta(hours=1),
+        )
+        self.promotion.products.add(self.product)
+        self.user = create_test_user()
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, sku=self.sku, quantity=1)
+        self.client.force_authenticate(self.user)
+
+    def test_preview_writes_nothing(self):
+        sync_activation()  # activation flips belong to the scheduler, not to the preview
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart:cart_detail'))
+        self.assertEqual(response.data['discount_amount'], Decimal('10000.00'))
+        self.assertFalse([q for q in queries if not q['sql'].startswith('SELECT')])
+        self.promotion.refresh_from_db()
+        self.assertEqual((self.promotion.uses_count, self.promotion.total_burn), (0, Decimal('0.00')))
+
+    def test_counters_move_with_the_order(self):
+        response = self.client.post(reverse('orders:order_create'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.promotion.refresh_from_db()
+        self.assertEqual((self.promotion.uses_count, self.promotion.total_burn), (1, Decimal('10000.00')))
+
+    def test_exhausted_promotion_fails_the_whole_order(self):
+        # Budget cut between pricing and commit: the conditional update finds no row
+        Promotion.objects.filter(pk=self.promotion.pk).update(max_total_burn=5000)
+        response = self.client.post(reverse('orders:order_create'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(self.cart.items.exists())
+
+
+class CheckoutPipelineTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, seller_profile = create_test_seller_user()
+        self.skus = []
+        for n in range(3):
+            product = Product.objects.create(
+                seller=seller_profile, title=f"Phone {n}", description="-",
+                slug=f"phone-{n}", base_price=1000, verification_status='approved'
+            )
+            self.skus.append(SKU.objects.create(product=product, sku_code=f"PHONE-{n}", stock_quantity=5))
+        self.user = create_test_user()
+        self.cart = Cart.objects.create(user=self.user)
+        for sku in self.skus:
+            CartItem.objects.create(cart=self.cart, sku=sku, quantity=2)
+        self.client.force_authenticate(self.user)
+
+    def test_stock_is_held_for_the_order(self):
+        response = self.client.post(reverse('orders:order_create'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(set(SKU.objects.values_list('stock_quantity', 'reserved_quantity')), {(5, 2)})
+        self.assertEqual(sorted(order.reservations.values_list('sku_id', 'quantity')),
+                         [(sku.pk, 2) for sku in self.skus])
+
+    def test_one_short_line_fails_the_whole_order(self):
+        SKU.objects.filter(pk=self.skus[2].pk).update(reserved_quantity=4)  # held for someone else
+        response = self.client.post(reverse('orders:order_create'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Not enough stock for PHONE-2")
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(list(SKU.objects.order_by('pk').values_list('reserved_quantity', flat=True)), [0, 0, 4])
+        self.assertEqual(self.cart.items.count(), 3)
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        def checkout_queries(cart):
+            with CaptureQueriesContext(connection) as queries:
+                checkout(cart)
+            return len(queries)
+
+        small_user = create_test_user()
+        small_cart = Cart.objects.create(user=small_user)
+        CartItem.objects.create(cart=small_cart, sku=self.skus[0], quantity=1)
+        checkout_queries(small_cart)  # warm the promotion index and caches
+        small_cart = Cart.objects.create(user=create_test_user())
+        CartItem.objects.create(cart=small_cart, sku=self.skus[0], quantity=1)
+        self.assertEqual(checkout_queries(small_cart), checkout_queries(self.cart))
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    """
+    Buyers racing for the last units: every checkout either gets its units held
+    or fails with OutOfStock, and no more units are held than there are.
+    """
+    BUYERS = 8
+    STOCK = 5
+
+    def setUp(self):
+        cache.clear()
+        _, seller_profile = create_test_seller_user()
+        product = Product.objects.create(
+            seller=seller_profile, title="Last units", description="-",
+            slug="last-units", base_price=1000, verification_status='approved'
+        )
+        self.sku = SKU.objects.create(product=product, sku_code="LAST", stock_quantity=self.STOCK)
+        self.carts = []
+        for n in range(self.BUYERS):
+            cart = Cart.objects.create(user=create_test_user())
+            CartItem.objects.create(cart=cart, sku=self.sku, quantity=1)
+            self.carts.append(cart.pk)
+
+    def test_no_oversell(self):
+        results = []
+        barrier = threading.Barrier(self.BUYERS)
+
+        def buy(cart_pk):
+            try:
+                cart = Cart.objects.select_related('user').get(pk=cart_pk)
+                barrier.wait()
+                while True:
+                    try:
+                        checkout(cart)
+                        results.append('ok')
+                        return
+                    except OperationalError:
+                        continue  # SQLite: database locked by another writer – retry
+                    except ValidationError:
+                        results.append('out of stock')
+                        return
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buy, args=(pk,)) for pk in self.carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count('ok'), self.STOCK)
+        self.assertEqual(results.count('out of stock'), self.BUYERS - self.STOCK)
+        self.sku.refresh_from_db()
+        self.assertEqual((self.sku.stock_quantity, self.sku.reserved_quantity), (self.STOCK, self.STOCK))
+        self.assertEqual(self.sku.available_quantity, 0)
+        self.assertEqual(Order.objects.count(), self.STOCK)
+
+
+class StockReservationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, seller_profile = create_test_seller_user()
+        product = Product.objects.create(
+            seller=seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=1000, verification_status='approved'
+        )
+        self.sku = SKU.objects.create(product=product, sku_code="SPARK-128", stock_quantity=5)
+
+    def place_order(self, quantity=2):
+        user = create_test_user()
+        self.client.force_authenticate(user)
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, sku=self.sku, quantity=quantity)
+        response = self.client.post(reverse('orders:order_create'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return Order.objects.get(pk=response.data['id'])
+
+    def counts(self):
+        self.sku.refresh_from_db()
+        return self.sku.stock_quantity, self.sku.reserved_quantity
+
+    def test_payment_turns_the_hold_into_a_decrement(self):
+        order = self.place_order()
+        response = self.client.post(reverse('orders:order_pay', args=[order.pk]), {'payment_reference': 'MP1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.counts(), (3, 0))
+        self.assertFalse(order.reservations.exists())
+        self.assertEqual(StockSnapshot.objects.get(reason=f"Order {order.order_number}").quantity, 3)
+
+    def test_replayed_payment_does_not_take_the_units_twice(self):
+        order = self.place_order()
+        self.client.post(reverse('orders:order_pay', args=[order.pk]), {'payment_reference': 'MP1'})
+        response = self.client.post(reverse('orders:order_pay', args=[order.pk]), {'payment_reference': 'MP1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.counts(), (3, 0))
+        self.assertEqual(StockSnapshot.objects.filter(reason=f"Order {order.order_number}").count(), 1)
+
+    def test_cancel_releases_the_hold(self):
+        order = self.place_order()
+        response = self.client.post(reverse('orders:order_cancel', args=[order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.counts(), (5, 0))
+        self.assertFalse(order.reservations.exists())
+
+    def test_cancel_after_payment_restocks(self):
+        order = self.place_order()
+        self.client.post(reverse('orders:order_pay', args=[order.pk]), {'payment_reference': 'MP1'})
+        self.assertEqual(self.counts(), (3, 0))
+        self.client.force_authenticate(create_test_user(is_staff=True))
+        response = self.client.post(reverse('orders:order_status_update', args=[order.pk]), {'status': 'cancelled'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.counts(), (5, 0))
+        self.assertEqual(StockSnapshot.objects.get(reason=f"Order {order.order_number} cancelled").quantity, 5)
+
+    def test_hold_and_payment_refresh_the_cached_product_detail(self):
+        detail = reverse('catalog:product_detail', args=[self.sku.product.slug])
+        self.assertEqual(self.client.get(detail).data['skus'][0]['available_quantity'], 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.place_order()
+        self.assertEqual(self.client.get(detail).data['skus'][0]['available_quantity'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('orders:order_pay', args=[order.pk]), {'payment_reference': 'MP1'})
+        sku = self.client.get(detail).data['skus'][0]
+        self.assertEqual((sku['stock_quantity'], sku['available_quantity']), (3, 3))
+
+    def test_held_units_cannot_be_added_to_another_cart(self):
+        self.place_order(quantity=4)
+        self.client.force_authenticate(create_test_user())
+        response = self.client.post(reverse('cart:cart_add_item'), {'sku_id': self.sku.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(reverse('cart:cart_add_item'), {'sku_id': self.sku.pk, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_admin_status_changes_move_the_holds(self):
+        cancelled, paid, short = self.place_order(), self.place_order(), self.place_order(quantity=1)
+        StockReservation.objects.filter(order=short).update(expires_at=timezone.now() - timedelta(minutes=1))
+        sweep_expired_reservations()
+        self.assertEqual(self.counts(), (5, 4))
+        self.client.force_authenticate(create_test_user(is_staff=True))
+
+        response = self.client.post(reverse('orders:order_status_update', args=[cancelled.pk]), {'status': 'cancelled'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.counts(), (5, 2))
+
+        SKU.objects.filter(pk=self.sku.pk).update(stock_quantity=2)  # nothing left for the swept order
+        response = self.client.post(reverse('orders:admin_bulk_status'),
+                                    {'order_ids': [paid.pk, short.pk], 'status': 'paid'}, format='json')
+        self.assertEqual(response.data['updated'], [paid.pk])
+        self.assertEqual(list(response.data['skipped']), [short.pk])
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertEqual(Order.objects.get(pk=short.pk).status, 'pending')
+
+    def test_sweeper_releases_expired_holds_in_batches(self):
+        orders = [self.place_order(quantity=1) for _ in range(3)]
+        StockReservation.objects.filter(order__in=orders[:2]).update(expires_at=timezone.now() - timedelta(minutes=1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sweep_expired_reservations(batch_size=1), 2)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual(self.counts(), (5, 1))
+        self.assertEqual(list(StockReservation.objects.values_list('order', flat=True)), [orders[2].pk])
+
+    def test_payment_after_expiry_takes_available_stock(self):
+        order = self.place_order()
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        sweep_expired_reservations()
+        SKU.objects.filter(pk=self.sku.pk).update(reserved_quantity=4)  # meanwhile held for others
+        response = self.client.post(reverse('orders:order_pay', args=[order.pk]), {'payment_reference': 'MP1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'pending')
+        self.assertEqual(self.counts(), (5, 4))
+
+
+class OrderNumberTests(TestCase):
+    def test_numbers_are_compact_increasing_and_unguessable(self):
+        # A fresh allocator: the process-wide one may hold a block from a rolled-back test
+        with mock.patch('orders.numbers.order_numbers', BlockAllocator('order_number')):
+            numbers = [next_order_number() for _ in range(250)]
+        for number in numbers:
+            self.assertRegex(number, rf'^KK[{ALPHABET}]{{11}}$')
+        sequence = [number[:9] for number in numbers]
+        self.assertEqual(sequence, sorted(sequence))
+        self.assertEqual(len(set(sequence)), 250)
+        # Neighbours differ in their random suffix too
+        self.assertGreater(len({number[9:] for number in numbers}), 200)
+
+    def test_one_round_trip_per_block(self):
+        allocator = BlockAllocator('test', block_size=10)
+        with CaptureQueriesContext(connection) as queries:
+            values = [allocator.allocate() for _ in range(25)]
+        self.assertEqual(values, list(range(1, 26)))
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 3)
+
+    def test_forked_process_does_not_reuse_the_parent_block(self):
+        allocator = BlockAllocator('test', block_size=10)
+        self.assertEqual(allocator.allocate(), 1)
+        with mock.patch('orders.numbers.os.getpid', return_value=-1):
+            self.assertEqual(allocator.allocate(), 11)
+
+    def test_same_user_orders_in_the_same_second(self):
+        _, seller_profile = create_test_seller_user()
+        product = Product.objects.create(
+            seller=seller_profile, title="Phone", description="-",
+            slug="phone", base_price=1000, verification_status='approved'
+        )
+        sku = SKU.objects.create(product=product, sku_code="PHONE", stock_quantity=5)
+        cart = Cart.objects.create(user=create_test_user())
+        numbers = set()
+        for _ in range(2):
+            CartItem.objects.create(cart=cart, sku=sku, quantity=1)
+            numbers.add(checkout(cart).order_number)
+        self.assertEqual(len(numbers), 2)
+
+
+@skipUnless(os.environ.get('ORDER_NUMBER_PROCESS_TESTS'), "set ORDER_NUMBER_PROCESS_TESTS=1 to run")
+class OrderNumberProcessTests(TransactionTestCase):
+    """
+    Eight processes allocating 100,000 numbers: opt-in, and needs a test
+    database they can all open (DATABASES['default']['TEST']['NAME'] set to a
+    file in the settings used for the run).
+    """
+    def test_unique_across_processes(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("processes need a database they share")
+        out = StringIO()
+        call_command('check_order_numbers', processes=8, count=100000, stdout=out)
+        self.assertIn("100000 unique order numbers", out.getvalue())
+
+
+class OrderTransitionTests(APITestCase):
+    def setUp(self):
+        self.user = create_test_user()
+        self.admin = create_test_user(is_staff=True)
+
+    def make_order(self, status='paid'):
+        order = Order.objects.create(
+            user=self.user, order_number=next_order_number(), cart_snapshot={'items': []},
+            total_amount=1000, original_amount=1000, status=status,
+        )
+        return Order.objects.get(pk=order.pk)
+
+    def test_transition_is_one_conditional_update_and_an_event(self):
+        order = self.make_order()
+        with CaptureQueriesContext(connection) as queries:
+            transition(order, 'confirmed', actor=self.admin)
+        statements = [q['sql'] for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(len(statements), 2)
+        self.assertTrue(statements[0].startswith('UPDATE'))
+        self.assertIn('"status" = ', statements[0].split('WHERE')[1])
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'confirmed')
+        event = order.status_events.get()
+        self.assertEqual((event.from_status, event.to_status, event.actor), ('paid', 'confirmed', self.admin))
+
+    def test_stale_instance_does_not_overwrite(self):
+        order = self.make_order()
+        stale = Order.objects.get(pk=order.pk)
+        transition(order, 'cancelled', actor=self.user)
+        with self.assertRaises(TransitionConflict):
+            transition(stale, 'confirmed', actor=self.admin)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'cancelled')
+        self.assertEqual(OrderStatusEvent.objects.count(), 1)
+
+    def test_save_checks_the_loaded_status_without_a_query(self):
+        order = self.make_order(status='delivered')
+        order.status = 'pending'
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertRaises(ValidationError):
+                order.clean()
+        self.assertEqual(len(queries), 0)
+
+    def test_views_share_the_engine(self):
+        order = self.make_order(status='shipped')
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('orders:order_cancel', args=[order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(reverse('orders:order_status_update', args=[order.pk]), {'status': 'delivered'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        order.refresh_from_db()
+        self.assertIsNotNone(order.delivered_at)
+        self.assertEqual(list(order.status_events.values_list('to_status', 'actor')), [('delivered', self.admin.pk)])
+
+    def test_refund_requires_a_dispute(self):
+        self.client.force_authenticate(self.admin)
+        paid, disputed = self.make_order(), self.make_order(status='disputed')
+        response = self.client.post(reverse('orders:admin_refund', args=[paid.pk]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Invalid transition: paid → refunded")
+        response = self.client.post(reverse('orders:admin_refund', args=[disputed.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['status'], 'refunded')
+
+    def test_delivery_proof_from_the_seller_moves_the_order(self):
+        seller, seller_profile = create_test_seller_user()
+        product = Product.objects.create(
+            seller=seller_profile, title="Phone", description="-",
+            slug="phone", base_price=1000, verification_status='approved'
+        )
+        sku = SKU.objects.create(product=product, sku_code="PHONE", stock_quantity=5)
+        pending, shipped = self.make_order(status='pending'), self.make_order(status='shipped')
+        for order in (pending, shipped):
+            order.items.create(sku_snapshot={'sku_id': sku.pk}, quantity=1, unit_price=1000, total_price=1000)
+            Delivery.objects.create(order=order, estimated_delivery=timezone.now())
+
+        def upload(order):
+            return self.client.post(reverse('orders:delivery_proof', args=[order.pk]),
+                                    {'proof': SimpleUploadedFile('proof.jpg', b'jpeg')}, format='multipart')
+
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            self.client.force_authenticate(self.user)
+            self.assertEqual(upload(shipped).status_code, status.HTTP_403_FORBIDDEN)
+            self.client.force_authenticate(seller)
+            response = upload(pending)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIsNone(Delivery.objects.get(order=pending).actual_delivery)
+            response = upload(shipped)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(Order.objects.get(pk=shipped.pk).status, 'delivered')
+        self.assertIsNotNone(Delivery.objects.get(order=shipped).actual_delivery)
+
+    def test_bulk_transition_writes_in_bulk(self):
+        orders = [self.make_order() for _ in range(3)] + [self.make_order(status='pending')]
+        Order.objects.filter(pk=orders[2].pk).update(status='cancelled')  # moved after the admin loaded the page
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('orders:admin_bulk_status'),
+                                        {'order_ids': [order.pk for order in orders], 'status': 'confirmed'},
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['updated'], [orders[0].pk, orders[1].pk])
+        self.assertEqual(set(response.data['skipped']), {orders[2].pk, orders[3].pk})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith(('UPDATE', 'INSERT'))]), 2)
+        self.assertEqual(OrderStatusEvent.objects.filter(to_status='confirmed', actor=self.admin).count(), 2)
+
+
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _, seller_profile = create_test_seller_user()
+        product = Product.objects.create(
+            seller=seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=1000, verification_status='approved'
+        )
+        self.sku = SKU.objects.create(product=product, sku_code="SPARK-128", stock_quantity=5)
+        self.user = create_test_user()
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, sku=self.sku, quantity=1)
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, key, data=None):
+        return self.client.post(reverse('orders:order_create'), data or {}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_checkout_replays_with_one_read(self):
+        first = self.create_order('checkout-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED, first.data)
+        CartItem.objects.create(cart=self.cart, sku=self.sku, quantity=1)  # would make a second order
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.create_order('checkout-1')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+    def test_retried_payment_replays(self):
+        order = Order.objects.get(pk=self.create_order('checkout-1').data['id'])
+        url = reverse('orders:order_pay', args=[order.pk])
+        first = self.client.post(url, {'payment_reference': 'MP1'}, HTTP_IDEMPOTENCY_KEY='pay-1')
+        retry = self.client.post(url, {'payment_reference': 'MP1'}, HTTP_IDEMPOTENCY_KEY='pay-1')
+        self.assertEqual((first.status_code, retry.status_code), (status.HTTP_200_OK, status.HTTP_200_OK))
+        self.assertEqual(order.status_events.filter(to_status='paid').count(), 1)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.create_order('checkout-1')
+        response = self.create_order('checkout-1', {'discount_code': 'WELCOME'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    @override_settings(IDEMPOTENCY={'WAIT': 0.1})
+    def test_concurrent_duplicate_waits_then_conflicts(self):
+        first = self.create_order('checkout-1')
+        # As if the first request were still running
+        IdempotencyKey.objects.update(status_code=None, locked_until=timezone.now() + timedelta(seconds=30))
+        response = self.create_order('checkout-1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+    def test_abandoned_lock_is_taken_over(self):
+        # A first attempt died mid-request: its row has no response and an expired lock
+        request = SimpleNamespace(method='POST', path=reverse('orders:order_create'), data={})
+        IdempotencyKey.objects.create(
+            scope=f'user:{self.user.pk}', key='checkout-1', fingerprint=fingerprint(request),
+            locked_until=timezone.now() - timedelta(seconds=1), expires_at=timezone.now() + timedelta(hours=1),
+        )
+        response = self.create_order('checkout-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_purge_deletes_expired_keys_in_batches(self):
+        now = timezone.now()
+        IdempotencyKey.objects.bulk_create([
+            IdempotencyKey(scope='user:1', key=f'k{n}', fingerprint='-', status_code=200,
+                           expires_at=now + timedelta(hours=-1 if n < 5 else 1))
+            for n in range(7)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(purge_expired_keys(batch_size=2), 5)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('DELETE')]), 3)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
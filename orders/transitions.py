@@ -0,0 +1,135 @@
+"""
+Order status transitions.
+
+One engine for every status change, on the table of Order.valid_transitions().
+A transition is checked against the status the order had when it was loaded
+(Order.from_db) and applied as a compare-and-swap:
+
+    UPDATE orders_order SET status = new, … WHERE id = ? AND status = old
+
+so of two concurrent changes to the same order only the first applies; the
+second finds no row and raises TransitionConflict instead of overwriting it.
+Each applied transition appends an OrderStatusEvent (timestamp, actor);
+transition_many() moves a batch with one UPDATE and one bulk insert per
+starting status. A `hook` (e.g. orders.reservations.RESERVATION_HOOKS) runs
+for each order moved, in the same transaction: if it raises, the order stays
+where it was.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .models import Order, OrderStatusEvent
+
+# Timestamp set when an order enters a status
+STATUS_TIMESTAMPS = {
+    'paid': 'paid_at',
+    'delivered': 'delivered_at',
+    'completed': 'completed_at',
+}
+
+
+class InvalidTransition(ValidationError):
+    pass
+
+
+class TransitionConflict(InvalidTransition):
+    """
+    The order's status changed since it was loaded.
+    """
+
+
+def check_transition(old, new):
+    if new not in Order.valid_transitions().get(old, []):
+        raise InvalidTransition(f"Invalid transition: {old} → {new}")
+
+
+def _changes(new_status, now, fields):
+    changes = dict(fields, status=new_status)
+    if new_status in STATUS_TIMESTAMPS:
+        changes.setdefault(STATUS_TIMESTAMPS[new_status], now)
+    return changes
+
+
+def _status(order):
+    return order.loaded_status if order.loaded_status is not None else order.status
+
+
+def transition(order, new_status, actor=None, hook=None, **fields):
+    """
+    Move `order` to `new_status`, also setting `fields` (and the status's timestamp),
+    then call hook(order). Raises InvalidTransition, or TransitionConflict when the
+    order moved meanwhile. Returns the OrderStatusEvent.
+    """
+    old = _status(order)
+    check_transition(old, new_status)
+    now = timezone.now()
+    changes = _changes(new_status, now, fields)
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, status=old).update(**changes):
+            raise TransitionConflict(f"Order {order.order_number} is no longer {old}")
+        event = OrderStatusEvent.objects.create(
+            order=order, from_status=old, to_status=new_status, actor=actor, created_at=now
+        )
+        if hook:
+            hook(order)
+    for name, value in changes.items():
+        setattr(order, name, value)
+    order._loaded_status = new_status
+    return event
+
+
+def transition_many(orders, new_status, actor=None, hook=None, **fields):
+    """
+    Move each of `orders` to `new_status`. Orders the transition is not valid
+    for, that moved since they were loaded, or whose hook(order) raised
+    ValidationError are skipped.
+    Returns (moved orders, {order pk: reason} for the skipped ones).
+    """
+    now = timezone.now()
+    changes = _changes(new_status, now, fields)
+    skipped = {}
+    by_status = {}
+    for order in orders:
+        old = _status(order)
+        try:
+            check_transition(old, new_status)
+        except InvalidTransition as e:
+            skipped[order.pk] = e.messages[0]
+            continue
+        by_status.setdefault(old, {})[order.pk] = order
+
+    moved = []
+    with transaction.atomic():
+        events = []
+        for old, group in by_status.items():
+            # Lock the rows still in `old`: the ones that moved meanwhile are left out of the UPDATE
+            current = set(
+                Order.objects.select_for_update().filter(pk__in=group, status=old).values_list('pk', flat=True)
+            )
+            for pk in group.keys() - current:
+                skipped[pk] = f"Order {group[pk].order_number} is no longer {old}"
+            if hook:
+                # Before the UPDATE, each in its own savepoint: the rows are locked, and one
+                # failing order is left out of it alone
+                for pk in sorted(current):
+                    try:
+                        with transaction.atomic():
+                            hook(group[pk])
+                    except ValidationError as e:
+                        skipped[pk] = " ".join(e.messages)
+                        current.discard(pk)
+            if not current:
+                continue
+            Order.objects.filter(pk__in=current, status=old).update(**changes)
+            for pk in sorted(current):
+                moved.append(group[pk])
+                events.append(OrderStatusEvent(
+                    order_id=pk, from_status=old, to_status=new_status, actor=actor, created_at=now
+                ))
+        OrderStatusEvent.objects.bulk_create(events)
+
+    for order in moved:
+        for name, value in changes.items():
+            setattr(order, name, value)
+        order._loaded_status = new_status
+    return moved, skipped
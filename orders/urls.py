@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
     OrderListView, OrderDetailView, OrderCreateView,
-    OrderPaymentUpdateView, OrderStatusUpdateView,
+    OrderPaymentUpdateView, OrderStatusUpdateView, OrderBulkStatusUpdateView,
     OrderCancelView, OrderDeliveryProofUploadView,
     AdminOrderRefundView
 )
@@ -17,4 +17,5 @@ urlpatterns = [
     path('<int:pk>/cancel/', OrderCancelView.as_view(), name='order_cancel'),
     path('<int:pk>/delivery-proof/', OrderDeliveryProofUploadView.as_view(), name='delivery_proof'),
     path('admin/<int:pk>/refund/', AdminOrderRefundView.as_view(), name='admin_refund'),
+    path('admin/status/', OrderBulkStatusUpdateView.as_view(), name='admin_bulk_status'),
 ]
\ No newline at end of file
@@ -6,10 +6,13 @@ from django.utils import timezone
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from cart.models import Cart
-from cart.utils import apply_loyalty_points
-from cart.views import CartDetailView  # Reuse incentive logic
-from .models import Order, OrderItem, Delivery
-from .serializers import OrderListSerializer, OrderDetailSerializer
+from catalog.models import SKU
+from .checkout import checkout
+from .idempotency import idempotent
+from .models import Order, Delivery
+from .reservations import RESERVATION_HOOKS, order_quantities
+from .serializers import OrderListSerializer, OrderDetailSerializer, OrderBulkStatusSerializer
+from .transitions import InvalidTransition, TransitionConflict, transition, transition_many
 
 
 class OrderListView(generics.ListAPIView):
@@ -37,100 +40,43 @@ class OrderCreateView(APIView):
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def post(self, request):
         discount_code = request.data.get('discount_code', '').strip()
         points_to_use = int(request.data.get('use_loyalty_points', 0))
 
         cart = get_object_or_404(Cart, user=request.user)
-        if not cart.items.exists():
-            return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Re-check stock before checkout
-        for item in cart.items.all():
-            if item.quantity > item.sku.stock_quantity:
-                return Response({"error": f"Not enough stock for {item.sku.sku_code}"}, status=400)
-
-        # Apply promotion + discount code
-        cart_view = CartDetailView()
-        base_incentives = cart_view.apply_promotion_and_code(cart, discount_code)
-
-        # Apply loyalty points
-        loyalty_discount = 0
-        loyalty_applied = []
-        if points_to_use > 0:
-            try:
-                loyalty_result = apply_loyalty_points(cart, points_to_use)
-                loyalty_discount = loyalty_result['discount_amount']
-                loyalty_applied = [{'type': 'loyalty', 'amount': loyalty_discount}]
-            except ValidationError as e:
-                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-        final_total = base_incentives['final_total'] - loyalty_discount
-        if final_total < 0:
-            final_total = 0
-
-        with transaction.atomic():
-            # Build immutable snapshot
-            order_items_data = []
-            for item in cart.items.all():
-                price = item.sku.price_override or item.sku.product.base_price
-                order_items_data.append({
-                    'sku_snapshot': {
-                        'sku_code': item.sku.sku_code,
-                        'variant_attributes': item.sku.variant_attributes,
-                        'product_title': item.sku.product.title,
-                        'brand': item.sku.product.brand.name if item.sku.product.brand else '',
-                        'base_price': float(price),
-                    },
-                    'quantity': item.quantity,
-                    'unit_price': float(price),
-                    'total_price': float(price * item.quantity),
-                })
-
-            all_applied = base_incentives['applied_incentives'] + loyalty_applied
-
-            order = Order.objects.create(
-                user=request.user,
-                order_number=f"KK{timezone.now().strftime('%Y%m%d%H%M%S')}{request.user.id}",
-                original_amount=base_incentives['original_total'],
-                discount_amount=base_incentives['total_discount'] + loyalty_discount,
-                total_amount=final_total,
-                applied_incentives=all_applied,
-                status='pending',
-                cart_snapshot={
-                    'items': order_items_data,
-                    'incentives': all_applied,
-                    'original_total': base_incentives['original_total'],
-                    'final_total': final_total
-                }
-            )
-
-            for data in order_items_data:
-                OrderItem.objects.create(order=order, **data)
-
-            Delivery.objects.create(order=order, estimated_delivery=timezone.now() + timezone.timedelta(days=3))
-
-            # Clear cart
-            cart.items.all().delete()
-            cart.updated_at = timezone.now()
-            cart.save(update_fields=['updated_at'])
+        try:
+            # orders.checkout: one pricing pass, conditional stock decrement, bulk writes
+            order = checkout(cart, discount_code, points_to_use)
+        except ValidationError as e:
+            return Response({"error": " ".join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(OrderDetailSerializer(order).data, status=status.HTTP_201_CREATED)
 
 
+def transition_error(e):
+    code = status.HTTP_409_CONFLICT if isinstance(e, TransitionConflict) else status.HTTP_400_BAD_REQUEST
+    return Response({"error": " ".join(e.messages)}, status=code)
+
+
 class OrderPaymentUpdateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def post(self, request, pk):
         order = get_object_or_404(Order, pk=pk, user=request.user)
         if order.status != 'pending':
             return Response({"error": "Order not pending payment"}, status=status.HTTP_400_BAD_REQUEST)
 
-        payment_ref = request.data.get('payment_reference')
-        order.status = 'paid'
-        order.payment_reference = payment_ref
-        order.paid_at = timezone.now()
-        order.save()
+        try:
+            # The units held at checkout leave stock for good
+            transition(order, 'paid', actor=request.user, hook=RESERVATION_HOOKS['paid'],
+                       payment_reference=request.data.get('payment_reference') or '')
+        except InvalidTransition as e:
+            return transition_error(e)
+        except ValidationError as e:
+            return Response({"error": " ".join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"message": "Payment recorded", "status": order.status})
 
@@ -141,26 +87,37 @@ class OrderStatusUpdateView(APIView):
     def post(self, request, pk):
         order = get_object_or_404(Order, pk=pk)
         new_status = request.data.get('status')
+        # Escrow is released with completion
+        fields = {'escrow_released': True} if new_status == 'completed' else {}
+        try:
+            transition(order, new_status, actor=request.user, hook=RESERVATION_HOOKS.get(new_status), **fields)
+        except InvalidTransition as e:
+            return transition_error(e)
+        except ValidationError as e:
+            return Response({"error": " ".join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
 
-        valid_transitions = {
-            'paid': ['confirmed', 'cancelled'],
-            'confirmed': ['shipped'],
-            'shipped': ['delivered'],
-            'delivered': ['completed'],
-        }
+        return Response({"message": f"Order {new_status}", "status": order.status})
 
-        if order.status not in valid_transitions or new_status not in valid_transitions[order.status]:
-            return Response({"error": "Invalid status transition"}, status=status.HTTP_400_BAD_REQUEST)
 
-        order.status = new_status
-        if new_status == 'delivered':
-            order.delivered_at = timezone.now()
-        elif new_status == 'completed':
-            order.completed_at = timezone.now()
-            order.escrow_released = True
-        order.save()
+class OrderBulkStatusUpdateView(APIView):
+    """
+    POST: Move many orders to one status
+    Body: {"order_ids": [12, 13, 14], "status": "shipped"}
+    Orders the change is not valid for are skipped and reported.
+    """
+    permission_classes = [permissions.IsAdminUser]
 
-        return Response({"message": f"Order {new_status}", "status": order.status})
+    def post(self, request):
+        serializer = OrderBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data['status']
+        orders = Order.objects.filter(pk__in=serializer.validated_data['order_ids'])
+        fields = {'escrow_released': True} if new_status == 'completed' else {}
+        moved, skipped = transition_many(
+            orders, new_status, actor=request.user, hook=RESERVATION_HOOKS.get(new_status), **fields
+        )
+
+        return Response({"updated": [order.pk for order in moved], "skipped": skipped})
 
 
 class OrderCancelView(APIView):
@@ -168,34 +125,44 @@ class OrderCancelView(APIView):
 
     def post(self, request, pk):
         order = get_object_or_404(Order, pk=pk, user=request.user)
-        if order.status not in ['pending', 'paid', 'confirmed']:
-            return Response({"error": "Cannot cancel at this stage"}, status=status.HTTP_400_BAD_REQUEST)
-
-        order.status = 'cancelled'
-        order.save()
+        try:
+            transition(order, 'cancelled', actor=request.user, hook=RESERVATION_HOOKS['cancelled'])
+        except InvalidTransition as e:
+            return transition_error(e)
 
         return Response({"message": "Order cancelled", "status": order.status})
 
 
+def sold_by(order, user):
+    """
+    Whether `user` sells any of the order's SKUs.
+    """
+    return SKU.objects.filter(pk__in=order_quantities(order), product__seller__user=user).exists()
+
+
 class OrderDeliveryProofUploadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
         order = get_object_or_404(Order, pk=pk)
         delivery = get_object_or_404(Delivery, order=order)
+        if not (request.user.is_staff or sold_by(order, request.user)):
+            return Response({"error": "Only the seller can confirm delivery"}, status=status.HTTP_403_FORBIDDEN)
 
         proof_file = request.FILES.get('proof')
         if not proof_file:
             return Response({"error": "Proof file required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        delivery.delivery_proof = proof_file
-        delivery.actual_delivery = timezone.now()
-        delivery.status = 'delivered'
-        delivery.save()
-
-        order.status = 'delivered'
-        order.delivered_at = timezone.now()
-        order.save()
+        # The order moves first: if it cannot, the delivery is left as it was
+        try:
+            with transaction.atomic():
+                transition(order, 'delivered', actor=request.user)
+                delivery.delivery_proof = proof_file
+                delivery.actual_delivery = timezone.now()
+                delivery.status = 'delivered'
+                delivery.save()
+        except InvalidTransition as e:
+            return transition_error(e)
 
         return Response({"message": "Delivery confirmed with proof"})
 
@@ -205,10 +172,10 @@ class AdminOrderRefundView(APIView):
 
     def post(self, request, pk):
         order = get_object_or_404(Order, pk=pk)
-        if order.status in ['completed', 'refunded']:
-            return Response({"error": "Cannot refund at this stage"}, status=status.HTTP_400_BAD_REQUEST)
-
-        order.status = 'refunded'
-        order.save()
+        # Only a disputed order can be refunded: the transition table says so
+        try:
+            transition(order, 'refunded', actor=request.user)
+        except InvalidTransition as e:
+            return transition_error(e)
 
         return Response({"message": "Refund processed", "status": order.status})
\ No newline at end of file
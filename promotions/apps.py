@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PromotionsConfig(AppConfig):
     name = 'promotions'
+
+    def ready(self):
+        import promotions.signals  # noqa: F401
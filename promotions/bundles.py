@@ -0,0 +1,82 @@
+"""
+Bundle deal matching.
+
+A BundleDeal sells one unit of each of its bundle_skus for bundle_price; with
+enough units in the cart it applies several times. Units sold in a bundle do
+not also get their item promotion (no stacking), so choosing bundles is a
+small packing problem: maximise
+
+    Σ bundle savings × times + Σ item-promotion discount on the units left over
+
+Candidates come from PromotionIndex.bundles_by_sku – only bundles sharing a SKU
+with the cart are looked at, and only those whose SKUs are all present are
+kept – so the cost follows the cart, not the number of live bundles. The
+search is a depth-first branch and bound over the candidates, best saving
+first: the first leaf is the greedy answer, and MAX_NODES caps the work on
+pathological carts (the best combination found so far is used then).
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+MAX_NODES = 20000
+ZERO = Decimal('0.00')
+
+Bundle = namedtuple('Bundle', 'pk promotion_id price sku_ids')
+
+
+def best_combination(candidates, units, unit_prices, item_discount, max_nodes=MAX_NODES):
+    """
+    candidates: Bundles whose SKUs are all in the cart
+    units: {sku_id: quantity}; unit_prices: {sku_id: Decimal}
+    item_discount(sku_id, quantity): item-promotion discount on `quantity` units outside bundles
+    Returns ({bundle_pk: times}, total discount).
+    """
+    options = []
+    for bundle in candidates:
+        saving = sum(unit_prices[sku_id] for sku_id in bundle.sku_ids) - bundle.price
+        if saving > 0:
+            options.append((saving, bundle))
+    options.sort(key=lambda option: (-option[0], option[1].pk))
+
+    remaining = dict(units)
+
+    def leftover_value():
+        return sum((item_discount(sku_id, quantity) for sku_id, quantity in remaining.items() if quantity),
+                   ZERO)
+
+    def max_times(bundle):
+        return min(remaining[sku_id] for sku_id in bundle.sku_ids)
+
+    best = {'value': leftover_value(), 'chosen': {}}
+    chosen = {}
+    nodes = 0
+
+    def search(position, value):
+        nonlocal nodes
+        nodes += 1
+        leftover = leftover_value()
+        if value + leftover > best['value']:
+            best['value'], best['chosen'] = value + leftover, dict(chosen)
+        if position == len(options) or nodes >= max_nodes:
+            return
+        # Item discounts only shrink as units go into bundles: this bounds every completion
+        bound = value + leftover + sum(saving * max_times(bundle) for saving, bundle in options[position:])
+        if bound <= best['value']:
+            return
+
+        saving, bundle = options[position]
+        for times in range(max_times(bundle), -1, -1):
+            for sku_id in bundle.sku_ids:
+                remaining[sku_id] -= times
+            if times:
+                chosen[bundle.pk] = times
+            search(position + 1, value + saving * times)
+            chosen.pop(bundle.pk, None)
+            for sku_id in bundle.sku_ids:
+                remaining[sku_id] += times
+            if nodes >= max_nodes:
+                return
+
+    if options:
+        search(0, ZERO)
+    return best['chosen'], best['value']
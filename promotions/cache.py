@@ -0,0 +1,34 @@
+"""
+Cache versioning for promotions.
+
+ACTIVE_NAMESPACE is bumped on every Promotion write (promotions.signals) and
+whenever a window opens or closes (promotions.scheduler), so anything derived
+from the set of live promotions can key on its version alone.
+CODES_NAMESPACE does the same for discount codes.
+
+A code's validation payload is cached under code_key(id) and deleted whenever
+the code is written or its uses_count moves (promotions.counters).
+"""
+from django.core.cache import cache
+from kkoo.cache import bump_version
+from kkoo.surrogate import queue_purge
+
+ACTIVE_NAMESPACE = 'promotions:active'
+CODES_NAMESPACE = 'promotions:codes'
+
+
+def invalidate_promotions():
+    bump_version(ACTIVE_NAMESPACE)
+    queue_purge('promotions')
+
+
+def invalidate_discount_codes():
+    bump_version(CODES_NAMESPACE)
+
+
+def code_key(code_id):
+    return f'promotions:code:{code_id}'
+
+
+def invalidate_code(*code_ids):
+    cache.delete_many([code_key(code_id) for code_id in code_ids])
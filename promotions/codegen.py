@@ -0,0 +1,137 @@
+"""
+Bulk discount code generation.
+
+generate_codes() makes `count` unique codes in chunks: a chunk of random
+candidates is checked against the unique index with one `code__in` query,
+collisions are redrawn, and the chunk is written with one executemany INSERT
+in its own savepoint (a concurrent insert of the same code fails only that chunk,
+which is redrawn). It yields each chunk's codes once written, so callers can
+stream them out (CSV) without holding the whole run in memory.
+
+The insert skips DiscountCode.save(): the fields are validated once for the
+run, is_active is computed here and the code caches are invalidated at the end.
+"""
+import csv
+import secrets
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from .cache import invalidate_discount_codes
+from .models import DiscountCode
+from .scheduler import clear_next_boundary
+
+# No 0/O, 1/I/L: codes get read out and typed on phones
+DEFAULT_ALPHABET = '23456789ABCDEFGHJKMNPQRSTUVWXYZ'
+DEFAULT_LENGTH = 8
+CHUNK_SIZE = 5000
+MAX_ATTEMPTS = 20
+
+_random = secrets.SystemRandom()
+
+CSV_HEADER = ['code', 'discount_amount', 'max_uses', 'valid_from', 'valid_until']
+
+
+def keyspace(alphabet, length):
+    return len(set(alphabet)) ** length
+
+
+def validate_options(count, prefix='', length=DEFAULT_LENGTH, alphabet=DEFAULT_ALPHABET):
+    max_length = DiscountCode._meta.get_field('code').max_length
+    if len(prefix) + length > max_length:
+        raise ValidationError(f"Prefix and length must fit in {max_length} characters")
+    if len(set(alphabet)) < 2:
+        raise ValidationError("Alphabet needs at least two distinct characters")
+    # Keep codes sparse: guessing one must stay hopeless, and redraws rare
+    if keyspace(alphabet, length) < count * 1000:
+        raise ValidationError("Alphabet and length allow too few codes for this count – use a longer code")
+
+
+def generate_codes(count, template, prefix='', length=DEFAULT_LENGTH, alphabet=DEFAULT_ALPHABET,
+                   chunk_size=CHUNK_SIZE):
+    """
+    Create `count` codes from `template` (DiscountCode field values, created_by included).
+    Options and template are validated here (ValidationError); the codes are
+    written as the returned generator is consumed – it yields one list of code
+    strings per written chunk.
+    """
+    prefix = prefix.upper()
+    alphabet = ''.join(dict.fromkeys(alphabet.upper()))
+    validate_options(count, prefix, length, alphabet)
+    sample = DiscountCode(code=prefix + alphabet[0] * length, **template)
+    sample.full_clean(validate_unique=False)
+    now = timezone.now()
+    sample.created_at = now
+    sample.is_active = sample.valid_from <= now <= sample.valid_until and sample.max_uses > 0
+    return _write_chunks(count, sample, prefix, length, alphabet, chunk_size)
+
+
+def _write_chunks(count, sample, prefix, length, alphabet, chunk_size):
+    # Every row shares the sample's values but the code: adapt them for the database once,
+    # not once per row as bulk_create would
+    fields = [field for field in DiscountCode._meta.concrete_fields if not field.primary_key]
+    shared = [field.get_db_prep_save(getattr(sample, field.attname), connection) for field in fields]
+    position = [field.attname for field in fields].index('code')
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(DiscountCode._meta.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+
+    def draw(n):
+        return {prefix + ''.join(_random.choices(alphabet, k=length)) for _ in range(n)}
+
+    def insert(codes):
+        rows = []
+        for code in codes:
+            row = list(shared)
+            row[position] = code
+            rows.append(row)
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+    remaining = count
+    try:
+        while remaining:
+            size = min(chunk_size, remaining)
+            for _ in range(MAX_ATTEMPTS):
+                # One lookup on the unique index per round; collisions are redrawn
+                codes = set()
+                while len(codes) < size:
+                    fresh = draw(size - len(codes)) - codes
+                    taken = set(DiscountCode.objects.filter(code__in=fresh).values_list('code', flat=True))
+                    codes |= fresh - taken
+                codes = sorted(codes)
+                try:
+                    with transaction.atomic():
+                        insert(codes)
+                except IntegrityError:
+                    continue  # raced with another writer: redraw the chunk
+                break
+            else:
+                raise IntegrityError("Could not draw unique codes – the keyspace is too crowded")
+            remaining -= size
+            yield codes
+    finally:
+        invalidate_discount_codes()
+        clear_next_boundary()
+
+
+class Echo:
+    """
+    File-like object whose write() returns the line: csv.writer → generator.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_rows(chunks, template):
+    """
+    CSV lines for generate_codes() chunks, header first.
+    """
+    writer = csv.writer(Echo())
+    shared = [template['discount_amount'], template.get('max_uses', 1),
+              template['valid_from'].isoformat(), template['valid_until'].isoformat()]
+    yield writer.writerow(CSV_HEADER)
+    for codes in chunks:
+        for code in codes:
+            yield writer.writerow([code, *shared])
@@ -0,0 +1,60 @@
+"""
+In-memory set of currently valid discount codes.
+
+DiscountCodeValidateView is public, so most requests it sees can be guesses.
+Every active code (is_active is kept current at window boundaries by
+promotions.scheduler) is loaded once per process into a dict code → id; a
+code that is not in it is rejected without a query. The dict is rebuilt when
+the codes version (promotions.cache.CODES_NAMESPACE) moves: code writes and
+activation flips. A code running out of uses only drops its per-code cache
+entry (promotions.counters), so checkouts do not rebuild every process's set;
+it stays in the set, refused by that entry, until the next rebuild.
+
+A plain dict rather than a Bloom filter: it has no false positives and the id
+lets the view key its per-code cache; at ~100 bytes per code, 100k codes cost
+about 10 MB per process.
+"""
+import threading
+from kkoo.cache import get_version
+from .cache import CODES_NAMESPACE
+from .scheduler import ensure_activation_current
+
+
+class CodeSet:
+    def __init__(self, codes, version=None):
+        self.codes = codes
+        self.version = version
+
+    @classmethod
+    def build(cls, version=None):
+        from .models import DiscountCode
+        return cls(dict(DiscountCode.objects.filter(is_active=True).values_list('code', 'id')), version=version)
+
+    def get(self, code):
+        return self.codes.get(code)
+
+    def __contains__(self, code):
+        return code in self.codes
+
+    def __len__(self):
+        return len(self.codes)
+
+
+_codes = None
+_lock = threading.Lock()
+
+
+def get_valid_codes():
+    """
+    The process-wide CodeSet, rebuilt when the codes version changed.
+    """
+    global _codes
+    ensure_activation_current()
+    version = get_version(CODES_NAMESPACE)
+    codes = _codes
+    if codes is None or codes.version != version:
+        with _lock:
+            codes = _codes
+            if codes is None or codes.version != version:
+                codes = _codes = CodeSet.build(version)
+    return codes
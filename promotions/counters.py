@@ -0,0 +1,61 @@
+"""
+Promotion and discount-code usage counters.
+
+Counters only move when an order commits (OrderCreateView, inside its
+transaction) – pricing and previews never write. Each increment is a single
+conditional UPDATE with F() expressions, so the limit check and the write are
+one atomic statement:
+
+    UPDATE … SET uses_count = uses_count + 1, total_burn = total_burn + :burn
+    WHERE id = :id AND is_active AND uses_count < max_uses AND total_burn + :burn <= max_total_burn
+
+No row updated means the promotion ran out meanwhile and the order is refused.
+Rows are updated in id order so concurrent checkouts lock them in the same order.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q
+from .cache import invalidate_promotions, invalidate_code
+from .models import Promotion, DiscountCode
+
+
+class UsageLimitReached(ValidationError):
+    pass
+
+
+def commit_promotion_usage(usage):
+    """
+    usage: {promotion_id: burn} – one use per promotion per order.
+    """
+    if not usage:
+        return
+    for promotion_id in sorted(usage):
+        burn = usage[promotion_id]
+        updated = Promotion.objects.filter(
+            Q(max_uses__isnull=True) | Q(uses_count__lt=F('max_uses')),
+            Q(max_total_burn__isnull=True) | Q(total_burn__lte=F('max_total_burn') - burn),
+            pk=promotion_id,
+            is_active=True,
+        ).update(uses_count=F('uses_count') + 1, total_burn=F('total_burn') + burn)
+        if not updated:
+            raise UsageLimitReached("A promotion in your cart has just run out – please review your cart")
+
+    exhausted = Promotion.objects.filter(
+        Q(uses_count__gte=F('max_uses')) | Q(total_burn__gte=F('max_total_burn')),
+        pk__in=list(usage),
+        is_active=True,
+    ).update(is_active=False)
+    if exhausted:
+        transaction.on_commit(invalidate_promotions)
+
+
+def commit_code_usage(code_id):
+    updated = DiscountCode.objects.filter(
+        pk=code_id, is_active=True, uses_count__lt=F('max_uses')
+    ).update(uses_count=F('uses_count') + 1)
+    if not updated:
+        raise UsageLimitReached("Invalid or expired discount code")
+    # Only this code's entry: an exhausted code stays in the process code sets
+    # (promotions.codeset) and is refused by its rebuilt entry
+    transaction.on_commit(lambda: invalidate_code(code_id))
+    DiscountCode.objects.filter(pk=code_id, uses_count__gte=F('max_uses')).update(is_active=False)
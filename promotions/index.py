@@ -0,0 +1,161 @@
+"""
+In-memory promotion index for cart pricing.
+
+The live promotion set and its targets are loaded once (one query for the
+promotions, one per target table) and compiled into
+sku / product / category / seller id → promotions, best first
+(priority, then discount_percent – the order the old per-item query used).
+
+Bundle deals of live promotions are compiled alongside: bundles_by_sku maps a
+SKU to the bundles containing it (promotions.bundles does the matching).
+
+The compiled index is kept per process and reused until the active-set version
+(promotions.cache.ACTIVE_NAMESPACE) changes – on writes, and at every window
+boundary (promotions.scheduler) – so pricing an item is a handful of
+dictionary lookups.
+"""
+import threading
+from django.utils import timezone
+from kkoo.cache import get_version
+from .bundles import Bundle
+from .cache import ACTIVE_NAMESPACE
+from .scheduler import ensure_activation_current
+
+TARGETS = (
+    # (index attribute, Promotion m2m field, through column)
+    ('by_sku', 'skus', 'sku_id'),
+    ('by_product', 'products', 'product_id'),
+    ('by_category', 'categories', 'category_id'),
+    ('by_seller', 'sellers', 'sellerprofile_id'),
+)
+
+
+def _rank_key(promotion):
+    return (-promotion.priority, -promotion.discount_percent, promotion.pk)
+
+
+class PromotionIndex:
+    def __init__(self, promotions, targets, version=None, bundles=()):
+        """
+        promotions: Promotion instances; targets: {attribute: [(promotion_id, target_id), …]}
+        bundles: Bundle tuples (promotions.bundles)
+        """
+        ranked = sorted(promotions, key=_rank_key)
+        self.version = version
+        self.promotions = {promotion.pk: promotion for promotion in ranked}
+        self.rank = {promotion.pk: position for position, promotion in enumerate(ranked)}
+
+        for attribute, _, _ in TARGETS:
+            mapping = {}
+            for promotion_id, target_id in targets.get(attribute, ()):
+                if promotion_id in self.rank:
+                    mapping.setdefault(target_id, []).append(promotion_id)
+            setattr(self, attribute, {
+                target_id: tuple(self.promotions[pk] for pk in sorted(ids, key=self.rank.__getitem__))
+                for target_id, ids in mapping.items()
+            })
+
+        self.bundles = {bundle.pk: bundle for bundle in bundles if bundle.promotion_id in self.rank}
+        by_sku = {}
+        for bundle in self.bundles.values():
+            for sku_id in bundle.sku_ids:
+                by_sku.setdefault(sku_id, []).append(bundle.pk)
+        self.bundles_by_sku = {sku_id: tuple(ids) for sku_id, ids in by_sku.items()}
+
+    @classmethod
+    def build(cls, version=None):
+        from .models import Promotion, BundleDeal
+        promotions = list(Promotion.objects.filter(is_active=True))
+        ids = [promotion.pk for promotion in promotions]
+        targets = {}
+        for attribute, field, column in TARGETS:
+            through = Promotion._meta.get_field(field).remote_field.through
+            targets[attribute] = list(
+                through.objects.filter(promotion_id__in=ids).values_list('promotion_id', column)
+            ) if ids else []
+
+        bundle_skus = {}
+        bundles = list(BundleDeal.objects.filter(promotion_id__in=ids).values_list('id', 'promotion_id', 'bundle_price'))
+        if bundles:
+            for bundle_id, sku_id in BundleDeal.bundle_skus.through.objects.filter(
+                bundledeal_id__in=[bundle[0] for bundle in bundles]
+            ).values_list('bundledeal_id', 'sku_id'):
+                bundle_skus.setdefault(bundle_id, []).append(sku_id)
+        bundles = [
+            Bundle(pk, promotion_id, price, tuple(sorted(bundle_skus[pk])))
+            for pk, promotion_id, price in bundles if pk in bundle_skus
+        ]
+        return cls(promotions, targets, version=version, bundles=bundles)
+
+    def candidates(self, sku_id=None, product_id=None, category_id=None, seller_id=None):
+        """
+        Every promotion targeting the item, best first (live or not).
+        """
+        found = {}
+        for attribute, key in zip(('by_sku', 'by_product', 'by_category', 'by_seller'),
+                                  (sku_id, product_id, category_id, seller_id)):
+            for promotion in getattr(self, attribute).get(key, ()):
+                found[promotion.pk] = promotion
+        return sorted(found.values(), key=lambda promotion: self.rank[promotion.pk])
+
+    def bundle_candidates(self, sku_ids, now=None, exclude=()):
+        """
+        Live bundles all of whose SKUs are in `sku_ids` (a set), looked up from those SKUs only.
+        """
+        now = now or timezone.now()
+        found = {}
+        for sku_id in sku_ids:
+            for bundle_id in self.bundles_by_sku.get(sku_id, ()):
+                if bundle_id in found:
+                    continue
+                bundle = self.bundles[bundle_id]
+                promotion = self.promotions[bundle.promotion_id]
+                found[bundle_id] = bundle if (
+                    promotion.start_datetime <= now <= promotion.end_datetime
+                    and promotion.pk not in exclude
+                    and all(other in sku_ids for other in bundle.sku_ids)
+                ) else None
+        return [bundle for bundle in found.values() if bundle is not None]
+
+    def best_for(self, sku_id=None, product_id=None, category_id=None, seller_id=None, now=None, exclude=()):
+        """
+        Highest-ranked promotion live at `now` for the item, or None.
+        `exclude`: promotion ids not to consider (e.g. the user's per-user cap is used up).
+        """
+        now = now or timezone.now()
+        best = None
+        for attribute, key in zip(('by_sku', 'by_product', 'by_category', 'by_seller'),
+                                  (sku_id, product_id, category_id, seller_id)):
+            for promotion in getattr(self, attribute).get(key, ()):
+                if promotion.start_datetime <= now <= promotion.end_datetime and promotion.pk not in exclude:
+                    if best is None or self.rank[promotion.pk] < self.rank[best.pk]:
+                        best = promotion
+                    break  # lists are ranked: the first live one is this target's best
+        return best
+
+    def best_for_sku(self, sku, now=None, exclude=()):
+        """
+        `sku` with product loaded (select_related('sku__product') on cart items).
+        """
+        product = sku.product
+        return self.best_for(sku.pk, product.pk, product.category_id, product.seller_id, now=now, exclude=exclude)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_promotion_index():
+    """
+    The process-wide index, rebuilt when the active-set version changed.
+    """
+    global _index
+    ensure_activation_current()
+    version = get_version(ACTIVE_NAMESPACE)
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            index = _index
+            if index is None or index.version != version:
+                index = _index = PromotionIndex.build(version)
+    return index
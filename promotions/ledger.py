@@ -0,0 +1,85 @@
+"""
+Per-user redemption ledger.
+
+Every promotion / discount code used by an order is one Redemption row,
+bulk-inserted in the order's transaction. A user's usage counts come from one
+grouped query on the (user, promotion) / (user, discount_code) indexes and are
+cached until the user's next order commits, so a per-user cap check during
+pricing is a dictionary lookup.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from .models import Redemption
+
+USAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _usage_key(user_id):
+    return f'promotions:usage:{user_id}'
+
+
+def user_usage(user_id):
+    """
+    {'promotions': {promotion_id: uses}, 'codes': {discount_code_id: uses}}
+    """
+    if user_id is None:
+        return {'promotions': {}, 'codes': {}}
+    key = _usage_key(user_id)
+    usage = cache.get(key)
+    if usage is None:
+        usage = {'promotions': {}, 'codes': {}}
+        rows = (
+            Redemption.objects.filter(user_id=user_id)
+            .values_list('promotion_id', 'discount_code_id')
+            .annotate(uses=Count('id'))
+            .order_by()
+        )
+        for promotion_id, code_id, uses in rows:
+            if promotion_id is not None:
+                usage['promotions'][promotion_id] = uses
+            else:
+                usage['codes'][code_id] = uses
+        cache.set(key, usage, USAGE_CACHE_TIMEOUT)
+    return usage
+
+
+def invalidate_user_usage(*user_ids):
+    cache.delete_many([_usage_key(user_id) for user_id in user_ids])
+
+
+def exhausted_promotions(user_id, promotions):
+    """
+    Ids among `promotions` ({id: Promotion}) the user has used max_uses_per_user times.
+    """
+    if not promotions:
+        return set()
+    used = user_usage(user_id)['promotions']
+    return {
+        promotion_id for promotion_id, uses in used.items()
+        if promotion_id in promotions
+        and promotions[promotion_id].max_uses_per_user
+        and uses >= promotions[promotion_id].max_uses_per_user
+    }
+
+
+def code_uses(user_id, code_id):
+    return user_usage(user_id)['codes'].get(code_id, 0)
+
+
+def record_redemptions(order, incentives):
+    """
+    Ledger rows for a checkout (apply_incentives_to_cart result), in the order's transaction.
+    """
+    rows = [
+        Redemption(user_id=order.user_id, order=order, promotion_id=promotion_id, amount=burn,
+                   redeemed_at=order.created_at)
+        for promotion_id, burn in incentives['promotion_usage'].items()
+    ]
+    if incentives['discount_code_id']:
+        rows.append(Redemption(user_id=order.user_id, order=order, discount_code_id=incentives['discount_code_id'],
+                               amount=incentives['code_discount'], redeemed_at=order.created_at))
+    if rows:
+        Redemption.objects.bulk_create(rows)
+        transaction.on_commit(lambda: invalidate_user_usage(order.user_id))
+    return len(rows)
@@ -0,0 +1,70 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from orders.models import Order
+from promotions.ledger import invalidate_user_usage
+from promotions.models import Redemption, Promotion, DiscountCode
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the redemption ledger from existing orders' applied_incentives. "
+        "Orders are streamed in chunks and rows inserted in batches; safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        orders = (
+            Order.objects.exclude(status__in=['cancelled', 'refunded'])
+            .exclude(applied_incentives=[])
+            .values_list('id', 'user_id', 'applied_incentives', 'created_at')
+            .order_by('id')
+        )
+        before = Redemption.objects.count()
+        batch, users = [], set()
+        for row in orders.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self._write(batch, users)
+                batch = []
+        if batch:
+            self._write(batch, users)
+
+        # Rows already in the ledger are skipped (unique per order and incentive)
+        written = Redemption.objects.count() - before
+        invalidate_user_usage(*users)
+        self.stdout.write(self.style.SUCCESS(f"{written} redemptions written for {len(users)} users"))
+
+    def _write(self, batch, users):
+        codes = {
+            entry['code'].upper()
+            for _, _, incentives, _ in batch for entry in incentives
+            if entry.get('type') == 'code' and entry.get('code')
+        }
+        code_ids = dict(DiscountCode.objects.filter(code__in=codes).values_list('code', 'id')) if codes else {}
+        promotion_ids = set(Promotion.objects.filter(pk__in={
+            entry['promotion_id'] for _, _, incentives, _ in batch for entry in incentives
+            if entry.get('type') in ('promotion', 'bundle') and entry.get('promotion_id')
+        }).values_list('pk', flat=True))
+
+        rows = []
+        for order_id, user_id, incentives, created_at in batch:
+            # One row per incentive per order: a promotion's line discounts are summed
+            burns = defaultdict(Decimal)
+            for entry in incentives:
+                if entry.get('type') in ('promotion', 'bundle') and entry.get('promotion_id') in promotion_ids:
+                    burns[('promotion', entry['promotion_id'])] += Decimal(str(entry.get('amount', 0)))
+                elif entry.get('type') == 'code' and code_ids.get(str(entry.get('code', '')).upper()):
+                    burns[('code', code_ids[entry['code'].upper()])] += Decimal(str(entry.get('amount', 0)))
+            for (kind, target_id), amount in burns.items():
+                rows.append(Redemption(
+                    user_id=user_id, order_id=order_id, amount=round(amount, 2), redeemed_at=created_at,
+                    promotion_id=target_id if kind == 'promotion' else None,
+                    discount_code_id=target_id if kind == 'code' else None,
+                ))
+                users.add(user_id)
+
+        Redemption.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from cart.pricing import apply_bundles
+from catalog.models import Category, Product, SKU
+from promotions.index import PromotionIndex
+from promotions.models import Promotion, BundleDeal
+from users.utils import create_test_user, create_test_seller_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Time bundle matching for carts of growing size against many live bundles, compared with "
+        "scanning every bundle. Synthetic rows are written inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bundles', type=int, default=10000)
+        parser.add_argument('--skus', type=int, default=5000)
+        parser.add_argument('--carts', nargs='+', type=int, default=[1, 10, 50])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            skus = self._create_catalog(options['skus'])
+            self._create_bundles(rng, options['bundles'], skus)
+
+            started = time.perf_counter()
+            index = PromotionIndex.build()
+            self.stdout.write(
+                f"index build: {len(index.bundles)} bundles in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            self.stdout.write(f"{'items':>6} {'candidates':>10} {'scan ms':>10} {'index ms':>10}")
+            now = timezone.now()
+            for size in options['carts']:
+                # Carts built around a few bundles so there is something to match
+                cart = set()
+                while len(cart) < size:
+                    bundle = index.bundles[rng.choice(list(index.bundles))]
+                    cart.update(bundle.sku_ids[:size - len(cart)])
+                quantities = {sku_id: rng.randint(1, 3) for sku_id in cart}
+
+                def lines():
+                    return {sku_id: {'sku_id': sku_id, 'quantity': quantity, 'unit_price': Decimal('1000.00'),
+                                     'discount': Decimal('0.00'), 'bundle_discount': Decimal('0.00'),
+                                     '_promotion': None}
+                            for sku_id, quantity in quantities.items()}
+
+                candidates = index.bundle_candidates(cart, now=now)
+                scan_ms = self._time(lambda: [b for b in index.bundles.values() if set(b.sku_ids) <= cart],
+                                     options['repeat'])
+                index_ms = self._time(lambda: apply_bundles(index, lines(), Decimal('10000000'), now),
+                                      options['repeat'])
+                self.stdout.write(f"{size:>6} {len(candidates):>10} {scan_ms:>10.2f} {index_ms:>10.3f}")
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _create_catalog(count):
+        _, seller = create_test_seller_user()
+        category = Category.objects.create(name="Bench bundles", slug="bench-bundles")
+        products = Product.objects.bulk_create([
+            Product(seller=seller, category=category, title=f"Bench {n}", description="-",
+                    slug=f"bench-bundle-{n}", base_price=1000, effective_min_price=1000,
+                    effective_max_price=1000, verification_status='approved')
+            for n in range(count)
+        ], batch_size=2000)
+        SKU.objects.bulk_create([SKU(product=p, sku_code=f"BENCH-BUNDLE-{p.pk}") for p in products], batch_size=2000)
+        return list(SKU.objects.filter(product__in=products).values_list('pk', flat=True))
+
+    @staticmethod
+    def _create_bundles(rng, count, skus):
+        admin = create_test_user(is_staff=True)
+        now = timezone.now()
+        promotions = Promotion.objects.bulk_create([
+            Promotion(name=f"Bench bundle {n}", promotion_type='bundle', discount_percent=1, is_active=True,
+                      created_by=admin, start_datetime=now - timedelta(days=1), end_datetime=now + timedelta(days=7))
+            for n in range(count)
+        ], batch_size=2000)
+        sizes = [rng.randint(2, 4) for _ in promotions]
+        deals = BundleDeal.objects.bulk_create([
+            BundleDeal(promotion=promotion, bundle_price=Decimal(size * 1000 - rng.randint(50, 600)))
+            for promotion, size in zip(promotions, sizes)
+        ], batch_size=2000)
+        through = BundleDeal.bundle_skus.through
+        through.objects.bulk_create([
+            through(bundledeal_id=deal.pk, sku_id=sku_id)
+            for deal, size in zip(deals, sizes) for sku_id in rng.sample(skus, size)
+        ], batch_size=5000)
+
+    @staticmethod
+    def _time(fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,109 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from catalog.models import Category, Product, SKU
+from promotions.index import PromotionIndex
+from promotions.models import Promotion
+from users.utils import create_test_user, create_test_seller_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-item promotion query with the compiled PromotionIndex for carts "
+        "of growing size. Synthetic rows are written inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--promotions', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--carts', nargs='+', type=int, default=[1, 10, 100])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            skus = self._create_catalog(rng, options['products'])
+            self._create_promotions(rng, options['promotions'], skus)
+
+            started = time.perf_counter()
+            index = PromotionIndex.build()
+            self.stdout.write(
+                f"index build: {options['promotions']} promotions in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            self.stdout.write(f"{'items':>6} {'query ms':>10} {'index ms':>10} {'speedup':>8}")
+            for size in options['carts']:
+                cart = rng.sample(skus, size)
+                query_ms = self._time(lambda: [self._query_lookup(sku) for sku in cart], options['repeat'])
+                index_ms = self._time(lambda: [index.best_for_sku(sku) for sku in cart], options['repeat'])
+                self.stdout.write(f"{size:>6} {query_ms:>10.2f} {index_ms:>10.3f} {query_ms / index_ms:>7.0f}x")
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _query_lookup(sku):
+        # What cart.utils did per item before the index
+        now = timezone.now()
+        product = sku.product
+        return Promotion.objects.filter(
+            is_active=True, start_datetime__lte=now, end_datetime__gte=now
+        ).order_by('-priority', '-discount_percent').filter(
+            Q(products=product) | Q(skus=sku) | Q(categories=product.category) | Q(sellers=product.seller)
+        ).first()
+
+    @staticmethod
+    def _create_catalog(rng, count):
+        sellers = [create_test_seller_user()[1] for _ in range(20)]
+        categories = [Category.objects.create(name=f"Bench {n}", slug=f"bench-promo-{n}") for n in range(50)]
+        products = [
+            Product(seller=rng.choice(sellers), category=rng.choice(categories), title=f"Bench {n}",
+                    description="-", slug=f"bench-promo-{n}", base_price=rng.randint(1_000, 500_000),
+                    verification_status='approved')
+            for n in range(count)
+        ]
+        for product in products:  # bulk_create skips Product.save
+            product.effective_min_price = product.effective_max_price = product.base_price
+        products = Product.objects.bulk_create(products, batch_size=2000)
+        SKU.objects.bulk_create([SKU(product=p, sku_code=f"BENCH-PROMO-{p.pk}") for p in products], batch_size=2000)
+        return list(SKU.objects.filter(product__in=products).select_related('product__category', 'product__seller'))
+
+    @staticmethod
+    def _create_promotions(rng, count, skus):
+        admin = create_test_user(is_staff=True)
+        now = timezone.now()
+        promotions = Promotion.objects.bulk_create([
+            Promotion(name=f"Bench {n}", promotion_type='timed', discount_percent=rng.randint(1, 70),
+                      priority=rng.choice([100, 100, 100, 150, 200]), is_active=True, created_by=admin,
+                      start_datetime=now - timedelta(days=1), end_datetime=now + timedelta(days=rng.randint(1, 30)))
+            for n in range(count)
+        ])
+        products = [sku.product for sku in skus]
+        categories = list({p.category_id for p in products})
+        sellers = list({p.seller_id for p in products})
+        rows = {field: [] for field in ('skus', 'products', 'categories', 'sellers')}
+        for promotion in promotions:
+            rows['skus'] += [(promotion.pk, sku.pk) for sku in rng.sample(skus, 2)]
+            rows['products'] += [(promotion.pk, p.pk) for p in rng.sample(products, 3)]
+            if rng.random() < 0.05:
+                rows['categories'].append((promotion.pk, rng.choice(categories)))
+            if rng.random() < 0.02:
+                rows['sellers'].append((promotion.pk, rng.choice(sellers)))
+        for field, pairs in rows.items():
+            through = Promotion._meta.get_field(field).remote_field.through
+            column = through._meta.get_field(Promotion._meta.get_field(field).m2m_reverse_field_name()).attname
+            through.objects.bulk_create(
+                [through(promotion_id=pk, **{column: target}) for pk, target in set(pairs)], batch_size=5000
+            )
+
+    @staticmethod
+    def _time(fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
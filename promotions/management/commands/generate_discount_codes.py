@@ -0,0 +1,74 @@
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from promotions.codegen import DEFAULT_ALPHABET, DEFAULT_LENGTH, generate_codes, csv_rows
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Generate N unique discount codes in chunks and write them as CSV (file or stdout)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, required=True)
+        parser.add_argument('--amount', type=Decimal, required=True, help="discount_amount (TZS)")
+        parser.add_argument('--prefix', default='')
+        parser.add_argument('--length', type=int, default=DEFAULT_LENGTH, help="Random characters after the prefix")
+        parser.add_argument('--alphabet', default=DEFAULT_ALPHABET)
+        parser.add_argument('--max-uses', type=int, default=1)
+        parser.add_argument('--max-uses-per-user', type=int, default=1)
+        parser.add_argument('--min-order', type=Decimal, default=Decimal('0'))
+        parser.add_argument('--valid-from', help="ISO datetime (default: now)")
+        parser.add_argument('--valid-until', help="ISO datetime (default: 30 days after valid-from)")
+        parser.add_argument('--created-by', help="Phone number of the staff user (default: first superuser)")
+        parser.add_argument('--output', default='-', help="CSV path, - for stdout")
+
+    def handle(self, *args, **options):
+        valid_from = self._datetime(options['valid_from']) or timezone.now()
+        valid_until = self._datetime(options['valid_until']) or valid_from + timedelta(days=30)
+        if options['created_by']:
+            created_by = User.objects.filter(phone_number=options['created_by'], is_staff=True).first()
+        else:
+            created_by = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if created_by is None:
+            raise CommandError("No staff user to record as created_by")
+
+        template = {
+            'discount_amount': options['amount'],
+            'max_uses': options['max_uses'],
+            'max_uses_per_user': options['max_uses_per_user'],
+            'min_order_amount': options['min_order'],
+            'valid_from': valid_from,
+            'valid_until': valid_until,
+            'created_by': created_by,
+        }
+        try:
+            chunks = generate_codes(options['count'], template, prefix=options['prefix'],
+                                    length=options['length'], alphabet=options['alphabet'])
+        except ValidationError as e:
+            raise CommandError(" ".join(e.messages))
+
+        started = time.perf_counter()
+        out = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='')
+        try:
+            for line in csv_rows(chunks, template):
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        self.stderr.write(self.style.SUCCESS(
+            f"{options['count']} codes generated in {time.perf_counter() - started:.2f}s"
+        ))
+
+    @staticmethod
+    def _datetime(value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Not an ISO datetime: {value}")
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
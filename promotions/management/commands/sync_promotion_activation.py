@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from promotions.scheduler import sync_activation
+
+
+class Command(BaseCommand):
+    help = (
+        "Flip Promotion / DiscountCode is_active at window boundaries and bump the active-set version. "
+        "Run from cron, or with --watch to sleep until each next boundary."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', action='store_true', help="Keep running, waking at each boundary")
+        parser.add_argument('--max-sleep', type=float, default=60.0,
+                            help="Upper bound on a --watch sleep, so new promotions are picked up")
+
+    def handle(self, *args, **options):
+        while True:
+            result = sync_activation()
+            boundary = result['next_boundary']
+            self.stdout.write(
+                f"{result['promotions']} promotions and {result['codes']} codes flipped; "
+                f"next boundary: {boundary.isoformat() if boundary else 'none'}"
+            )
+            if not options['watch']:
+                return
+            close_old_connections()
+            wait = options['max_sleep']
+            if boundary:
+                wait = min(wait, max((boundary - timezone.now()).total_seconds(), 0) + 0.001)
+            time.sleep(wait)
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:55
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscountCode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, unique=True)),
+                ('discount_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('discount_percent', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('max_uses', models.PositiveIntegerField(default=1)),
+                ('uses_count', models.PositiveIntegerField(default=0)),
+                ('max_uses_per_user', models.PositiveIntegerField(default=1)),
+                ('valid_from', models.DateTimeField()),
+                ('valid_until', models.DateTimeField()),
+                ('min_order_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='created_discount_codes', to='users.user')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Promotion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('promotion_type', models.CharField(choices=[('flash', 'Flash Deal (24h max)'), ('timed', 'Time-Based Deal'), ('bundle', 'Bundle Deal'), ('seller', 'Seller-Specific Deal'), ('category', 'Category Deal')], max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('discount_percent', models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(70)])),
+                ('priority', models.PositiveIntegerField(default=100, help_text='Higher priority wins when multiple promotions match (100 = normal, 200 = high)')),
+                ('start_datetime', models.DateTimeField()),
+                ('end_datetime', models.DateTimeField()),
+                ('min_order_amount', models.DecimalField(decimal_places=2, default=0, help_text='Minimum cart total to apply promotion', max_digits=12)),
+                ('max_discount_cap', models.DecimalField(blank=True, decimal_places=2, help_text='Maximum discount per use (absolute TZS)', max_digits=12, null=True)),
+                ('max_total_burn', models.DecimalField(blank=True, decimal_places=2, help_text='Auto-deactivate when total burn reaches this', max_digits=14, null=True)),
+                ('total_burn', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('max_uses', models.PositiveIntegerField(blank=True, null=True)),
+                ('uses_count', models.PositiveIntegerField(default=0)),
+                ('max_uses_per_user', models.PositiveIntegerField(default=1, help_text='Limit per customer')),
+                ('allow_stacking', models.BooleanField(default=False, help_text='Can combine with other promotions?')),
+                ('exclude_from_other_promos', models.BooleanField(default=False, help_text='This promo blocks others')),
+                ('visibility_boost', models.BooleanField(default=False, help_text='Boost in search/feed for eligible items')),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('categories', models.ManyToManyField(blank=True, related_name='promotions', to='catalog.category')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='created_promotions', to='users.user')),
+                ('products', models.ManyToManyField(blank=True, related_name='promotions', to='catalog.product')),
+                ('sellers', models.ManyToManyField(blank=True, related_name='promotions', to='users.sellerprofile')),
+                ('skus', models.ManyToManyField(blank=True, related_name='promotions', to='catalog.sku')),
+            ],
+            options={
+                'ordering': ['-priority', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BundleDeal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bundle_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('bundle_skus', models.ManyToManyField(to='catalog.sku')),
+                ('promotion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='bundle_detail', to='promotions.promotion')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(fields=['is_active', 'start_datetime', 'end_datetime'], name='promotions__is_acti_b98819_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(fields=['priority'], name='promotions__priorit_5260ee_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('promotions', '0001_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Redemption',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('redeemed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('discount_code', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='promotions.discountcode')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='orders.order')),
+                ('promotion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='promotions.promotion')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promotion_redemptions', to='users.user')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='redemption',
+            index=models.Index(fields=['user', 'promotion'], name='promotions__user_id_563ec5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='redemption',
+            index=models.Index(fields=['user', 'discount_code'], name='promotions__user_id_15eed4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='redemption',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('discount_code__isnull', True), ('promotion__isnull', False)), models.Q(('discount_code__isnull', False), ('promotion__isnull', True)), _connector='OR'), name='redemption_promotion_xor_code'),
+        ),
+        migrations.AddConstraint(
+            model_name='redemption',
+            constraint=models.UniqueConstraint(fields=('order', 'promotion'), name='unique_order_promotion_redemption'),
+        ),
+        migrations.AddConstraint(
+            model_name='redemption',
+            constraint=models.UniqueConstraint(fields=('order', 'discount_code'), name='unique_order_code_redemption'),
+        ),
+    ]
@@ -120,4 +120,37 @@ class BundleDeal(models.Model):
     bundle_price = models.DecimalField(max_digits=12, decimal_places=2)
 
     def __str__(self):
-        return f"Bundle: {self.promotion.name}"
\ No newline at end of file
+        return f"Bundle: {self.promotion.name}"
+
+class Redemption(models.Model):
+    """
+    Ledger of promotion / discount code uses per user, written at order commit
+    (see promotions.ledger). Exactly one of promotion / discount_code is set.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='promotion_redemptions')
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='redemptions')
+    promotion = models.ForeignKey(Promotion, null=True, blank=True, on_delete=models.CASCADE, related_name='redemptions')
+    discount_code = models.ForeignKey(
+        DiscountCode, null=True, blank=True, on_delete=models.CASCADE, related_name='redemptions'
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    redeemed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'promotion']),
+            models.Index(fields=['user', 'discount_code']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(promotion__isnull=False, discount_code__isnull=True) |
+                          models.Q(promotion__isnull=True, discount_code__isnull=False),
+                name='redemption_promotion_xor_code'
+            ),
+            # One row per incentive per order: backfills can be re-run
+            models.UniqueConstraint(fields=['order', 'promotion'], name='unique_order_promotion_redemption'),
+            models.UniqueConstraint(fields=['order', 'discount_code'], name='unique_order_code_redemption'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} redeemed {self.promotion or self.discount_code}"
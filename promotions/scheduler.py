@@ -0,0 +1,105 @@
+"""
+Time-driven activation of promotions and discount codes.
+
+Promotion.is_active / DiscountCode.is_active are stored flags: save() sets them
+for the current moment, and sync_activation() flips them in bulk when a window
+opens or closes – one UPDATE per direction per model – then bumps the
+active-set version (promotions.cache) if anything changed.
+
+The next boundary (earliest upcoming start / end) is kept in the cache, so
+ensure_activation_current() is one cache read on the request path: the first
+reader after a boundary runs the sync, so the version moves exactly at the
+boundary even between runs of the `sync_promotion_activation` command. Read
+paths can therefore trust is_active and key their caches on the version alone.
+"""
+from datetime import datetime, timezone as dt_timezone
+from django.core.cache import cache
+from django.db.models import F, Min, Q
+from django.utils import timezone
+from .cache import invalidate_promotions, invalidate_discount_codes
+from .models import Promotion, DiscountCode
+
+NEXT_BOUNDARY_KEY = 'promotions:next_boundary'
+SYNC_LOCK_KEY = 'lock:promotions:activation'
+SYNC_LOCK_TIMEOUT = 30
+
+
+def _live_promotions(now):
+    return (
+        Q(start_datetime__lte=now, end_datetime__gte=now)
+        & (Q(max_uses__isnull=True) | Q(uses_count__lt=F('max_uses')))
+        & (Q(max_total_burn__isnull=True) | Q(total_burn__lt=F('max_total_burn')))
+    )
+
+
+def _live_codes(now):
+    return Q(valid_from__lte=now, valid_until__gte=now, uses_count__lt=F('max_uses'))
+
+
+def compute_next_boundary(now):
+    """
+    Earliest moment after which some stored is_active flag becomes wrong, or None.
+    """
+    promotions = Promotion.objects.aggregate(
+        starts=Min('start_datetime', filter=Q(is_active=False, start_datetime__gt=now, end_datetime__gt=now)),
+        ends=Min('end_datetime', filter=Q(is_active=True, end_datetime__gte=now)),
+    )
+    codes = DiscountCode.objects.aggregate(
+        starts=Min('valid_from', filter=Q(is_active=False, valid_from__gt=now, valid_until__gt=now)),
+        ends=Min('valid_until', filter=Q(is_active=True, valid_until__gte=now)),
+    )
+    return min((moment for moment in (*promotions.values(), *codes.values()) if moment is not None), default=None)
+
+
+def sync_activation(now=None):
+    """
+    Flip the is_active flags that are wrong at `now`. Returns
+    {'promotions': changed, 'codes': changed, 'next_boundary': datetime or None}.
+    """
+    now = now or timezone.now()
+    promotions = Promotion.objects.filter(_live_promotions(now), is_active=False).update(is_active=True)
+    promotions += Promotion.objects.filter(~_live_promotions(now), is_active=True).update(is_active=False)
+    codes = DiscountCode.objects.filter(_live_codes(now), is_active=False).update(is_active=True)
+    codes += DiscountCode.objects.filter(~_live_codes(now), is_active=True).update(is_active=False)
+
+    boundary = compute_next_boundary(now)
+    cache.set(NEXT_BOUNDARY_KEY, boundary.timestamp() if boundary else 0, None)
+    if promotions:
+        invalidate_promotions()
+    if codes:
+        invalidate_discount_codes()
+    return {'promotions': promotions, 'codes': codes, 'next_boundary': boundary}
+
+
+def next_boundary():
+    """
+    The cached next boundary: a datetime, None when nothing is scheduled,
+    or False when unknown (never synced, or a write cleared it).
+    """
+    value = cache.get(NEXT_BOUNDARY_KEY)
+    if value is None:
+        return False
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc) if value else None
+
+
+def clear_next_boundary():
+    cache.delete(NEXT_BOUNDARY_KEY)
+
+
+def ensure_activation_current(now=None):
+    """
+    Run the sync when a boundary has passed (or none is known). One cache read otherwise.
+    Concurrent callers do not wait: the one holding the lock syncs, the others read
+    the previous state for the few milliseconds it takes.
+    """
+    now = now or timezone.now()
+    boundary = next_boundary()
+    if boundary is None or (boundary is not False and now < boundary):
+        return False
+    if not cache.add(SYNC_LOCK_KEY, 1, SYNC_LOCK_TIMEOUT):
+        return False
+    try:
+        sync_activation(now)
+    finally:
+        cache.delete(SYNC_LOCK_KEY)
+    return True
@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
+from .codegen import DEFAULT_ALPHABET, DEFAULT_LENGTH, validate_options
 from .models import Promotion, DiscountCode, BundleDeal
 
 
@@ -14,6 +16,35 @@ class DiscountCodeSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_by', 'created_at', 'is_active', 'uses_count']
 
+class DiscountCodeBatchSerializer(serializers.Serializer):
+    """
+    Options of a bulk generation run (promotions.codegen) + the fields every code shares.
+    """
+    count = serializers.IntegerField(min_value=1, max_value=200000)
+    prefix = serializers.CharField(required=False, allow_blank=True, default='', max_length=20)
+    length = serializers.IntegerField(required=False, min_value=4, max_value=32, default=DEFAULT_LENGTH)
+    alphabet = serializers.CharField(required=False, default=DEFAULT_ALPHABET)
+    discount_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discount_percent = serializers.DecimalField(max_digits=5, decimal_places=2, required=False, allow_null=True)
+    max_uses = serializers.IntegerField(required=False, min_value=1, default=1)
+    max_uses_per_user = serializers.IntegerField(required=False, min_value=0, default=1)
+    min_order_amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, default=0)
+    valid_from = serializers.DateTimeField()
+    valid_until = serializers.DateTimeField()
+
+    def validate(self, attrs):
+        if attrs['valid_from'] >= attrs['valid_until']:
+            raise serializers.ValidationError("Valid until must be after valid from")
+        try:
+            validate_options(attrs['count'], attrs['prefix'].upper(), attrs['length'], attrs['alphabet'].upper())
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        return attrs
+
+    def template(self):
+        options = ('count', 'prefix', 'length', 'alphabet')
+        return {name: value for name, value in self.validated_data.items() if name not in options}
+
 class BundleDealSerializer(serializers.ModelSerializer):
     class Meta:
         model = BundleDeal
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Promotion, DiscountCode, BundleDeal
+from .cache import invalidate_promotions, invalidate_discount_codes, invalidate_code
+from .scheduler import clear_next_boundary
+
+
+@receiver([post_save, post_delete], sender=Promotion)
+def promotion_changed(sender, **kwargs):
+    invalidate_promotions()
+    clear_next_boundary()
+
+
+@receiver([post_save, post_delete], sender=BundleDeal)
+def bundle_changed(sender, **kwargs):
+    invalidate_promotions()
+
+
+@receiver([post_save, post_delete], sender=DiscountCode)
+def discount_code_changed(sender, instance, **kwargs):
+    invalidate_discount_codes()
+    invalidate_code(instance.pk)
+    clear_next_boundary()
+
+
+def promotion_targets_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_promotions()
+
+
+for field in Promotion._meta.many_to_many:
+    m2m_changed.connect(promotion_targets_changed, sender=field.remote_field.through,
+                        dispatch_uid=f'promotion_targets_changed:{field.name}')
+m2m_changed.connect(promotion_targets_changed, sender=BundleDeal.bundle_skus.through,
+                    dispatch_uid='promotion_targets_changed:bundle_skus')
@@ -1,3 +1,440 @@
-from django.test import TestCase
+from datetime import timedelta
+import csv
+import random
+from io import StringIO
+from unittest import mock
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from kkoo.cache import get_version
+from rest_framework import status
+from rest_framework.test import APITestCase
+from cart.models import Cart, CartItem
+from cart.pricing import price_cart
+from cart.utils import apply_incentives_to_cart
+from catalog.models import Category, Product, SKU
+from users.utils import create_test_user, create_test_seller_user
+from .counters import commit_promotion_usage, commit_code_usage, UsageLimitReached
+from .index import get_promotion_index
+from .ledger import user_usage
+from .cache import ACTIVE_NAMESPACE
+from .codegen import generate_codes
+from .codeset import get_valid_codes
+from .scheduler import sync_activation, ensure_activation_current, next_boundary
+from .models import Promotion, DiscountCode, Redemption, BundleDeal
 
-# Create your tests here.
+
+class PromotionListConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.promotion = Promotion.objects.create(
+            name="Karibu Sale", promotion_type='timed', discount_percent=10,
+            created_by=create_test_user(is_staff=True),
+            start_datetime=now - timedelta(days=1), end_datetime=now + timedelta(days=1)
+        )
+        self.url = reverse('promotions:promotion_list')
+
+    def test_not_modified_until_promotions_change(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Surrogate-Key'], 'promotions')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.promotion.discount_percent = 15
+        self.promotion.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_passed_boundary_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        # Window closes with no write at all: the first request after it runs the scheduler
+        later = timezone.now() + timedelta(days=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+
+class PromotionIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = create_test_user(is_staff=True)
+        _, self.seller_profile = create_test_seller_user()
+        self.category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(
+            seller=self.seller_profile, category=self.category, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=320000, verification_status='approved'
+        )
+        self.sku = SKU.objects.create(product=self.product, sku_code="SPARK-128")
+
+    def promotion(self, name, priority=100, percent=10, **window):
+        now = timezone.now()
+        return Promotion.objects.create(
+            name=name, promotion_type='timed', discount_percent=percent, priority=priority, created_by=self.admin,
+            start_datetime=window.get('start', now - timedelta(days=1)),
+            end_datetime=window.get('end', now + timedelta(days=1)),
+        )
+
+    def test_best_live_promotion_across_targets(self):
+        category_deal = self.promotion("Category", priority=200)
+        category_deal.categories.add(self.category)
+        sku_deal = self.promotion("SKU", priority=100, percent=30)
+        sku_deal.skus.add(self.sku)
+        seller_deal = self.promotion("Seller", priority=200, percent=20)
+        seller_deal.sellers.add(self.seller_profile)
+
+        index = get_promotion_index()
+        self.assertEqual(index.best_for_sku(self.sku), seller_deal)
+        self.assertEqual([p.name for p in index.candidates(self.sku.pk, self.product.pk, self.category.pk,
+                                                           self.seller_profile.pk)], ["Seller", "Category", "SKU"])
+        self.assertIsNone(index.best_for_sku(self.sku, now=timezone.now() + timedelta(days=2)))
+
+    def test_index_is_reused_until_promotions_change(self):
+        self.promotion("Product").products.add(self.product)
+        first = get_promotion_index()
+        with self.assertNumQueries(0):
+            self.assertIs(get_promotion_index(), first)
+
+        second = self.promotion("Product 2", priority=300)
+        second.products.add(self.product)
+        index = get_promotion_index()
+        self.assertIsNot(index, first)
+        self.assertEqual(index.best_for_sku(self.sku), second)
+
+    def test_cart_pricing_does_not_query_per_item(self):
+        promotion = self.promotion("Product")
+        promotion.products.add(self.product)
+        # Matched for every item, then skipped on the minimum: no burn writes in this test
+        Promotion.objects.filter(pk=promotion.pk).update(min_order_amount=10 ** 9)
+        cart = Cart.objects.create(user=create_test_user())
+        for n in range(5):
+            CartItem.objects.create(cart=cart, sku=SKU.objects.create(product=self.product, sku_code=f"SPARK-{n}"))
+        get_promotion_index()
+        with CaptureQueriesContext(connection) as queries:
+            apply_incentives_to_cart(cart)
+        self.assertFalse([q for q in queries if 'promotions_promotion' in q['sql'] and 'SELECT' in q['sql']])
+
+
+class PromotionCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.admin = create_test_user(is_staff=True)
+        self.promotion = Promotion.objects.create(
+            name="Flash", promotion_type='timed', discount_percent=10, created_by=self.admin,
+            max_uses=2, max_total_burn=Decimal('1000.00'),
+            start_datetime=now - timedelta(hours=1), end_datetime=now + timedelta(hours=1),
+        )
+        self.code = DiscountCode.objects.create(
+            code="KARIBU", discount_amount=500, max_uses=1, created_by=self.admin,
+            valid_from=now - timedelta(hours=1), valid_until=now + timedelta(hours=1),
+        )
+
+    def test_usage_is_one_conditional_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            commit_promotion_usage({self.promotion.pk: Decimal('400.00')})
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT')])
+        self.promotion.refresh_from_db()
+        self.assertEqual((self.promotion.uses_count, self.promotion.total_burn), (1, Decimal('400.00')))
+
+    def test_burn_limit_is_enforced_and_deactivates(self):
+        commit_promotion_usage({self.promotion.pk: Decimal('600.00')})
+        with self.assertRaises(UsageLimitReached):
+            commit_promotion_usage({self.promotion.pk: Decimal('401.00')})
+        commit_promotion_usage({self.promotion.pk: Decimal('400.00')})
+        self.promotion.refresh_from_db()
+        self.assertEqual(self.promotion.total_burn, Decimal('1000.00'))
+        self.assertFalse(self.promotion.is_active)
+
+    def test_use_limit_is_enforced(self):
+        commit_promotion_usage({self.promotion.pk: Decimal('1.00')})
+        commit_promotion_usage({self.promotion.pk: Decimal('1.00')})
+        with self.assertRaises(UsageLimitReached):
+            commit_promotion_usage({self.promotion.pk: Decimal('1.00')})
+
+    def test_code_uses(self):
+        commit_code_usage(self.code.pk)
+        with self.assertRaises(UsageLimitReached):
+            commit_code_usage(self.code.pk)
+        self.code.refresh_from_db()
+        self.assertEqual((self.code.uses_count, self.code.is_active), (1, False))
+
+
+class RedemptionLedgerTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        admin = create_test_user(is_staff=True)
+        _, seller_profile = create_test_seller_user()
+        self.product = Product.objects.create(
+            seller=seller_profile, title="Tecno Spark 20", description="-",
+            slug="tecno-spark-20", base_price=100000, verification_status='approved'
+        )
+        self.sku = SKU.objects.create(product=self.product, sku_code="SPARK-128", stock_quantity=10)
+        window = {'start_datetime': now - timedelta(hours=1), 'end_datetime': now + timedelta(hours=1)}
+        self.once = Promotion.objects.create(
+            name="First order", promotion_type='timed', discount_percent=20, priority=200,
+            max_uses_per_user=1, created_by=admin, **window
+        )
+        self.fallback = Promotion.objects.create(
+            name="Everyday", promotion_type='timed', discount_percent=5, priority=100, created_by=admin, **window
+        )
+        self.once.products.add(self.product)
+        self.fallback.products.add(self.product)
+        self.code = DiscountCode.objects.create(
+            code="KARIBU", discount_amount=500, max_uses=10, max_uses_per_user=1, created_by=admin,
+            valid_from=now - timedelta(hours=1), valid_until=now + timedelta(hours=1),
+        )
+        self.user = create_test_user()
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, **data):
+        CartItem.objects.create(cart=self.cart, sku=self.sku, quantity=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('orders:order_create'), data, format='json')
+
+    def test_per_user_cap_falls_back_to_next_promotion(self):
+        self.assertEqual(self.checkout().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Redemption.objects.get(user=self.user).promotion, self.once)
+
+        CartItem.objects.create(cart=self.cart, sku=self.sku, quantity=1)
+        response = self.client.get(reverse('cart:cart_detail'))
+        self.assertEqual(response.data['discount_amount'], Decimal('5000.00'))
+        self.assertEqual(response.data['applied_promotions'][0]['promotion_id'], self.fallback.pk)
+
+    def test_usage_lookup_is_cached(self):
+        self.checkout()
+        self.assertEqual(user_usage(self.user.pk)['promotions'], {self.once.pk: 1})
+        with self.assertNumQueries(0):
+            user_usage(self.user.pk)
+
+    def test_code_per_user_cap(self):
+        self.assertEqual(self.checkout(discount_code="karibu").status_code, status.HTTP_201_CREATED)
+        response = self.checkout(discount_code="karibu")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "You have already used this code")
+
+    def test_backfill_is_idempotent(self):
+        self.checkout(discount_code="KARIBU")
+        Redemption.objects.all().delete()
+        call_command('backfill_redemptions', stdout=StringIO())
+        call_command('backfill_redemptions', stdout=StringIO())
+        self.assertEqual(
+            set(Redemption.objects.values_list('promotion_id', 'discount_code_id', 'amount')),
+            {(self.once.pk, None, Decimal('20000.00')), (None, self.code.pk, Decimal('500.00'))},
+        )
+
+
+class ActivationSchedulerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        admin = create_test_user(is_staff=True)
+        self.upcoming = Promotion.objects.create(
+            name="Weekend", promotion_type='timed', discount_percent=10, created_by=admin,
+            start_datetime=self.now + timedelta(hours=1), end_datetime=self.now + timedelta(hours=3),
+        )
+        self.code = DiscountCode.objects.create(
+            code="WEEKEND", discount_amount=500, max_uses=10, created_by=admin,
+            valid_from=self.now + timedelta(hours=2), valid_until=self.now + timedelta(hours=3),
+        )
+
+    def test_flags_flip_at_boundaries_and_version_increases(self):
+        self.assertFalse(self.upcoming.is_active)
+        result = sync_activation(self.now)
+        self.assertEqual((result['promotions'], result['codes']), (0, 0))
+        self.assertEqual(result['next_boundary'], self.upcoming.start_datetime)
+        version = get_version(ACTIVE_NAMESPACE)
+
+        result = sync_activation(self.now + timedelta(minutes=61))
+        self.assertEqual((result['promotions'], result['codes']), (1, 0))
+        self.assertEqual(result['next_boundary'], self.code.valid_from)
+        self.assertTrue(Promotion.objects.get(pk=self.upcoming.pk).is_active)
+        self.assertGreater(get_version(ACTIVE_NAMESPACE), version)
+
+        result = sync_activation(self.now + timedelta(hours=4))
+        self.assertEqual((result['promotions'], result['codes']), (1, 0))
+        self.assertIsNone(result['next_boundary'])
+        self.assertFalse(Promotion.objects.get(pk=self.upcoming.pk).is_active)
+
+    def test_exhausted_promotion_is_not_reactivated(self):
+        Promotion.objects.filter(pk=self.upcoming.pk).update(max_uses=1, uses_count=1)
+        sync_activation(self.now + timedelta(minutes=61))
+        self.assertFalse(Promotion.objects.get(pk=self.upcoming.pk).is_active)
+
+    def test_request_path_is_one_cache_read_until_the_boundary(self):
+        sync_activation(self.now)
+        with self.assertNumQueries(0):
+            self.assertFalse(ensure_activation_current(self.now + timedelta(minutes=59)))
+        self.assertTrue(ensure_activation_current(self.now + timedelta(minutes=61)))
+        self.assertEqual(next_boundary(), self.code.valid_from)
+        self.assertTrue(Promotion.objects.get(pk=self.upcoming.pk).is_active)
+
+
+class BundleMatchingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = create_test_user(is_staff=True)
+        _, seller_profile = create_test_seller_user()
+        product = Product.objects.create(
+            seller=seller_profile, title="Kitchen set", description="-", slug="kitchen-set",
+            base_price=100, verification_status='approved'
+        )
+        self.skus = {name: SKU.objects.create(product=product, sku_code=name) for name in "ABCD"}
+        self.cart = Cart.objects.create(user=create_test_user())
+
+    def promotion(self, name, percent=1, promotion_type='bundle'):
+        now = timezone.now()
+        return Promotion.objects.create(
+            name=name, promotion_type=promotion_type, discount_percent=percent, created_by=self.admin,
+            start_datetime=now - timedelta(hours=1), end_datetime=now + timedelta(hours=1),
+        )
+
+    def bundle(self, names, price):
+        deal = BundleDeal.objects.create(promotion=self.promotion(f"Bundle {names}"), bundle_price=price)
+        deal.bundle_skus.set([self.skus[name] for name in names])
+        return deal
+
+    def add(self, **quantities):
+        for name, quantity in quantities.items():
+            CartItem.objects.create(cart=self.cart, sku=self.skus[name], quantity=quantity)
+
+    def test_overlapping_bundles_best_combination_wins(self):
+        # Greedy would take ABC (saves 100) and strand A/D; AD + BC save 120
+        self.bundle("ABC", 200)
+        ad = self.bundle("AD", 140)
+        bc = self.bundle("BC", 140)
+        self.add(A=1, B=1, C=1, D=1)
+        pricing = price_cart(self.cart)
+        self.assertEqual({b['bundle_id'] for b in pricing['bundles']}, {ad.pk, bc.pk})
+        self.assertEqual(pricing['promotion_discount'], Decimal('120.00'))
+        self.assertEqual(pricing['final_total'], Decimal('280.00'))
+
+    def test_bundle_and_item_promotions_do_not_stack(self):
+        item_deal = self.promotion("A 30% off", percent=30, promotion_type='timed')
+        item_deal.skus.add(self.skus['A'])
+        self.bundle("AB", 150)   # saves 50 but costs A its 30
+        bc = self.bundle("BC", 120)
+        self.add(A=1, B=1, C=1)
+        pricing = price_cart(self.cart)
+        self.assertEqual([b['bundle_id'] for b in pricing['bundles']], [bc.pk])
+        self.assertEqual(pricing['promotion_discount'], Decimal('110.00'))
+        lines = {line['sku_id']: line for line in pricing['lines']}
+        self.assertEqual(lines[self.skus['A'].pk]['promotion_id'], item_deal.pk)
+        self.assertEqual(lines[self.skus['B'].pk]['bundle_discount'] + lines[self.skus['C'].pk]['bundle_discount'],
+                         Decimal('80.00'))
+
+    def test_bundle_applies_per_complete_set_of_units(self):
+        ab = self.bundle("AB", 150)
+        self.add(A=3, B=2)
+        pricing = price_cart(self.cart)
+        self.assertEqual(pricing['bundles'][0]['bundle_id'], ab.pk)
+        self.assertEqual(pricing['bundles'][0]['times'], 2)
+        self.assertEqual(pricing['final_total'], Decimal('400.00'))
+
+        incentives = apply_incentives_to_cart(self.cart)
+        self.assertEqual(incentives['promotion_usage'], {ab.promotion_id: Decimal('100.00')})
+
+    def test_only_bundles_sharing_a_cart_sku_are_considered(self):
+        self.bundle("CD", 150)
+        ab = self.bundle("AB", 150)
+        self.add(A=1, B=1, C=1)
+        index = get_promotion_index()
+        self.assertEqual(index.bundle_candidates({self.skus['A'].pk, self.skus['B'].pk}), [index.bundles[ab.pk]])
+        self.assertEqual(len(index.bundle_candidates({self.skus[name].pk for name in "ABC"})), 1)
+
+
+class DiscountCodeValidateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.code = DiscountCode.objects.create(
+            code="KARIBU500", discount_amount=500, max_uses=2, created_by=create_test_user(is_staff=True),
+            valid_from=now - timedelta(hours=1), valid_until=now + timedelta(hours=1),
+        )
+        self.url = reverse('promotions:discount_code_validate')
+        get_valid_codes()
+
+    def validate(self, code):
+        return self.client.post(self.url, {'code': code}, format='json')
+
+    def test_unknown_code_is_rejected_without_a_query(self):
+        with self.assertNumQueries(0):
+            response = self.validate("GUESS123")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_valid_code_is_cached_until_it_is_used(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.validate("karibu500").data['discount_amount'], 500.0)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.validate("KARIBU500").data['valid'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            commit_code_usage(self.code.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(self.validate("KARIBU500").data['valid'])
+
+        codes = get_valid_codes()
+        with self.captureOnCommitCallbacks(execute=True):
+            commit_code_usage(self.code.pk)  # last use: refused by its own entry, the set is not rebuilt
+        with self.assertNumQueries(1):
+            self.assertEqual(self.validate("KARIBU500").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIs(get_valid_codes(), codes)
+
+    @override_settings(DISCOUNT_CODE_VALIDATION={'RATE': '3/min'})
+    def test_attempts_are_rate_limited_per_client(self):
+        for attempt in range(3):
+            self.validate(f"GUESS{attempt}")
+        self.assertEqual(self.validate("KARIBU500").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.client.force_authenticate(create_test_user())
+        self.assertEqual(self.validate("KARIBU500").status_code, status.HTTP_200_OK)
+
+
+class DiscountCodeGenerationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = create_test_user(is_staff=True)
+        self.client.force_authenticate(self.admin)
+        now = timezone.now()
+        self.window = {'valid_from': now - timedelta(hours=1), 'valid_until': now + timedelta(days=30)}
+
+    def test_generated_codes_are_streamed_as_csv(self):
+        response = self.client.post(reverse('promotions:admin_code_generate'), dict(
+            count=1200, prefix="kk", discount_amount="500.00", **self.window
+        ), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        codes = {row['code'] for row in rows}
+        self.assertEqual(len(codes), 1200)
+        self.assertTrue(all(code.startswith("KK") and len(code) == 10 for code in codes))
+        self.assertEqual(DiscountCode.objects.filter(code__in=codes, is_active=True, created_by=self.admin).count(), 1200)
+        self.assertIn(rows[0]['code'], get_valid_codes())
+
+    def test_collisions_with_existing_codes_are_redrawn(self):
+        DiscountCode.objects.create(code="KK2222", discount_amount=500, created_by=self.admin, **self.window)
+        real = random.Random(7)
+        draws = iter([list("2222")])
+
+        def choices(alphabet, k):
+            return next(draws, None) or real.choices(alphabet, k=k)
+
+        with mock.patch('promotions.codegen._random.choices', side_effect=choices):
+            chunks = list(generate_codes(3, dict(discount_amount=500, created_by=self.admin, **self.window),
+                                         prefix="KK", length=4))
+        self.assertEqual(len(chunks[0]), 3)
+        self.assertNotIn("KK2222", chunks[0])
+        self.assertEqual(DiscountCode.objects.filter(code__startswith="KK").count(), 4)
+
+    def test_keyspace_must_dwarf_the_count(self):
+        response = self.client.post(reverse('promotions:admin_code_generate'), dict(
+            count=100000, length=4, discount_amount="500.00", **self.window
+        ), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(DiscountCode.objects.exists())
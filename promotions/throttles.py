@@ -0,0 +1,22 @@
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class DiscountCodeValidateThrottle(SimpleRateThrottle):
+    """
+    Per-client sliding window in front of code validation: the timestamps of a
+    client's recent attempts are kept in the cache and a request is refused
+    once DISCOUNT_CODE_VALIDATION['RATE'] of them fall inside the window.
+    Clients are users when authenticated, else their address.
+    """
+    scope = 'discount_code_validate'
+
+    def get_rate(self):
+        return getattr(settings, 'DISCOUNT_CODE_VALIDATION', {}).get('RATE', '10/min')
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
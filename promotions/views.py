@@ -1,30 +1,45 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from kkoo.cache import get_version
+from kkoo.conditional import ConditionalGetMixin, version_timestamp
+from .cache import ACTIVE_NAMESPACE, code_key
+from .codegen import generate_codes, csv_rows
+from .codeset import get_valid_codes
 from .models import Promotion, DiscountCode, BundleDeal
-from .serializers import PromotionSerializer, DiscountCodeSerializer, BundleDealSerializer
+from .scheduler import ensure_activation_current
+from .serializers import PromotionSerializer, DiscountCodeSerializer, DiscountCodeBatchSerializer, BundleDealSerializer
+from .throttles import DiscountCodeValidateThrottle
 
 
 # ========================
 # USER VIEWS (READ-ONLY)
 # ========================
 
-class PromotionListView(generics.ListAPIView):
+class PromotionListView(ConditionalGetMixin, generics.ListAPIView):
     """
     Public endpoint: List only ACTIVE promotions
     """
     serializer_class = PromotionSerializer
     permission_classes = [permissions.AllowAny]
+    surrogate_keys = ['promotions']
+
+    def get_validator(self, request, *args, **kwargs):
+        # The version moves on writes and at every window boundary (promotions.scheduler)
+        ensure_activation_current()
+        version = get_version(ACTIVE_NAMESPACE)
+        return version, version_timestamp(version)
 
     def get_queryset(self):
-        now = timezone.now()
-        return Promotion.objects.filter(
-            is_active=True,
-            start_datetime__lte=now,
-            end_datetime__gte=now
-        ).order_by('-priority', '-discount_percent')
+        # is_active is kept current by the scheduler: no time-window filter needed
+        return Promotion.objects.filter(is_active=True).order_by('-priority', '-discount_percent')
 
 
 class DiscountCodeValidateView(APIView):
@@ -32,23 +47,41 @@ class DiscountCodeValidateView(APIView):
     POST: Validate discount code
     Body: {"code": "WELCOME500"}
     Returns discount amount if valid
+
+    Rate limited per client; unknown codes are rejected from the in-memory
+    code set (promotions.codeset) and known ones answered from a short-lived
+    cache, so guesses never reach the database.
     """
     permission_classes = [permissions.AllowAny]  # Used at checkout
+    throttle_classes = [DiscountCodeValidateThrottle]
 
     def post(self, request):
         code_str = request.data.get('code', '').strip().upper()
         if not code_str:
             return Response({"error": "Code required"}, status=400)
 
-        try:
-            code = DiscountCode.objects.get(code=code_str, is_active=True)
-            return Response({
-                "valid": True,
-                "discount_amount": float(code.discount_amount),
-                "message": "Code valid"
-            })
-        except DiscountCode.DoesNotExist:
+        code_id = get_valid_codes().get(code_str)
+        payload = None
+        if code_id is not None:
+            key = code_key(code_id)
+            payload = cache.get(key)
+            if payload is None:
+                code = DiscountCode.objects.filter(
+                    pk=code_id, is_active=True, uses_count__lt=F('max_uses')
+                ).values('discount_amount').first()
+                payload = {'valid': code is not None}
+                if code is not None:
+                    payload['discount_amount'] = float(code['discount_amount'])
+                timeout = getattr(settings, 'DISCOUNT_CODE_VALIDATION', {}).get('CACHE_TIMEOUT', 30)
+                cache.set(key, payload, timeout)
+
+        if not payload or not payload['valid']:
             return Response({"valid": False, "error": "Invalid or expired code"}, status=400)
+        return Response({
+            "valid": True,
+            "discount_amount": payload['discount_amount'],
+            "message": "Code valid"
+        })
 
 
 # ========================
@@ -94,6 +127,34 @@ class AdminDiscountCodeListCreateView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 
+class AdminDiscountCodeGenerateView(APIView):
+    """
+    Admin: Generate many single-use codes at once
+    Body: {"count": 50000, "prefix": "KARIBU", "discount_amount": 500,
+           "valid_from": "...", "valid_until": "..."}
+    Streams the created codes back as CSV, chunk by chunk, as they are written.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = DiscountCodeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+        template = dict(serializer.template(), created_by=request.user)
+        try:
+            chunks = generate_codes(
+                options['count'], template,
+                prefix=options['prefix'], length=options['length'], alphabet=options['alphabet'],
+            )
+        except ValidationError as e:
+            return Response({"error": " ".join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(csv_rows(chunks, template), content_type='text/csv')
+        filename = f"discount-codes-{timezone.now():%Y%m%d%H%M%S}.csv"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 class AdminDiscountCodeDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     Admin: Retrieve / Update / Delete single discount code
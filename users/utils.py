@@ -0,0 +1,36 @@
+import itertools
+from django.utils import timezone
+from .models import User, SellerProfile, SellerKYCDocument
+
+_phone_counter = itertools.count(1)
+
+
+def create_test_user(phone_number=None, is_staff=False, **extra):
+    """
+    Test helper: create a user with a unique Tanzanian phone number.
+    """
+    if phone_number is None:
+        phone_number = f"+2557{next(_phone_counter):08d}"
+    user = User.objects.create(phone_number=phone_number, is_staff=is_staff, **extra)
+    user.set_unusable_password()
+    user.save(update_fields=['password'])
+    return user
+
+
+def create_test_seller_user(phone_number=None):
+    """
+    Test helper: create a seller with complete, verified core KYC.
+    Returns (user, seller_profile).
+    """
+    user = create_test_user(phone_number, is_seller=True, is_verified=True)
+    profile = SellerProfile.objects.create(
+        user=user,
+        business_name="Test Seller",
+        tin_number="123-456-789",
+        business_license_number="BL-0001",
+        kyc_status="verified",
+        verification_date=timezone.now(),
+    )
+    for document_type in ("brela_certificate", "tin_certificate"):
+        SellerKYCDocument.objects.create(seller_profile=profile, document_type=document_type, status="verified")
+    return user, profile
@@ -10,12 +10,24 @@ from .serializers import (
     AddressSerializer, SellerKYCDocumentSerializer, CustomTokenObtainPairSerializer
 )
 from phonenumber_field.phonenumber import PhoneNumber
+from kkoo.pagination import EstimatedCountCursorPagination
+from cart.guest import merge_guest_cart, request_token
 
 
 # Authentication
 class CustomTokenObtainPairView(TokenObtainPairView):
+    """Password login; a guest cart (X-Cart-Token / cart_token) is merged into the user's cart"""
     serializer_class = CustomTokenObtainPairSerializer
 
+    def get_serializer(self, *args, **kwargs):
+        self.login_serializer = super().get_serializer(*args, **kwargs)
+        return self.login_serializer
+
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        merge_guest_cart(self.login_serializer.user, request_token(request))
+        return response
+
 
 class OTPRequestView(generics.GenericAPIView):
     """Request OTP for login (no password fallback)"""
@@ -125,6 +137,7 @@ class UserListAdminView(generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = EstimatedCountCursorPagination
 
     def get_queryset(self):
         qs = super().get_queryset()